@@ -0,0 +1,17 @@
+#!/usr/bin/env python
+"""benchmarks - Measure the overhead mock_chroot adds on top of mock(1)
+
+The benchmarks replace mock(1) and koji(1) with stub executables whose latency
+and output volume can be controlled, so they run without either tool
+installed and measure the wrapper rather than the tools. Run them with::
+
+    python -m benchmarks --output results.json
+
+and compare against the results of a previous release with::
+
+    python -m benchmarks --compare old-results.json
+
+The suite has its own small runner rather then using pytest-benchmark, so it
+runs without adding to the test dependencies, and results of different
+releases can be saved and compared from the command line.
+"""
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+"""benchmarks/__main__.py - Command line interface for the benchmarks
+"""
+import sys
+from argparse import ArgumentParser
+
+from . import suite  # pylint: disable=unused-import
+from .runner import run, compare, load, save
+
+
+def main(argv=None):
+    """Run the benchmarks and write the results
+
+    :returns: The exit code, which is 1 if a comparison found regressions
+    :rtype: int
+    """
+    parser = ArgumentParser(prog='python -m benchmarks', description=(
+        'Measure the overhead mock_chroot adds on top of mock(1), using stub '
+        'mock(1) and koji(1) executables'
+    ))
+    parser.add_argument(
+        '-o', '--output', default='benchmark-results.json',
+        help="JSON file to write the results to, or '-' for the standard "
+        "output (default: %(default)s)"
+    )
+    parser.add_argument(
+        '-k', '--filter',
+        help='only run benchmarks with names containing this string'
+    )
+    parser.add_argument(
+        '-q', '--quick', action='store_true',
+        help='use smaller sizes and fewer rounds'
+    )
+    parser.add_argument(
+        '-c', '--compare', metavar='BASELINE',
+        help='compare the results to those in the given JSON file'
+    )
+    parser.add_argument(
+        '-t', '--threshold', type=float, default=1.1,
+        help='the ratio of median times above which a benchmark is reported '
+        'as a regression (default: %(default)s)'
+    )
+    args = parser.parse_args(argv)
+    document = run(names_filter=args.filter, quick=args.quick, log=sys.stderr)
+    save(document, args.output)
+    if not args.compare:
+        return 0
+    rows = compare(load(args.compare), document, args.threshold)
+    for name, old_median, new_median, ratio, regressed in rows:
+        sys.stderr.write('{0:30} {1:12.6f} {2:12.6f} {3:>8} {4}\n'.format(
+            name, old_median, new_median,
+            '-' if ratio is None else '{0:.2f}x'.format(ratio),
+            'REGRESSED' if regressed else ''
+        ))
+    return 1 if any(row[-1] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
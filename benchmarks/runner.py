@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+"""benchmarks/runner.py - Run benchmarks and record their results
+"""
+import os
+import sys
+import json
+import platform
+from time import time
+from math import sqrt
+from contextlib import contextmanager
+from multiprocessing import cpu_count
+
+__all__ = [
+    'benchmark', 'BENCHMARKS', 'measure', 'stubbed', 'run', 'compare',
+    'load', 'save', 'STUBS_DIR',
+]
+
+STUBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stubs')
+
+# The registered benchmarks in registration order, as (name, function) pairs
+BENCHMARKS = []
+
+
+def benchmark(name):
+    """Decorator for registering a benchmark function
+
+    The function is called with a 'quick' boolean argument asking it to use
+    smaller sizes and fewer rounds, and returns a dictionary of results as
+    returned by measure(), optionally with additional entries.
+
+    :param str name: A dotted name for the benchmark
+    """
+    def register(func):
+        BENCHMARKS.append((name, func))
+        return func
+    return register
+
+
+def measure(func, rounds=10, warmup=1, ops_per_round=1, setup=None):
+    """Time a function over several rounds
+
+    :param callable func: The function to time, called with no arguments, or
+                          with the value returned by 'setup'
+    :param int rounds: The amount of timed calls to make
+    :param int warmup: The amount of untimed calls to make first
+    :param int ops_per_round: The amount of operations each call performs,
+                              used for calculating the throughput
+    :param callable setup: An optional function to call ahead of every call
+                           to 'func', the time it takes is not measured
+
+    :returns: Statistics of the round durations in seconds, and the
+              throughput in operations per second
+    :rtype: dict
+    """
+    def call():
+        if setup is None:
+            started = time()
+            func()
+        else:
+            args = setup()
+            started = time()
+            func(args)
+        return time() - started
+    for _ in xrange(warmup):
+        call()
+    return _stats([call() for _ in xrange(rounds)], ops_per_round)
+
+
+def _stats(durations, ops_per_round=1):
+    """Calculate statistics for the given round durations"""
+    durations = sorted(durations)
+    rounds = len(durations)
+    mean = sum(durations) / rounds
+    middle = rounds // 2
+    if rounds % 2:
+        median = durations[middle]
+    else:
+        median = (durations[middle - 1] + durations[middle]) / 2
+    variance = sum((d - mean) ** 2 for d in durations) / max(1, rounds - 1)
+    return {
+        'rounds': rounds,
+        'min': durations[0],
+        'max': durations[-1],
+        'mean': mean,
+        'median': median,
+        'stdev': sqrt(variance),
+        'ops_per_sec': ops_per_round / mean if mean else None,
+    }
+
+
+@contextmanager
+def stubbed(latency=0, output=0):
+    """Make mock_chroot use the stub mock(1) and koji(1) executables
+
+    :param float latency: The amount of seconds every stub command takes
+    :param int output: The amount of bytes stub commands write
+    """
+    from mock_chroot import MockChroot
+    from mock_chroot.config import from_koji
+
+    saved_env = dict(
+        (var, os.environ.get(var))
+        for var in ('BENCH_STUB_LATENCY', 'BENCH_STUB_OUTPUT')
+    )
+    saved_mock_exe = MockChroot.__dict__['mock_exe']
+    saved_koji_exe = from_koji.__dict__['koji_exe']
+    os.environ['BENCH_STUB_LATENCY'] = str(latency)
+    os.environ['BENCH_STUB_OUTPUT'] = str(output)
+    MockChroot.mock_exe = staticmethod(
+        lambda: os.path.join(STUBS_DIR, 'mock')
+    )
+    from_koji.koji_exe = staticmethod(lambda: os.path.join(STUBS_DIR, 'koji'))
+    try:
+        yield
+    finally:
+        MockChroot.mock_exe = saved_mock_exe
+        from_koji.koji_exe = saved_koji_exe
+        for var, value in saved_env.iteritems():
+            if value is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = value
+
+
+def run(names_filter=None, quick=False, log=None):
+    """Run the registered benchmarks
+
+    :param str names_filter: Only run benchmarks with names containing this
+    :param bool quick: Ask benchmarks to use smaller sizes and fewer rounds
+    :param file log: An optional file to report progress to
+
+    :returns: The results document, ready to be written as JSON
+    :rtype: dict
+    """
+    results = {}
+    for name, func in BENCHMARKS:
+        if names_filter and names_filter not in name:
+            continue
+        if log is not None:
+            log.write('{0} ... '.format(name))
+            log.flush()
+        results[name] = func(quick=quick)
+        if log is not None:
+            log.write('{0:.6f}s\n'.format(results[name]['median']))
+    return {
+        'metadata': _metadata(quick),
+        'results': results,
+    }
+
+
+def _metadata(quick):
+    """Describe the environment the benchmarks ran in"""
+    try:
+        from pkg_resources import get_distribution
+        version = get_distribution('mock_chroot').version
+    except Exception:  # pylint: disable=broad-except
+        version = None
+    return {
+        'mock_chroot_version': version,
+        'python_version': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': cpu_count(),
+        'timestamp': time(),
+        'quick': quick,
+    }
+
+
+def compare(old, new, threshold=1.1):
+    """Compare two results documents
+
+    :param dict old: The baseline results document
+    :param dict new: The results document to compare to the baseline
+    :param float threshold: The ratio of median durations above which a
+                            benchmark is considered to have regressed
+
+    :returns: A list of (name, old median, new median, ratio, regressed)
+              tuples for the benchmarks found in both documents
+    :rtype: list
+    """
+    rows = []
+    for name in sorted(set(old['results']) & set(new['results'])):
+        old_median = old['results'][name]['median']
+        new_median = new['results'][name]['median']
+        ratio = new_median / old_median if old_median else None
+        rows.append((
+            name, old_median, new_median, ratio,
+            ratio is not None and ratio > threshold
+        ))
+    return rows
+
+
+def load(path):
+    """Load a results document from a JSON file"""
+    with open(path, 'r') as ofd:
+        return json.load(ofd)
+
+
+def save(document, path):
+    """Write a results document to a JSON file, or to the standard output if
+    the path is '-'
+    """
+    if path == '-':
+        json.dump(document, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+        return
+    with open(path, 'w') as ofd:
+        json.dump(document, ofd, indent=2, sort_keys=True)
+        ofd.write('\n')
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+"""benchmarks/suite.py - The mock_chroot benchmarks
+"""
+import os
+import gc
+import shutil
+from itertools import count
+from tempfile import mkdtemp
+from subprocess import Popen, PIPE
+
+from mock_chroot import MockChroot, BuildMatrix
+from mock_chroot.config import (
+    compose, to, bind_mount, env_vars, file, from_koji, KojiCache
+)
+
+from .runner import benchmark, measure, stubbed, STUBS_DIR
+
+
+def _config_tree(size, group_size=10):
+    """Create a composition of the given amount of assorted configuration
+    objects, nested in groups the way configuration is usually assembled
+    """
+    items = []
+    for i in xrange(size):
+        kind = i % 4
+        if kind == 0:
+            items.append(to['opt{0}'.format(i)].set(i))
+        elif kind == 1:
+            items.append(
+                bind_mount(('/src{0}'.format(i), '/dst{0}'.format(i)))
+            )
+        elif kind == 2:
+            items.append(env_vars(**{'VAR{0}'.format(i): str(i)}))
+        else:
+            items.append(file('/etc/file{0}'.format(i), 'content\n' * 10))
+    return compose(*(
+        compose(*items[start:start + group_size])
+        for start in xrange(0, size, group_size)
+    ))
+
+
+@benchmark('wrapper.chroot')
+def wrapper_chroot(quick):
+    """The time chroot() takes beyond running mock(1) directly"""
+    rounds = 20 if quick else 200
+    stub_cmd = (os.path.join(STUBS_DIR, 'mock'), '--chroot', '--', 'true')
+
+    def raw_call():
+        Popen(stub_cmd, stdout=PIPE).communicate()
+    with stubbed():
+        mc = MockChroot(root='bench')
+        baseline = measure(raw_call, rounds=rounds)
+        result = measure(lambda: mc.chroot('true'), rounds=rounds)
+    result['baseline_median'] = baseline['median']
+    result['overhead'] = result['median'] - baseline['median']
+    return result
+
+
+@benchmark('wrapper.rebuild')
+def wrapper_rebuild(quick):
+    """The time rebuild() takes with an instant mock(1)"""
+    with stubbed():
+        mc = MockChroot(root='bench')
+        return measure(
+            lambda: mc.rebuild('bench.src.rpm', no_clean=True),
+            rounds=20 if quick else 200
+        )
+
+
+@benchmark('wrapper.output_volume')
+def wrapper_output_volume(quick):
+    """Collecting large amounts of mock(1) output"""
+    output = (1 if quick else 64) * 1024 * 1024
+    with stubbed(output=output):
+        mc = MockChroot(root='bench')
+        result = measure(lambda: mc.chroot('true'), rounds=5 if quick else 10)
+    result['bytes_per_sec'] = output / result['mean']
+    return result
+
+
+@benchmark('wrapper.stream_output')
+def wrapper_stream_output(quick):
+    """Streaming large amounts of mock(1) output"""
+    output = (1 if quick else 64) * 1024 * 1024
+
+    def consume():
+        for _ in mc.stream_chroot('true', lines=True):
+            pass
+    with stubbed(output=output):
+        mc = MockChroot(root='bench')
+        result = measure(consume, rounds=5 if quick else 10)
+    result['bytes_per_sec'] = output / result['mean']
+    return result
+
+
+@benchmark('render.cold')
+def render_cold(quick):
+    """Rendering a large composition for the first time"""
+    size = 200 if quick else 2000
+    return measure(
+        str, rounds=5 if quick else 20, ops_per_round=size,
+        setup=lambda: _config_tree(size)
+    )
+
+
+@benchmark('render.cached')
+def render_cached(quick):
+    """Rendering a large composition that did not change"""
+    size = 200 if quick else 2000
+    tree = _config_tree(size)
+    str(tree)
+    return measure(lambda: str(tree), rounds=100 if quick else 1000)
+
+
+@benchmark('render.invalidated')
+def render_invalidated(quick):
+    """Rendering a large composition after a small change deep inside it"""
+    size = 200 if quick else 2000
+    tree = _config_tree(size)
+    leaf_group = tree[-1]
+
+    changes = count()
+
+    def change_and_render():
+        leaf_group[-1] = to['changed'].set(next(changes))
+        str(tree)
+    return measure(change_and_render, rounds=5 if quick else 20)
+
+
+@benchmark('config.tempfile_churn')
+def config_tempfile_churn(quick):
+    """Creating and discarding chroot objects with their own config files"""
+    config = str(_config_tree(50))
+    per_round = 20 if quick else 200
+
+    def churn():
+        for _ in xrange(per_round):
+            MockChroot(config=config)
+        gc.collect()
+    return measure(churn, rounds=5, ops_per_round=per_round)
+
+
+@benchmark('config.shared_config_dir')
+def config_shared_config_dir(quick):
+    """Creating and discarding chroot objects sharing a config file"""
+    config = str(_config_tree(50))
+    per_round = 20 if quick else 200
+    config_dir = mkdtemp()
+
+    def churn():
+        for _ in xrange(per_round):
+            MockChroot(config=config, config_dir=config_dir)
+        gc.collect()
+    try:
+        return measure(churn, rounds=5, ops_per_round=per_round)
+    finally:
+        shutil.rmtree(config_dir)
+
+
+@benchmark('koji.from_koji')
+def koji_from_koji(quick):
+    """Pulling configuration from Koji by target"""
+    with stubbed(output=16 * 1024):
+        return measure(
+            lambda: from_koji(target='target1', koji_profile='bench'),
+            rounds=10 if quick else 50
+        )
+
+
+@benchmark('koji.from_koji_cached')
+def koji_from_koji_cached(quick):
+    """Pulling configuration from Koji by target through a KojiCache"""
+    cache_dir = mkdtemp()
+    try:
+        with stubbed(output=16 * 1024):
+            cache = KojiCache(cache_dir)
+            return measure(
+                lambda: from_koji(
+                    target='target1', koji_profile='bench', cache=cache
+                ),
+                rounds=100 if quick else 1000
+            )
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+@benchmark('koji.resolve_many')
+def koji_resolve_many(quick):
+    """Pulling configuration for many targets and architectures at once"""
+    target_arches = [
+        ('target{0}'.format(i), arch)
+        for i in xrange(5 if quick else 20)
+        for arch in ('x86_64', 'ppc64le')
+    ]
+    with stubbed(latency=0.05, output=16 * 1024):
+        return measure(
+            lambda: from_koji.resolve_many(target_arches, 'bench'),
+            rounds=3 if quick else 10, ops_per_round=len(target_arches)
+        )
+
+
+@benchmark('scheduling.matrix')
+def scheduling_matrix(quick):
+    """Running many builds over a few chroots with BuildMatrix"""
+    latency = 0.02 if quick else 0.1
+    roots = 4
+    builds = 4 if quick else 8
+    workers = 4
+    with stubbed(latency=latency):
+        mocks = [
+            MockChroot(root='bench', unique_ext=str(i)) for i in xrange(roots)
+        ]
+
+        def run_matrix():
+            matrix = BuildMatrix(max_workers=workers, no_clean=True)
+            for mock in mocks:
+                for build in xrange(builds):
+                    matrix.add(mock, 'pkg{0}.src.rpm'.format(build))
+            assert matrix.run().ok
+        result = measure(
+            run_matrix, rounds=3 if quick else 5, ops_per_round=roots * builds
+        )
+    # The time the builds would take with perfect scheduling and no overhead
+    ideal = latency * roots * builds / min(workers, roots)
+    result['ideal'] = ideal
+    result['efficiency'] = ideal / result['median']
+    return result
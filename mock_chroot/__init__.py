@@ -2,11 +2,33 @@
 """mock_chroot - Thin Python wrapper around mock(1)
 """
 import os
-from subprocess import check_output
+import errno
+from time import time
+from threading import Lock
+from glob import glob
+from hashlib import sha256
 from collections import Iterable
 from tempfile import mkstemp
+from pprint import pformat
+from subprocess import CalledProcessError
 
-__all__ = ['MockChroot']
+from .session import ChrootSession
+from .batch import batch_script, parse_batch_output, new_marker
+from .configfiles import default_manager
+from .config.loader import load_config
+from .process import MockProcess, stream_output, check_output
+from .matrix import BuildMatrix
+from .instrumentation import Hook
+from .results import BuildResult
+from .rootinfo import RootInfo
+from .pool import ChrootPool
+from .pkgcache import PackageCache
+from .mirror import RepoMirror
+
+__all__ = [
+    'MockChroot', 'BuildMatrix', 'ChrootPool', 'BuildResult', 'PackageCache',
+    'RepoMirror',
+]
 
 
 class MockChroot(object):
@@ -17,13 +39,50 @@ class MockChroot(object):
     :param str config: The Mock configuration for the chroot as string or
                         some other object that will yield a configuration
                         string when passed to 'str()'
+    :param str config_dir: An optional directory to place the configuration
+                           file in, at a path derived from the configuration
+                           fingerprint, so that identical configurations share
+                           the same file, and therefore the same chroot and
+                           caches. Files placed there are not removed.
+    :param str unique_ext: An optional unique extension to add to the chroot
+                           name, allowing for multiple chroots with the same
+                           configuration
+    :param float timeout: An optional amount of seconds every *mock(1)*
+                          operation may run for, methods that take a
+                          'timeout' argument can override it. Operations that
+                          run for longer are killed along with all the
+                          processes they started, and MockTimeoutError is
+                          raised.
+    :param dict rlimits: Optional resource limits to apply to the *mock(1)*
+                         processes, mapping names of limits, such as 'cpu',
+                         'as' or 'nofile', to a limit or a (soft, hard) pair
+                         of limits, see mock_chroot.process.MockProcess
 
     'root' and 'config' are mutually exclusive
     """
+    INIT_MARKER = '.mock_chroot_fingerprint'
+    # The total length of file paths to pass to a single 'mock --copyin' or
+    # 'mock --copyout' command, well below the usual ARG_MAX of the system
+    MAX_COPY_ARGS_LENGTH = 128 * 1024
+
+    # Root locations by (fingerprint, unique_ext), shared by all the objects
+    # in the process
+    _root_info_cache = {}
+    _root_info_lock = Lock()
+
     # Star arguments are used in this class
     # pylint: disable=star-args
-    def __init__(self, root=None, config=None):
+    def __init__(  # pylint: disable=too-many-arguments,bad-continuation
+        self, root=None, config=None, config_dir=None, unique_ext=None,
+        timeout=None, rlimits=None
+    ):
         """Create a mock(1) chroot """
+        self.unique_ext = unique_ext
+        self.timeout = timeout
+        self.rlimits = rlimits
+        # None means we do not know and need to look at the marker file
+        self._initialized = None
+        self._hooks = []
         if root and config:
             raise RuntimeError(
                 "'root' and 'config' arguments are mutually exclusive"
@@ -31,22 +90,151 @@ class MockChroot(object):
         elif root:
             self._root = root
         elif config:
-            (cfd, self._cfg_name) = mkstemp(suffix='.cfg')
-            try:
-                os.write(cfd, str(config))
-            finally:
-                os.close(cfd)
+            config = str(config)
+            self._fingerprint = sha256(config).hexdigest()
+            if config_dir:
+                self._cfg_name = self._write_shared_config(config_dir, config)
+            else:
+                # Chroots with the same configuration share a single file
+                self._config_files = default_manager()
+                self._cfg_name = self._config_files.acquire(
+                    config, self._fingerprint
+                )
             self._root = self._cfg_name
         else:
             # If no configuration specified, use the default file Mock would
             self._root = '/etc/mock/default.cfg'
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     def __del__(self):
         try:
-            os.remove(self._cfg_name)
+            self.close()
         except AttributeError:
             pass
 
+    def close(self):
+        """Release the configuration file written for the chroot
+
+        The file is removed once no other MockChroot object with the same
+        configuration uses it. The chroot cannot be used after it is closed.
+        Objects of this class are context managers that are closed when the
+        context is exited::
+
+            with MockChroot(config=config) as mc:
+                mc.chroot('true')
+
+        The chroot itself is left in place, use 'clean' to remove it.
+        """
+        config_files = self.__dict__.pop('_config_files', None)
+        if config_files is not None:
+            config_files.release(self._cfg_name)
+
+    def fingerprint(self):
+        """Get a stable fingerprint of the chroot configuration
+
+        For chroots created with the 'config' argument, this is the same as
+        the fingerprint of the configuration. Chroots created with the 'root'
+        argument are fingerprinted by the root name or path along with the
+        configuration loaded from the file it points to, if it can be loaded.
+
+        :returns: A hex digest identifying the configuration
+        :rtype: str
+        """
+        try:
+            return self._fingerprint
+        except AttributeError:
+            fingerprint_src = 'root:' + self._root
+            try:
+                fingerprint_src += '\0' + pformat(self.config_opts())
+            except Exception:  # pylint: disable=broad-except
+                # Opaque roots are fingerprinted by name alone
+                pass
+            self._fingerprint = sha256(fingerprint_src).hexdigest()
+            return self._fingerprint
+
+    def config_opts(self):
+        """Load the chroot configuration without running *mock(1)*
+
+        See mock_chroot.config.load_config for details
+
+        :returns: The 'config_opts' dictionary the configuration yields
+        :rtype: dict
+        """
+        return load_config(self._root)
+
+    def add_hook(self, pre=None, post=None):
+        """Register functions to call around every command run for this
+        chroot, in addition to the global hooks
+
+        :param callable pre: An optional function to call with an Invocation
+                             object before the command is started
+        :param callable post: An optional function to call with an Invocation
+                              object after the command exits
+
+        See mock_chroot.instrumentation for details
+
+        :returns: An object that can be passed to remove_hook()
+        :rtype: Hook
+        """
+        hook = Hook(pre, post)
+        self._hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        """Unregister functions registered with add_hook()
+
+        :param Hook hook: The object returned from add_hook()
+        """
+        self._hooks.remove(hook)
+
+    def _process_opts(self, timeout=None):
+        """Get the arguments to run *mock(1)* commands with
+
+        :param float timeout: A timeout to use instead of the one given to
+                              the object
+        """
+        return dict(
+            hooks=self._hooks,
+            timeout=self.timeout if timeout is None else timeout,
+            rlimits=self.rlimits,
+        )
+
+    def _write_shared_config(self, config_dir, config):
+        """Write the configuration to a content-addressed file under the given
+        directory if it is not already there
+
+        :returns: The path to the configuration file
+        :rtype: str
+        """
+        cfg_name = os.path.join(
+            config_dir, 'mock-{0}.cfg'.format(self._fingerprint)
+        )
+        if os.path.exists(cfg_name):
+            return cfg_name
+        try:
+            os.makedirs(config_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        # Write to a temporary file first and rename it into place so
+        # concurrent processes never see a partially written file
+        (cfd, tmp_name) = mkstemp(dir=config_dir, suffix='.tmp')
+        try:
+            try:
+                os.write(cfd, config)
+            finally:
+                os.close(cfd)
+            os.rename(tmp_name, cfg_name)
+        except BaseException:
+            os.remove(tmp_name)
+            raise
+        return cfg_name
+
     def dump_config(self):
         """Dump configuration for debugging purposes
 
@@ -60,18 +248,87 @@ class MockChroot(object):
                 dump += '\n' + ofd.read()
             dump += '\n' + '-' * 78
         else:
-            dump = "Using opaque Mock root string: {0}".format(self._root)
+            try:
+                config_opts = self.config_opts()
+            except Exception:  # pylint: disable=broad-except
+                return "Using opaque Mock root string: {0}".format(
+                    self._root
+                )
+            dump = "Mock config loaded for {0} follows".format(self._root)
+            dump += '\n' + '-' * 78
+            dump += '\n' + pformat(config_opts)
+            dump += '\n' + '-' * 78
         return dump
 
     def get_root_path(self):
         """Get the bash path of the chroot
 
+        The path is found once for every configuration, see 'root_info'
+
         :returns: the bash path
         :rtype: str
         """
-        mock_cmd = self._mock_cmd('--print-root-path')
-        output = check_output(mock_cmd)
-        return output.rstrip()
+        try:
+            return self._known_root_path
+        except AttributeError:
+            return self.root_info().root_path
+
+    def root_info(self):
+        """Get the locations *mock(1)* uses for the chroot
+
+        The locations are evaluated from the chroot configuration where
+        possible, falling back to asking *mock(1)* for the chroot path. They
+        are remembered for every configuration fingerprint and unique
+        extension, so this is only done once in the process.
+
+        :rtype: RootInfo
+        """
+        key = (self.fingerprint(), self.unique_ext)
+        with self._root_info_lock:
+            info = self._root_info_cache.get(key)
+        if info is None:
+            info = self._find_root_info()
+            with self._root_info_lock:
+                info = self._root_info_cache.setdefault(key, info)
+        self._known_root_path = info.root_path
+        return info
+
+    @classmethod
+    def forget_root_info(cls):
+        """Forget the chroot locations remembered by 'root_info', for when
+        the *mock(1)* site configuration changes
+        """
+        with cls._root_info_lock:
+            cls._root_info_cache.clear()
+
+    def _find_root_info(self):
+        """Evaluate the chroot locations, asking *mock(1)* for the chroot
+        path if the configuration cannot be evaluated
+
+        :rtype: RootInfo
+        """
+        try:
+            info = RootInfo.from_config(
+                load_config(self._root, site=True), self.unique_ext
+            )
+        except Exception:  # pylint: disable=broad-except
+            info = None
+        if info is None:
+            mock_cmd = self._mock_cmd('--print-root-path')
+            output = check_output(mock_cmd, **self._process_opts())
+            info = RootInfo(output.rstrip())
+        return info
+
+    def async_get_root_path(self):
+        """Start getting the bash path of the chroot in the background
+
+        :returns: A process object whose 'result' method returns the bash path
+        :rtype: MockProcess
+        """
+        return MockProcess(
+            (self._mock_cmd('--print-root-path'),), postprocess=str.rstrip,
+            **self._process_opts()
+        )
 
     def chroot(self, *cmd, **more_options):
         """Run a non-interactive command in mock
@@ -83,28 +340,436 @@ class MockChroot(object):
 
         Optional named agruments passed via 'more_options' can be as follows:
         :param str cwd: Working directory inside the chroot to run in
+        :param float timeout: An amount of seconds the command may run for,
+                              overriding the one given to the object
 
         :returns: the command output as string
         :rtype: str
+        :raises MockTimeoutError: If the timeout expired
         """
-        mock_args = ['--chroot']
-        if 'cwd' in more_options:
-            mock_args.extend(('--cwd', more_options['cwd']))
-        if 'resultdir' in more_options:
-            mock_args.extend(('--resultdir', more_options['resultdir']))
-        mock_args.append('--')
-        mock_args.extend(cmd)
-        mock_cmd = self._mock_cmd(*mock_args)
-        output = check_output(mock_cmd)
+        timeout = more_options.pop('timeout', None)
+        mock_cmd = self._chroot_cmd(*cmd, **more_options)
+        output = check_output(mock_cmd, **self._process_opts(timeout))
         return output
 
-    def clean(self):
+    def async_chroot(self, *cmd, **more_options):
+        """Start running a non-interactive command in mock in the background
+
+        Arguments are the same as for 'chroot'
+
+        :returns: A process object whose 'result' method returns the command
+                  output
+        :rtype: MockProcess
+        """
+        timeout = more_options.pop('timeout', None)
+        return MockProcess(
+            (self._chroot_cmd(*cmd, **more_options),),
+            **self._process_opts(timeout)
+        )
+
+    def stream_chroot(self, *cmd, **more_options):
+        """Run a non-interactive command in mock and stream its output
+
+        Arguments are the same as for 'chroot', and in addition:
+        :param object tee: An optional file object or path of a file to write
+                           all the output to as it is produced
+        :param bool lines: If True (the default), the output is yielded line
+                           by line, otherwise it is yielded in chunks
+
+        :returns: A generator yielding (stream, data) pairs, see
+                  mock_chroot.process.stream_output for details
+        """
+        tee = more_options.pop('tee', None)
+        lines = more_options.pop('lines', True)
+        timeout = more_options.pop('timeout', None)
+        return stream_output(
+            (self._chroot_cmd(*cmd, **more_options),), tee=tee, lines=lines,
+            **self._process_opts(timeout)
+        )
+
+    def chroot_many(
+        self, commands, stop_on_failure=False, cwd=None, timeout=None
+    ):
+        """Run many non-interactive commands in the chroot with a single
+        *mock(1)* invocation
+
+        The commands are run one after the other by a shell script, and their
+        results are collected separately. Unlike 'chroot', commands that fail
+        do not raise an exception.
+
+        :param list commands: A list of commands to run, each given as a
+                              list of arguments
+        :param bool stop_on_failure: If True, the commands that follow the
+                                     first command that fails are not run
+        :param str cwd: Working directory inside the chroot to run in
+        :param float timeout: An amount of seconds all the commands together
+                              may run for, overriding the one given to the
+                              object
+
+        :returns: A CommandResult object for every command that was run,
+                  with its output, error, exit code and duration
+        :rtype: list
+        """
+        return self.async_chroot_many(
+            commands, stop_on_failure=stop_on_failure, cwd=cwd,
+            timeout=timeout
+        ).result()
+
+    def async_chroot_many(
+        self, commands, stop_on_failure=False, cwd=None, timeout=None
+    ):
+        """Start running many non-interactive commands in the chroot in the
+        background
+
+        Arguments are the same as for 'chroot_many'
+
+        :returns: A process object whose 'result' method returns the command
+                  results
+        :rtype: MockProcess
+        """
+        commands = [tuple(cmd) for cmd in commands]
+        marker = new_marker()
+        more_options = {} if cwd is None else {'cwd': cwd}
+        mock_cmd = self._chroot_cmd(
+            'sh', '-c', batch_script(commands, marker, stop_on_failure),
+            **more_options
+        )
+        return MockProcess(
+            (mock_cmd,),
+            postprocess=lambda output: parse_batch_output(
+                output, commands, marker
+            ),
+            **self._process_opts(timeout)
+        )
+
+    def pm_cmd(self, *args):
+        """Run the package manager in the chroot with *mock(1)*, using dnf
+        on platforms that have it and yum otherwise
+
+        All positional arguments are passed to the package manager
+
+        :returns: the package manager output as string
+        :rtype: str
+        """
+        mock_cmd = self._mock_cmd(
+            '--dnf-cmd' if self.has_dnf() else '--yum-cmd', '--', *args
+        )
+        return check_output(mock_cmd, **self._process_opts())
+
+    def session(self):
+        """Open a persistent shell session inside the chroot
+
+        The session keeps a single *mock(1)* shell process running and lets
+        one run many commands in the chroot without paying for starting mock
+        for each one. It is meant to be used as a context manager::
+
+            with mc.session() as session:
+                output = session.run('cat', '/etc/issue')
+
+        The timeout given to the object applies to each command run in the
+        session, and the resource limits to the shell process.
+
+        :returns: A session object with a 'run' method that behaves like
+                  'chroot'
+        :rtype: ChrootSession
+        """
+        return ChrootSession(self._mock_cmd('--shell'), **self._process_opts())
+
+    def copyin(self, paths, dest):
+        """Copy files or directories from the host into the chroot
+
+        Many files are copied with as few *mock(1)* commands as possible, the
+        paths are only split between commands if they do not fit in a single
+        command line. To copy files within a session use
+        ChrootSession.copyin.
+
+        :param object paths: The path of a file or directory to copy or an
+                             Iterable of such paths
+        :param str dest: The path inside the chroot to copy into, must be a
+                         directory if more then one path is given
+        """
+        for batch in self._copy_batches(paths):
+            check_output(
+                self._mock_cmd('--copyin', *(batch + [dest])),
+                **self._process_opts()
+            )
+
+    def copyout(self, paths, dest):
+        """Copy files or directories from the chroot to the host
+
+        Paths are batched into *mock(1)* commands like in 'copyin'
+
+        :param object paths: The path inside the chroot of a file or
+                             directory to copy or an Iterable of such paths
+        :param str dest: The path on the host to copy into, must be a
+                         directory if more then one path is given
+        """
+        for batch in self._copy_batches(paths):
+            check_output(
+                self._mock_cmd('--copyout', *(batch + [dest])),
+                **self._process_opts()
+            )
+
+    def _copy_batches(self, paths):
+        """Split paths to copy into lists that fit in a command line
+
+        :param object paths: A path or an Iterable of paths
+
+        :returns: An iterator over non-empty lists of paths
+        """
+        if isinstance(paths, basestring):
+            paths = (paths,)
+        elif not isinstance(paths, Iterable):
+            raise TypeError("given 'paths' is not an Iterable or a string")
+        batch = []
+        batch_length = 0
+        for path in paths:
+            if batch and \
+                    batch_length + len(path) + 1 > self.MAX_COPY_ARGS_LENGTH:
+                yield batch
+                batch = []
+                batch_length = 0
+            batch.append(path)
+            batch_length += len(path) + 1
+        if batch:
+            yield batch
+
+    def init(self, timeout=None):
+        """Initialize the mock chroot, cleaning it first if needed
+
+        :param float timeout: An amount of seconds the operation may run for,
+                              overriding the one given to the object
+        """
+        self._run_cmds(
+            (self._mock_cmd('--init'),), initialized=True, timeout=timeout
+        )
+        if not hasattr(self, '_known_root_path'):
+            # Find out where the chroot is so the initialization marker can
+            # be left in it for other processes to see
+            try:
+                self.get_root_path()
+            except CalledProcessError:
+                return
+            self._set_initialized(True)
+
+    def async_init(self, timeout=None):
+        """Start initializing the mock chroot in the background
+
+        Arguments are the same as for 'init'
+
+        :rtype: MockProcess
+        """
+        return MockProcess(
+            (self._mock_cmd('--init'),), on_exit=self._on_exit(True),
+            **self._process_opts(timeout)
+        )
+
+    def clean(self, timeout=None):
         """Clean the mock chroot
+
+        :param float timeout: An amount of seconds the operation may run for,
+                              overriding the one given to the object
         """
-        mock_cmd = self._mock_cmd('--clean')
-        check_output(mock_cmd)
+        self._run_cmds(
+            (self._mock_cmd('--clean'),), initialized=False, timeout=timeout
+        )
+
+    def async_clean(self, timeout=None):
+        """Start cleaning the mock chroot in the background
 
-    def rebuild(self, src_rpm, no_clean=False, define=None, resultdir=None):
+        Arguments are the same as for 'clean'
+
+        :rtype: MockProcess
+        """
+        return MockProcess(
+            (self._mock_cmd('--clean'),), on_exit=self._on_exit(False),
+            **self._process_opts(timeout)
+        )
+
+    def snapshot(self, name):
+        """Take a snapshot of the chroot
+
+        Snapshots require the overlayfs or lvm_root Mock plugins to be
+        enabled, see mock_chroot.config.snapshots
+
+        :param str name: The name for the snapshot
+        """
+        check_output(
+            self._mock_cmd('--snapshot', name), **self._process_opts()
+        )
+
+    def rollback(self, name):
+        """Roll the chroot back to a snapshot
+
+        This is much faster then cleaning and initializing the chroot again
+
+        :param str name: The name of the snapshot to roll back to
+        """
+        self._run_cmds(
+            (self._mock_cmd('--rollback-to', name),), initialized=True
+        )
+
+    def list_snapshots(self):
+        """List the snapshots of the chroot
+
+        :returns: The names of the snapshots
+        :rtype: list
+        """
+        return self._snapshots()[0]
+
+    def current_snapshot(self):
+        """Get the snapshot the chroot was last rolled back to or taken
+
+        :returns: The name of the snapshot, or None if there is none
+        :rtype: str
+        """
+        return self._snapshots()[1]
+
+    def remove_snapshot(self, name):
+        """Remove a snapshot of the chroot
+
+        :param str name: The name of the snapshot to remove
+        """
+        check_output(
+            self._mock_cmd('--remove-snapshot', name), **self._process_opts()
+        )
+
+    def _snapshots(self):
+        """Query mock(1) for the snapshots of the chroot
+
+        :returns: A pair of the list of snapshot names, and the name of the
+                  current snapshot or None
+        :rtype: tuple
+        """
+        output = check_output(
+            self._mock_cmd('--list-snapshots'), **self._process_opts()
+        )
+        names = []
+        current = None
+        # Mock prints a header line followed by the snapshot names, marking
+        # the current one with an asterisk
+        for line in output.splitlines():
+            line = line.strip()
+            if not line or line.endswith(':'):
+                continue
+            if line.startswith('* '):
+                line = line[2:].strip()
+                current = line
+            names.append(line)
+        return names, current
+
+    def is_initialized(self):
+        """Check whether the chroot is initialized with its current
+        configuration
+
+        Initialization done by this object is tracked in memory, otherwise a
+        marker file left next to the chroot by previous initializations is
+        checked, so this may invoke mock(1) to find where the chroot is.
+
+        :rtype: bool
+        """
+        if self._initialized is not None:
+            return self._initialized
+        try:
+            root_path = self.get_root_path()
+            with open(self._init_marker_path(), 'r') as ofd:
+                marker = ofd.read().strip()
+        except (CalledProcessError, IOError):
+            return False
+        return marker == self.fingerprint() and os.path.isdir(root_path)
+
+    def _init_marker_path(self):
+        """Get the path of the file marking the chroot as initialized
+
+        :returns: The marker path or None if the chroot path is not known yet
+        """
+        try:
+            return os.path.join(
+                os.path.dirname(self._known_root_path), self.INIT_MARKER
+            )
+        except AttributeError:
+            return None
+
+    def _set_initialized(self, initialized):
+        """Record the initialization state of the chroot
+
+        :param bool initialized: True if the chroot is initialized, False if
+                                 it is not or may not be, or None if it was
+                                 not changed
+
+        The marker file is written only if the chroot path is already known,
+        and on a best-effort basis, since it merely saves time. It is always
+        removed when the chroot is not initialized, so that an operation that
+        failed half way is never mistaken for a completed initialization.
+        """
+        self._initialized = initialized
+        if initialized is None:
+            return
+        if initialized is False and self._init_marker_path() is None:
+            try:
+                self.get_root_path()
+            except Exception:  # pylint: disable=broad-except
+                pass
+        marker_path = self._init_marker_path()
+        if marker_path is None:
+            return
+        try:
+            if initialized:
+                with open(marker_path, 'w') as ofd:
+                    ofd.write(self.fingerprint() + '\n')
+            else:
+                os.remove(marker_path)
+        except (IOError, OSError):
+            pass
+
+    def _on_exit(self, initialized):
+        """Create an 'on_exit' function for a MockProcess that records the
+        initialization state the operation leaves the chroot in, or that the
+        chroot is not initialized if the operation fails or is cancelled
+        """
+        def on_exit(returncode):
+            self._set_initialized(initialized if returncode == 0 else False)
+        return on_exit
+
+    def _build_result(self, resultdir):
+        """Create a 'postprocess' function for a MockProcess that wraps build
+        output in a BuildResult
+        """
+        return lambda output: BuildResult(output, resultdir, self)
+
+    def _run_cmds(self, cmds, initialized=None, timeout=None):
+        """Run mock(1) commands one after the other and record the
+        initialization state they leave the chroot in
+
+        :param list cmds: The command lines to run
+        :param bool initialized: The state the chroot is in if the commands
+                                 succeed, if they fail it is assumed not to
+                                 be initialized
+        :param float timeout: An amount of seconds all the commands together
+                              may run for, overriding the one given to the
+                              object
+
+        :returns: The output of the last command
+        :rtype: str
+        """
+        process_opts = self._process_opts(timeout)
+        if process_opts['timeout'] is not None:
+            deadline = time() + process_opts['timeout']
+        try:
+            for mock_cmd in cmds:
+                if process_opts['timeout'] is not None:
+                    process_opts['timeout'] = max(0, deadline - time())
+                output = check_output(mock_cmd, **process_opts)
+        except BaseException:
+            self._set_initialized(False)
+            raise
+        self._set_initialized(initialized)
+        return output
+
+    def rebuild(  # pylint: disable=too-many-arguments,bad-continuation
+        self, src_rpm, no_clean=False, define=None, resultdir=None,
+        timeout=None
+    ):
         """Build a package from .src.rpm in Mock
 
         :param str src_rpm: The path to the .src.rpm file to build
@@ -112,30 +777,64 @@ class MockChroot(object):
         :param object define: An optional define string for the build process
                               or an Iterable of multiple such define strings.
         :param str resultdir: Override where the build results get placed
+        :param float timeout: An amount of seconds the build may run for,
+                              overriding the one given to the object
 
-        :returns: the command output as string
-        :rtype: str
+        :returns: the command output as string, with the build log
+                  timeline attached to it
+        :rtype: BuildResult
+        :raises MockTimeoutError: If the timeout expired
         """
-        options = self._setup_mock_build_options(
-            no_clean=no_clean, define=define, resultdir=resultdir
+        return BuildResult(self._run_cmds(self._rebuild_cmds(
+            src_rpm, no_clean=no_clean, define=define, resultdir=resultdir
+        ), timeout=timeout), resultdir, self)
+
+    def async_rebuild(  # pylint: disable=too-many-arguments,bad-continuation
+        self, src_rpm, no_clean=False, define=None, resultdir=None,
+        timeout=None
+    ):
+        """Start building a package from .src.rpm in Mock in the background
+
+        Arguments are the same as for 'rebuild'
+
+        :returns: A process object whose 'result' method returns a
+                  BuildResult like 'rebuild' does
+        :rtype: MockProcess
+        """
+        return MockProcess(
+            self._rebuild_cmds(
+                src_rpm, no_clean=no_clean, define=define, resultdir=resultdir
+            ),
+            postprocess=self._build_result(resultdir),
+            on_exit=self._on_exit(None), **self._process_opts(timeout)
+        )
+
+    def stream_rebuild(  # pylint: disable=too-many-arguments,bad-continuation
+        self, src_rpm, no_clean=False, define=None, resultdir=None, tee=None,
+        lines=True, timeout=None
+    ):
+        """Build a package from .src.rpm in Mock and stream the build output
+
+        Arguments are the same as for 'rebuild', and in addition:
+        :param object tee: An optional file object or path of a file to write
+                           all the output to as it is produced
+        :param bool lines: If True, the output is yielded line by line,
+                           otherwise it is yielded in chunks
+
+        :returns: A generator yielding (stream, data) pairs, see
+                  mock_chroot.process.stream_output for details
+        """
+        return stream_output(
+            self._rebuild_cmds(
+                src_rpm, no_clean=no_clean, define=define, resultdir=resultdir
+            ),
+            tee=tee, lines=lines, on_exit=self._on_exit(None),
+            **self._process_opts(timeout)
         )
-        if self.has_dnf():
-            # On platforms with dnf we must use it for build requirement
-            # resolution but we cannot use it for initializing the chroot so
-            # we must pre-init
-            init_mock_cmd = self._mock_cmd('--init', *options)
-            check_output(init_mock_cmd)
-            # Force --no-clean so our initialization will not be destroyed
-            options = self._setup_mock_build_options(
-                no_clean=True, define=define, resultdir=resultdir
-            )
-            options += ('--dnf',)
-        mock_cmd = self._mock_cmd('--rebuild', src_rpm, *options)
-        output = check_output(mock_cmd)
-        return output
 
     def buildsrpm(  # pylint: disable=too-many-arguments,bad-continuation
-        self, spec, sources, no_clean=False, define=None, resultdir=None
+        self, spec, sources, no_clean=False, define=None, resultdir=None,
+        timeout=None
     ):
         """Build a .src.rpm package from sources and spcefile in Mock
 
@@ -145,37 +844,188 @@ class MockChroot(object):
         :param object define: An optional define string for the build process
                               or an Iterable of multiple such define strings.
         :param str resultdir: Override where the build results get placed
+        :param float timeout: An amount of seconds the build may run for,
+                              overriding the one given to the object
 
-        :returns: the command output as string
-        :rtype: str
+        :returns: the command output as string, with the build log
+                  timeline attached to it
+        :rtype: BuildResult
+        :raises MockTimeoutError: If the timeout expired
+        """
+        return BuildResult(self._run_cmds(self._buildsrpm_cmds(
+            spec, sources, no_clean=no_clean, define=define,
+            resultdir=resultdir
+        ), initialized=True, timeout=timeout), resultdir, self)
+
+    def async_buildsrpm(  # pylint: disable=too-many-arguments,bad-continuation
+        self, spec, sources, no_clean=False, define=None, resultdir=None,
+        timeout=None
+    ):
+        """Start building a .src.rpm package from sources and spcefile in Mock
+        in the background
+
+        Arguments are the same as for 'buildsrpm'
+
+        :returns: A process object whose 'result' method returns a
+                  BuildResult like 'buildsrpm' does
+        :rtype: MockProcess
+        """
+        return MockProcess(
+            self._buildsrpm_cmds(
+                spec, sources, no_clean=no_clean, define=define,
+                resultdir=resultdir
+            ),
+            postprocess=self._build_result(resultdir),
+            on_exit=self._on_exit(True), **self._process_opts(timeout)
+        )
+
+    def stream_buildsrpm(  # pylint: disable=too-many-arguments
+        self, spec, sources, no_clean=False, define=None, resultdir=None,
+        tee=None, lines=True, timeout=None
+    ):
+        """Build a .src.rpm package from sources and spcefile in Mock and
+        stream the build output
+
+        Arguments are the same as for 'buildsrpm', and in addition:
+        :param object tee: An optional file object or path of a file to write
+                           all the output to as it is produced
+        :param bool lines: If True, the output is yielded line by line,
+                           otherwise it is yielded in chunks
+
+        :returns: A generator yielding (stream, data) pairs, see
+                  mock_chroot.process.stream_output for details
+        """
+        return stream_output(
+            self._buildsrpm_cmds(
+                spec, sources, no_clean=no_clean, define=define,
+                resultdir=resultdir
+            ),
+            tee=tee, lines=lines, on_exit=self._on_exit(True),
+            **self._process_opts(timeout)
+        )
+
+    def build_from_sources(  # pylint: disable=too-many-arguments
+        self, spec, sources, resultdir, no_clean=False, define=None,
+        timeout=None
+    ):
+        """Build a .src.rpm package from sources and specfile and then build
+        binary packages from it, initializing the chroot only once
+
+        :param str spec: The path to the specfile to build
+        :param str sources: The path to the sources directory
+        :param str resultdir: Where the build results get placed, the
+                              .src.rpm package is looked up there
+        :param bool no_clean: Avoid cleaning the chroot before building the
+                              .src.rpm package
+        :param object define: An optional define string for the build process
+                              or an Iterable of multiple such define strings.
+        :param float timeout: An amount of seconds each of the builds may run
+                              for, overriding the one given to the object
+
+        :returns: the output of building the binary packages as string,
+                  with the build log timeline attached to it
+        :rtype: BuildResult
+        """
+        pattern = os.path.join(resultdir, '*.src.rpm')
+        existing = set(glob(pattern))
+        self.buildsrpm(
+            spec, sources, no_clean=no_clean, define=define,
+            resultdir=resultdir, timeout=timeout
+        )
+        srpms = set(glob(pattern))
+        # Prefer a newly created package, but the build may have overwritten
+        # one left over by a previous build
+        srpms = (srpms - existing) or srpms
+        if not srpms:
+            raise RuntimeError(
+                'no .src.rpm package found in {0}'.format(resultdir)
+            )
+        src_rpm = max(srpms, key=os.path.getmtime)
+        return self.rebuild(
+            src_rpm, no_clean=True, define=define, resultdir=resultdir,
+            timeout=timeout
+        )
+
+    def _chroot_cmd(self, *cmd, **more_options):
+        """Create the Mock command line for running a command in the chroot,
+        see 'chroot' for argument details
+        """
+        mock_args = ['--chroot']
+        if 'cwd' in more_options:
+            mock_args.extend(('--cwd', more_options['cwd']))
+        if 'resultdir' in more_options:
+            mock_args.extend(('--resultdir', more_options['resultdir']))
+        mock_args.append('--')
+        mock_args.extend(cmd)
+        return self._mock_cmd(*mock_args)
+
+    def _rebuild_cmds(
+        self, src_rpm, no_clean=False, define=None, resultdir=None
+    ):
+        """Create the Mock command lines for building a package from .src.rpm,
+        see 'rebuild' for argument details
+
+        :returns: A list of command lines to run one after the other
+        :rtype: list
+        """
+        return self._build_cmds(
+            ('--rebuild', src_rpm),
+            no_clean=no_clean, define=define, resultdir=resultdir
+        )
+
+    def _buildsrpm_cmds(  # pylint: disable=too-many-arguments,bad-continuation
+        self, spec, sources, no_clean=False, define=None, resultdir=None
+    ):
+        """Create the Mock command lines for building a .src.rpm package, see
+        'buildsrpm' for argument details
+
+        :returns: A list of command lines to run one after the other
+        :rtype: list
+        """
+        return self._build_cmds(
+            ('--buildsrpm', '--spec', spec, '--sources', sources),
+            no_clean=no_clean, define=define, resultdir=resultdir
+        )
+
+    def _build_cmds(
+        self, build_args, no_clean=False, define=None, resultdir=None
+    ):
+        """Create the Mock command lines for the various RPM building commands
+
+        :param tuple build_args: Mock arguments specifying what to build
+        :param bool no_clean: Avoid cleaning the chroot before building
+        :param object define: An optional define string for the build process
+                              or an Iterable of multiple such define strings.
+        :param str resultdir: Override where the build results get placed
+
+        :returns: A list of command lines to run one after the other
+        :rtype: list
         """
+        cmds = []
         options = self._setup_mock_build_options(
             no_clean=no_clean, define=define, resultdir=resultdir
         )
         if self.has_dnf():
             # On platforms with dnf we must use it for build requirement
             # resolution but we cannot use it for initializing the chroot so
-            # we must pre-init
-            init_mock_cmd = self._mock_cmd('--init', *options)
-            check_output(init_mock_cmd)
+            # we must pre-init, unless we were asked to keep the chroot and
+            # it is already initialized
+            if not (no_clean and self.is_initialized()):
+                cmds.append(self._mock_cmd('--init', *options))
             # Force --no-clean so our initialization will not be destroyed
             options = self._setup_mock_build_options(
                 no_clean=True, define=define, resultdir=resultdir
             )
             options += ('--dnf',)
-        mock_cmd = self._mock_cmd(
-            '--buildsrpm',
-            '--spec', spec,
-            '--sources', sources,
-            *options
-        )
-        output = check_output(mock_cmd)
-        return output
+        cmds.append(self._mock_cmd(*(tuple(build_args) + tuple(options))))
+        return cmds
 
     def _mock_cmd(self, *more_args):
         """Create the Mock command line
         """
         cmd = [self.mock_exe(), '--root={}'.format(self._root)]
+        if self.unique_ext:
+            cmd.append('--uniqueext={}'.format(self.unique_ext))
         cmd.extend(more_args)
         return tuple(cmd)
 
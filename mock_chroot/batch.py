@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""mock_chroot/batch.py - Running many commands in a single mock(1) launch
+"""
+from pipes import quote
+from uuid import uuid4
+
+__all__ = ['CommandResult', 'batch_script', 'parse_batch_output']
+
+
+class CommandResult(object):
+    """The result of a command run as part of a batch
+
+    :ivar tuple argv: The command that was run
+    :ivar str output: The standard output of the command
+    :ivar str error: The standard error of the command
+    :ivar int returncode: The exit code of the command
+    :ivar float duration: The time the command ran, in seconds
+    """
+    def __init__(  # pylint: disable=too-many-arguments,bad-continuation
+        self, argv, output, error, returncode, duration
+    ):
+        self.argv = tuple(argv)
+        self.output = output
+        self.error = error
+        self.returncode = returncode
+        self.duration = duration
+
+    @property
+    def succeeded(self):
+        """True if the command exited with code 0"""
+        return self.returncode == 0
+
+    def __repr__(self):
+        return '<CommandResult {0} returncode={1}>'.format(
+            ' '.join(self.argv), self.returncode
+        )
+
+
+def batch_script(commands, marker, stop_on_failure=False):
+    """Create a shell script that runs the given commands one after the other
+    and frames their results
+
+    The output and error of every command are collected into temporary
+    files. Once the command exits, a header line with the marker, the index
+    of the command, its exit code, its start and end times and the lengths of
+    its output and error is printed, followed by the output and error
+    themselves. The lengths make the framing safe for any output.
+
+    :param list commands: A list of commands, each given as a list of
+                          arguments
+    :param str marker: A unique string to start header lines with
+    :param bool stop_on_failure: If True, commands after the first one that
+                                 fails are not run
+
+    :rtype: str
+    """
+    script = [
+        "out=$(mktemp) && err=$(mktemp) || exit 1",
+        "trap 'rm -f \"$out\" \"$err\"' EXIT",
+    ]
+    for index, cmd in enumerate(commands):
+        script.extend((
+            "start=$(date +%s%N)",
+            "({0}) < /dev/null > \"$out\" 2> \"$err\"; rc=$?".format(
+                'exec ' + ' '.join(quote(arg) for arg in cmd)
+            ),
+            "end=$(date +%s%N)",
+            (
+                "printf '{0} {1} %d %s %s %d %d\\n' $rc $start $end "
+                "$(wc -c < \"$out\") $(wc -c < \"$err\")"
+            ).format(marker, index),
+            "cat \"$out\" \"$err\"",
+        ))
+        if stop_on_failure:
+            script.append("[ $rc -eq 0 ] || exit 0")
+    script.append("exit 0")
+    return '\n'.join(script)
+
+
+def parse_batch_output(output, commands, marker):
+    """Parse the output of a script created with batch_script
+
+    :param str output: The output of the script
+    :param list commands: The commands given to batch_script
+    :param str marker: The marker given to batch_script
+
+    :returns: A CommandResult for every command that was run
+    :rtype: list
+    """
+    results = []
+    header_start = marker + ' '
+    pos = output.find(header_start)
+    while pos >= 0:
+        header_end = output.index('\n', pos)
+        fields = output[pos + len(header_start):header_end].split()
+        index, returncode, output_len, error_len = (
+            int(fields[0]), int(fields[1]), int(fields[4]), int(fields[5])
+        )
+        try:
+            duration = (long(fields[3]) - long(fields[2])) / 1e9
+        except ValueError:
+            # 'date' does not support nano-seconds
+            duration = None
+        output_start = header_end + 1
+        error_start = output_start + output_len
+        pos = error_start + error_len
+        results.append(CommandResult(
+            commands[index],
+            output[output_start:error_start],
+            output[error_start:pos],
+            returncode,
+            duration,
+        ))
+        pos = output.find(header_start, pos)
+    return results
+
+
+def new_marker():
+    """Create a unique marker for batch_script"""
+    return '__mock_chroot_batch_{0}__'.format(uuid4().hex)
@@ -1,12 +1,22 @@
 #!/usr/bin/env python
 """mock_chroot.config - Library of ways to generate Mock configuration
 """
-from composition import compose, ConfigurationObject
+from composition import compose, ConfigurationObject, fingerprint
 from builder import to
-from highlevel import bind_mount, file, env_vars, use_host_resolv
+from highlevel import (
+    bind_mount, file, env_vars, use_host_resolv, tmpfs, overlayfs, lvm_root,
+    ccache, root_cache, yum_cache, dnf_cache, snapshots, shared_package_cache,
+    clean_file_store
+)
 from koji import from_koji
+from cache import KojiCache
+from loader import load_config, render_config, config_diff
+from optimizer import optimize
 
 __all__ = [
     'compose', 'to', 'bind_mount', 'file', 'env_vars',
-    'use_host_resolv', 'from_koji', 'ConfigurationObject'
+    'use_host_resolv', 'from_koji', 'ConfigurationObject', 'KojiCache',
+    'fingerprint', 'tmpfs', 'overlayfs', 'lvm_root', 'ccache', 'root_cache',
+    'yum_cache', 'dnf_cache', 'snapshots', 'load_config', 'render_config',
+    'config_diff', 'optimize', 'shared_package_cache', 'clean_file_store'
 ]
@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+"""mock_config/cache.py - Caching of configuration pulled from Koji
+"""
+import os
+import errno
+from time import time
+from hashlib import sha256
+from threading import RLock
+from tempfile import mkstemp
+from collections import OrderedDict
+
+__all__ = ['KojiCache']
+
+
+class KojiCache(object):
+    """A two-level cache for configuration strings pulled from Koji
+
+    Values are kept in an in-process LRU dictionary on top of an on-disk store
+    under 'cache_dir'. Files in the on-disk store are named by a hash of the
+    cache key and are written atomically, so multiple processes can safely
+    share the same cache directory.
+
+    Objects of this class are meant to be passed as the 'cache' argument to
+    'from_koji' and its class methods.
+
+    :param str cache_dir: The directory to store cached values in, defaults to
+                          a 'mock_chroot/koji' directory under the user's
+                          cache directory
+    :param int ttl: The time in seconds cached values remain valid for, or
+                    None to keep them valid forever
+    :param int max_entries: The maximal amount of values to keep in memory
+    """
+    def __init__(self, cache_dir=None, ttl=3600, max_entries=256):
+        """Create the cache object"""
+        if cache_dir is None:
+            cache_dir = os.path.join(
+                os.environ.get(
+                    'XDG_CACHE_HOME',
+                    os.path.join(os.path.expanduser('~'), '.cache')
+                ),
+                'mock_chroot', 'koji'
+            )
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._memory = OrderedDict()
+        self._lock = RLock()
+
+    def get(self, key, fetch):
+        """Get a value from the cache, fetching it if needed
+
+        :param tuple key: A tuple of strings identifying the value
+        :param callable fetch: A callable that takes no arguments and returns
+                               the value as a string, called if the value is
+                               not cached or had expired
+
+        :rtype: str
+        :returns: The cached or fetched value
+        """
+        value = self.lookup(key)
+        if value is None:
+            value = self.refresh(key, fetch)
+        return value
+
+    def lookup(self, key):
+        """Get a value from the cache without fetching it
+
+        :param tuple key: A tuple of strings identifying the value
+
+        :rtype: str
+        :returns: The cached value or None if it is not cached or had expired
+        """
+        with self._lock:
+            entry = self._memory.pop(key, None)
+            if entry is None or not self._is_fresh(entry[0]):
+                entry = self._load(key)
+            if entry is None:
+                return None
+            self._remember(key, entry)
+            return entry[1]
+
+    def refresh(self, key, fetch):
+        """Fetch a value and store it in the cache regardless of whether it
+        is already cached
+
+        :param tuple key: A tuple of strings identifying the value
+        :param callable fetch: A callable that takes no arguments and returns
+                               the value as a string
+
+        :rtype: str
+        :returns: The fetched value
+        """
+        value = fetch()
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        """Store a value in the cache
+
+        :param tuple key: A tuple of strings identifying the value
+        :param str value: The value to store
+        """
+        with self._lock:
+            self._store(key, value)
+            self._remember(key, (time(), value))
+
+    def invalidate(self, key=None):
+        """Remove values from the cache
+
+        :param tuple key: A tuple of strings identifying the value to remove,
+                          if not specified, all the values are removed
+        """
+        with self._lock:
+            if key is None:
+                self._memory.clear()
+                try:
+                    file_names = os.listdir(self.cache_dir)
+                except OSError as e:
+                    if e.errno != errno.ENOENT:
+                        raise
+                    file_names = ()
+                paths = (
+                    os.path.join(self.cache_dir, file_name)
+                    for file_name in file_names if file_name.endswith('.cfg')
+                )
+            else:
+                self._memory.pop(key, None)
+                paths = (self._path(key),)
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    if e.errno != errno.ENOENT:
+                        raise
+
+    def _is_fresh(self, stored_at):
+        """Check if a value stored at the given time did not expire yet"""
+        return self.ttl is None or time() - stored_at < self.ttl
+
+    def _remember(self, key, entry):
+        """Place a (stored_at, value) entry in the in-memory LRU store"""
+        self._memory.pop(key, None)
+        self._memory[key] = entry
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key):
+        """Get the on-disk store path for the given key"""
+        digest = sha256('\0'.join(str(part) for part in key)).hexdigest()
+        return os.path.join(self.cache_dir, digest + '.cfg')
+
+    def _load(self, key):
+        """Load a (stored_at, value) entry from the on-disk store
+
+        :returns: The entry or None if the value is not found there or
+                  had expired
+        """
+        path = self._path(key)
+        try:
+            stored_at = os.stat(path).st_mtime
+            if not self._is_fresh(stored_at):
+                return None
+            with open(path, 'r') as ofd:
+                return (stored_at, ofd.read())
+        except (IOError, OSError) as e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+
+    def _store(self, key, value):
+        """Atomically write a value into the on-disk store"""
+        try:
+            os.makedirs(self.cache_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        (cfd, tmp_name) = mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            try:
+                os.write(cfd, value)
+            finally:
+                os.close(cfd)
+            os.rename(tmp_name, self._path(key))
+        except BaseException:
+            os.remove(tmp_name)
+            raise
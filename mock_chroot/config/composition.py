@@ -2,7 +2,26 @@
 """mock_config/composition.py - Objects for composing Mock cinfiguration from
 multipile objects
 """
+from hashlib import sha256
 from itertools import izip
+from weakref import WeakValueDictionary
+
+__all__ = ['Composit', 'compose', 'ConfigurationObject', 'fingerprint']
+
+
+def fingerprint(config):
+    """Get a stable fingerprint of a Mock configuration
+
+    Configurations that yield the same configuration string have the same
+    fingerprint
+
+    :param object config: A configuration string or an object that will yield
+                          a configuration string when passed to 'str()'
+
+    :returns: A hex digest of the configuration string
+    :rtype: str
+    """
+    return sha256(str(config)).hexdigest()
 
 
 class Composit(list):
@@ -46,43 +65,166 @@ class Composit(list):
         description of configuration objects
         """
         super(Composit, self).__init__(config_objects)
+        # Maps the ids of the objects this is nested in to the objects
+        # themselves, since list objects cannot be placed in a WeakSet
+        self._parents = WeakValueDictionary()
+        self._plan = None
+        self._rendered = None
+        self._fingerprint = None
+        self._adopt(self)
 
     def initialization(self, composition_context):
         """Generate composit configuration initialization code"""
         return '\n'.join(
-            str(conf_obj.initialization(composition_context))
-            for conf_obj in self if hasattr(conf_obj, 'initialization')
+            str(initialization(composition_context))
+            for _, initialization, _, _ in self._get_plan()
+            if initialization is not None
         )
 
     def body(self, composition_context):
         """Generate composit configuration body code"""
         return '\n'.join(
-            str(conf_obj.body(composition_context)) if hasattr(conf_obj, 'body')
+            str(body(composition_context)) if body is not None
             else str(conf_obj)
-            for conf_obj in self
+            for conf_obj, _, body, _ in self._get_plan()
         )
 
     def finalization(self, composition_context):
         """Generate composit configuration finalization code"""
         return '\n'.join(
-            str(conf_obj.finalization(composition_context))
-            for conf_obj
-            in reversed([
-                conf_obj for conf_obj in self
-                if hasattr(conf_obj, 'finalization')
-            ])
+            str(finalization(composition_context))
+            for _, _, _, finalization in reversed(self._get_plan())
+            if finalization is not None
         )
 
     def __str__(self):
         """Preform to composition process and return the composit configuration
         as described in the class doctext
+
+        The result is remembered until the Composit, or any Composit nested in
+        it, is modified. Other configuration objects are assumed not to change
+        once they are added to a Composit.
         """
-        composition_context = {}
-        return '\n'.join(filter(None, (
-            self.initialization(composition_context),
-            self.body(composition_context),
-            self.finalization(composition_context)
-        )))
+        if self._rendered is None:
+            composition_context = {}
+            self._rendered = '\n'.join(filter(None, (
+                self.initialization(composition_context),
+                self.body(composition_context),
+                self.finalization(composition_context)
+            )))
+        return self._rendered
+
+    def fingerprint(self):
+        """Get a stable fingerprint of the composed configuration
+
+        :returns: A hex digest of the composit configuration string
+        :rtype: str
+        """
+        if self._fingerprint is None:
+            self._fingerprint = fingerprint(self)
+        return self._fingerprint
+
+    def _get_plan(self):
+        """Get the composition plan for this object
+
+        The plan is a list with an entry for each configuration object, listing
+        the object and its 'initialization', 'body' and 'finalization' methods,
+        or None for the methods it does not have. It is made in a single pass
+        over the configuration objects and remembered until the Composit is
+        modified.
+        """
+        if self._plan is None:
+            self._plan = [
+                (
+                    conf_obj,
+                    getattr(conf_obj, 'initialization', None),
+                    getattr(conf_obj, 'body', None),
+                    getattr(conf_obj, 'finalization', None),
+                )
+                for conf_obj in self
+            ]
+        return self._plan
+
+    def _adopt(self, config_objects):
+        """Make nested Composit objects notify this object when they change"""
+        for conf_obj in config_objects:
+            if isinstance(conf_obj, Composit):
+                # pylint: disable=protected-access
+                conf_obj._parents[id(self)] = self
+
+    def _invalidate(self):
+        """Forget the remembered composition results of this object and of the
+        objects it is nested in
+        """
+        if self._plan is None and self._rendered is None:
+            # Nothing was remembered here, so nothing was remembered by the
+            # objects this is nested in either
+            return
+        self._plan = None
+        self._rendered = None
+        self._fingerprint = None
+        for parent in self._parents.values():
+            parent._invalidate()  # pylint: disable=protected-access
+
+    # Wrap all the methods that modify the list so they invalidate the
+    # remembered composition results
+    def append(self, conf_obj):
+        super(Composit, self).append(conf_obj)
+        self._adopt((conf_obj,))
+        self._invalidate()
+
+    def extend(self, config_objects):
+        config_objects = list(config_objects)
+        super(Composit, self).extend(config_objects)
+        self._adopt(config_objects)
+        self._invalidate()
+
+    def insert(self, index, conf_obj):
+        super(Composit, self).insert(index, conf_obj)
+        self._adopt((conf_obj,))
+        self._invalidate()
+
+    def __setitem__(self, index, value):
+        super(Composit, self).__setitem__(index, value)
+        self._adopt(value if isinstance(index, slice) else (value,))
+        self._invalidate()
+
+    def __setslice__(self, start, stop, config_objects):
+        config_objects = list(config_objects)
+        super(Composit, self).__setslice__(start, stop, config_objects)
+        self._adopt(config_objects)
+        self._invalidate()
+
+    def __iadd__(self, config_objects):
+        self.extend(config_objects)
+        return self
+
+    def __imul__(self, count):
+        super(Composit, self).__imul__(count)
+        self._invalidate()
+        return self
+
+    def _invalidating(method_name):  # pylint: disable=no-self-argument
+        """Wrap a list method that removes or reorders objects so it
+        invalidates the remembered composition results
+        """
+        list_method = getattr(list, method_name)
+
+        def method(self, *args, **kwargs):
+            result = list_method(self, *args, **kwargs)
+            self._invalidate()  # pylint: disable=protected-access
+            return result
+        method.__name__ = method_name
+        method.__doc__ = list_method.__doc__
+        return method
+
+    pop = _invalidating('pop')
+    remove = _invalidating('remove')
+    reverse = _invalidating('reverse')
+    sort = _invalidating('sort')
+    __delitem__ = _invalidating('__delitem__')
+    __delslice__ = _invalidating('__delslice__')
+    del _invalidating
 
 
 compose = Composit  # syntactic sugar
@@ -127,3 +269,15 @@ class ConfigurationObject(object):
             getattr(self, method)(composition_context)
             for method in self.ALL_METHODS if hasattr(self, method)
         )))
+
+    def fingerprint(self):
+        """Get a stable fingerprint of the configuration
+
+        :returns: A hex digest of the configuration string
+        :rtype: str
+        """
+        try:
+            return self._fingerprint
+        except AttributeError:
+            self._fingerprint = fingerprint(self)
+            return self._fingerprint
@@ -1,10 +1,20 @@
 #!/usr/bin/env python
 """mock_config.py - Library of high-level Mock configuration snippets
 """
+import os
+import errno
+from time import time
+from hashlib import sha256
+from tempfile import mkstemp
+
 from .builder import to
 from .composition import compose, ConfigurationObject
 
-__all__ = ['bind_mount', 'file', 'env_vars', 'use_host_resolv']
+__all__ = [
+    'bind_mount', 'file', 'env_vars', 'use_host_resolv', 'tmpfs', 'overlayfs',
+    'lvm_root', 'ccache', 'root_cache', 'yum_cache', 'dnf_cache', 'snapshots',
+    'shared_package_cache', 'clean_file_store',
+]
 
 
 class BindMount(ConfigurationObject):
@@ -33,15 +43,405 @@ class BindMount(ConfigurationObject):
 bind_mount = BindMount  # syntactic sugar
 
 
-def file(path, content):
+class _PluginConfig(ConfigurationObject):
+    """Base class for generating configuration that enables a Mock plugin and
+    sets its options. The plugin is enabled once for the whole composition,
+    even if several objects configure it, in the same way BindMount does.
+
+    Sub classes set 'PLUGIN' to the plugin name, as used in the
+    '<name>_enable' and '<name>_opts' keys of config_opts['plugin_conf']
+    """
+    PLUGIN = None
+
+    def __init__(self, **opts):
+        """Init the configuration
+
+        :param dict opts: The plugin options to set, options set to None are
+                          left at the Mock defaults
+        """
+        super(_PluginConfig, self).__init__(body='\n'.join(
+            to['plugin_conf']['{0}_opts'.format(self.PLUGIN)][opt].set(value)
+            for opt, value in sorted(opts.iteritems()) if value is not None
+        ))
+
+    def initialization(self, composition_context):
+        flag = '{0}_enabled'.format(self.PLUGIN)
+        if composition_context.get(flag, False):
+            return ''
+        else:
+            composition_context[flag] = True
+            return to['plugin_conf']['{0}_enable'.format(self.PLUGIN)].set(
+                True
+            )
+
+
+class _SnapshotPluginConfig(_PluginConfig):
+    """Base class for plugins that snapshot the chroot, which cannot be used
+    together with the root_cache plugin. The root_cache plugin is disabled at
+    the end of the composition, overriding any configuration enabling it
+    """
+    def finalization(self, composition_context):
+        if composition_context.get('root_cache_disabled', False):
+            return ''
+        else:
+            composition_context['root_cache_disabled'] = True
+            return to['plugin_conf']['root_cache_enable'].set(False)
+
+
+class Tmpfs(_PluginConfig):
+    """Class for generating Mock tmpfs plugin configuration, which builds in
+    a chroot that resides in memory
+    """
+    PLUGIN = 'tmpfs'
+
+    def __init__(  # pylint: disable=bad-continuation
+        self, max_fs_size=None, required_ram_mb=None, keep_mounted=None,
+        mode=None, **more_opts
+    ):
+        """Init the configuration
+
+        :param str max_fs_size: The maximal size of the tmpfs, as given to
+                                the 'size' mount option, e.g. '4g'
+        :param int required_ram_mb: The amount of free memory in MiB needed
+                                    for the tmpfs to be used
+        :param bool keep_mounted: Keep the tmpfs mounted between Mock runs
+        :param str mode: The permission mode for the tmpfs mount point
+        :param dict more_opts: Additional plugin options to set
+        """
+        super(Tmpfs, self).__init__(
+            max_fs_size=max_fs_size, required_ram_mb=required_ram_mb,
+            keep_mounted=keep_mounted, mode=mode, **more_opts
+        )
+
+
+tmpfs = Tmpfs  # syntactic sugar
+
+
+class Overlayfs(_SnapshotPluginConfig):
+    """Class for generating Mock overlayfs plugin configuration, which allows
+    taking snapshots of the chroot
+    """
+    PLUGIN = 'overlayfs'
+
+    def __init__(self, base_dir=None, touch_rpmdb=None, **more_opts):
+        """Init the configuration
+
+        :param str base_dir: The directory to keep the overlay layers in
+        :param bool touch_rpmdb: Touch the rpmdb files so they get copied up
+                                 to the overlay, needed by some rpm versions
+        :param dict more_opts: Additional plugin options to set
+        """
+        super(Overlayfs, self).__init__(
+            base_dir=base_dir, touch_rpmdb=touch_rpmdb, **more_opts
+        )
+
+
+overlayfs = Overlayfs  # syntactic sugar
+
+
+class LvmRoot(_SnapshotPluginConfig):
+    """Class for generating Mock lvm_root plugin configuration, which keeps
+    the chroot in an LVM thin volume that allows taking snapshots
+    """
+    PLUGIN = 'lvm_root'
+
+    def __init__(  # pylint: disable=bad-continuation
+        self, volume_group, size=None, pool_name=None, filesystem=None,
+        **more_opts
+    ):
+        """Init the configuration
+
+        :param str volume_group: The LVM volume group to create volumes in
+        :param str size: The size of the thin pool, e.g. '8G'
+        :param str pool_name: The name of the thin pool, which can be shared
+                              between chroots
+        :param str filesystem: The file system to create on the volumes
+        :param dict more_opts: Additional plugin options to set
+        """
+        super(LvmRoot, self).__init__(
+            volume_group=volume_group, size=size, pool_name=pool_name,
+            filesystem=filesystem, **more_opts
+        )
+
+
+lvm_root = LvmRoot  # syntactic sugar
+
+
+class Ccache(_PluginConfig):
+    """Class for generating Mock ccache plugin configuration, which caches
+    compilation results between builds
+    """
+    PLUGIN = 'ccache'
+
+    def __init__(  # pylint: disable=bad-continuation
+        self, max_cache_size=None, compress=None, cache_dir=None, **more_opts
+    ):
+        """Init the configuration
+
+        :param str max_cache_size: The maximal size of the cache, e.g. '4G'
+        :param bool compress: Compress the cached files
+        :param str cache_dir: The directory to keep the cache in, giving the
+                              same directory to different chroots shares the
+                              cache between them
+        :param dict more_opts: Additional plugin options to set
+        """
+        super(Ccache, self).__init__(
+            max_cache_size=max_cache_size, compress=compress, dir=cache_dir,
+            **more_opts
+        )
+
+
+ccache = Ccache  # syntactic sugar
+
+
+class RootCache(_PluginConfig):
+    """Class for generating Mock root_cache plugin configuration, which
+    caches the initialized chroot as a tarball
+    """
+    PLUGIN = 'root_cache'
+
+    def __init__(  # pylint: disable=bad-continuation
+        self, max_age_days=None, age_check=None, compress_program=None,
+        cache_dir=None, **more_opts
+    ):
+        """Init the configuration
+
+        :param int max_age_days: The age in days after which the cache is
+                                 rebuilt
+        :param bool age_check: Rebuild the cache if the configuration is
+                               newer then it
+        :param str compress_program: The program to compress the cache with,
+                                     e.g. 'pigz'
+        :param str cache_dir: The directory to keep the cache in
+        :param dict more_opts: Additional plugin options to set
+        """
+        super(RootCache, self).__init__(
+            max_age_days=max_age_days, age_check=age_check,
+            compress_program=compress_program, dir=cache_dir, **more_opts
+        )
+
+
+root_cache = RootCache  # syntactic sugar
+
+
+class YumCache(_PluginConfig):
+    """Class for generating Mock yum_cache plugin configuration, which
+    caches downloaded packages and repository metadata between builds, for
+    both yum and dnf
+    """
+    PLUGIN = 'yum_cache'
+
+    def __init__(  # pylint: disable=bad-continuation
+        self, max_age_days=None, max_metadata_age_days=None, online=None,
+        cache_dir=None, **more_opts
+    ):
+        """Init the configuration
+
+        :param int max_age_days: The age in days after which cached packages
+                                 are removed
+        :param int max_metadata_age_days: The age in days after which cached
+                                          metadata is refreshed
+        :param bool online: Refresh the metadata when it expires, otherwise
+                            the cached metadata is used regardless of age
+        :param str cache_dir: The directory to keep the cache in
+        :param dict more_opts: Additional plugin options to set
+        """
+        super(YumCache, self).__init__(
+            max_age_days=max_age_days,
+            max_metadata_age_days=max_metadata_age_days, online=online,
+            dir=cache_dir, **more_opts
+        )
+
+
+yum_cache = YumCache  # syntactic sugar
+
+
+# Mock has no dnf_cache plugin, its yum_cache plugin caches the packages dnf
+# downloads as well
+dnf_cache = YumCache  # syntactic sugar
+
+
+def snapshots(backend='overlayfs', **opts):
+    """Enable taking snapshots of the chroot with MockChroot.snapshot()
+
+    :param str backend: The Mock plugin to use for snapshots, either
+                        'overlayfs' or 'lvm_root'
+    :param dict opts: Options for the plugin, see Overlayfs and LvmRoot
+
+    :returns: Mock configuration object
+    """
+    backends = {'overlayfs': Overlayfs, 'lvm_root': LvmRoot}
+    if backend not in backends:
+        raise ValueError("unknown snapshot backend '{0}'".format(backend))
+    return backends[backend](**opts)
+
+
+def shared_package_cache(cache_dir, package_manager='dnf'):
+    """Make the chroot use a package cache directory on the host that can be
+    shared with other chroots
+
+    The directory is bind-mounted over the package manager cache directory
+    in the chroot, and the package manager is set to keep the packages it
+    downloads there. The Mock yum_cache plugin, which keeps a cache for every
+    chroot and locks it while it is used, is disabled.
+
+    :param str cache_dir: The cache directory on the host
+    :param str package_manager: The package manager the chroot uses, either
+                                'dnf' or 'yum'
+
+    :returns: Mock configuration object
+    """
+    if package_manager not in ('dnf', 'yum'):
+        raise ValueError(
+            "unknown package manager '{0}'".format(package_manager)
+        )
+    return compose(
+        bind_mount((cache_dir, '/var/cache/{0}'.format(package_manager))),
+        to['plugin_conf']['yum_cache_enable'].set(False),
+        to['{0}_common_opts'.format(package_manager)].append(
+            '--setopt=keepcache=1'
+        ),
+    )
+
+
+# Files with content larger then this are kept out of the configuration
+FILE_INLINE_THRESHOLD = 64 * 1024
+# Side files not used for this amount of seconds are removed by
+# clean_file_store() by default
+FILE_STORE_MAX_AGE = 30 * 24 * 3600
+
+
+def file(path, content, threshold=FILE_INLINE_THRESHOLD, store_dir=None):
     """Add a file with given content to the mock environemnt
 
+    Small files are placed in the configuration as is. The content of larger
+    files is stored in a side file on the host that the configuration reads
+    when Mock loads it, so Mock does not have to parse the content as Python
+    code every time it starts. Side files are named by a hash of their
+    content, so the same content is only stored once.
+
+    Side files are shared between configurations and processes, so they are
+    not removed when the configurations using them go away. Their
+    modification time is updated every time they are used, and
+    clean_file_store() removes the ones that were not used for a while.
+
     :param str path: The path to the file inside the Mock environment
     :param str content: The content of the file
+    :param int threshold: The size in bytes above which the content is stored
+                          in a side file, or None to always place it in the
+                          configuration
+    :param str store_dir: The directory to store side files in, defaults to
+                          a 'mock_chroot/files' directory under the user's
+                          cache directory
 
     :returns: Mock configuration object
     """
-    return to['files'][path].set(content)
+    if threshold is None or len(content) <= threshold:
+        return to['files'][path].set(content)
+    return to['files'][path].set(_FileContent(_store_file(content, store_dir)))
+
+
+class _FileContent(object):
+    """Mock configuration code for reading the content of a host file, to be
+    passed as a value to the 'to' code generator
+    """
+    def __init__(self, path):
+        self.path = path
+
+    def __repr__(self):
+        return 'open({0!r}).read()'.format(self.path)
+
+
+def _store_file(content, store_dir=None):
+    """Store content in a side file named by its hash, unless such a file
+    already exists
+
+    :param str content: The content to store
+    :param str store_dir: The directory to store the file in, see 'file'
+
+    :returns: The path to the side file
+    :rtype: str
+    """
+    store_dir = _file_store_dir(store_dir)
+    store_path = os.path.join(store_dir, sha256(content).hexdigest())
+    if os.path.exists(store_path):
+        try:
+            # Mark the file as used, so clean_file_store() keeps it
+            os.utime(store_path, None)
+        except OSError:
+            # The store may be shared with other users
+            pass
+        return store_path
+    try:
+        os.makedirs(store_dir)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+    # Write atomically, so other processes storing the same content at the
+    # same time never see a partial file
+    (sfd, tmp_name) = mkstemp(dir=store_dir, suffix='.tmp')
+    try:
+        try:
+            # Mock may read the configuration as a different user
+            os.fchmod(sfd, 0644)
+            os.write(sfd, content)
+        finally:
+            os.close(sfd)
+        os.rename(tmp_name, store_path)
+    except BaseException:
+        os.remove(tmp_name)
+        raise
+    return store_path
+
+
+def clean_file_store(max_age=FILE_STORE_MAX_AGE, store_dir=None):
+    """Remove side files stored by 'file' that were not used for a while
+
+    Configurations that use a removed file stop working, so 'max_age' should
+    be longer then the configurations made by 'file' are kept for.
+
+    :param int max_age: The amount of seconds since a file was last used
+                        after which it is removed, or 0 to remove all files
+    :param str store_dir: The directory side files are stored in, see 'file'
+
+    :returns: The amount of files removed
+    :rtype: int
+    """
+    store_dir = _file_store_dir(store_dir)
+    try:
+        names = os.listdir(store_dir)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
+        return 0
+    removed = 0
+    oldest = time() - max_age
+    for name in names:
+        path = os.path.join(store_dir, name)
+        try:
+            if max_age and os.stat(path).st_mtime >= oldest:
+                continue
+            os.remove(path)
+        except OSError as e:
+            # Another process may be cleaning the store at the same time
+            if e.errno != errno.ENOENT:
+                raise
+            continue
+        removed += 1
+    return removed
+
+
+def _file_store_dir(store_dir=None):
+    """Get the absolute path of the directory side files are stored in"""
+    if store_dir is None:
+        store_dir = os.path.join(
+            os.environ.get(
+                'XDG_CACHE_HOME',
+                os.path.join(os.path.expanduser('~'), '.cache')
+            ),
+            'mock_chroot', 'files'
+        )
+    return os.path.abspath(store_dir)
 
 
 def env_vars(**vars):
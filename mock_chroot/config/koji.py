@@ -1,9 +1,10 @@
 #!/usr/bin/env python
 """mock_config/koji.py - Pull Mock configuration from Koji
 """
-from subprocess import check_output
+from multiprocessing.pool import ThreadPool
 
 from .composition import ConfigurationObject
+from ..process import check_output
 
 __all__ = ['from_koji']
 
@@ -11,8 +12,9 @@ __all__ = ['from_koji']
 class from_koji(ConfigurationObject):
     """Mock configration object to pull configuration from Koji
     """
-    def __init__(
-        self, tag=None, target=None, arch='x86_64', koji_profile='brew'
+    def __init__(  # pylint: disable=too-many-arguments,bad-continuation
+        self, tag=None, target=None, arch='x86_64', koji_profile='brew',
+        cache=None, refresh=False
     ):
         """Create a koji-based mock(1) configuration object
 
@@ -20,6 +22,9 @@ class from_koji(ConfigurationObject):
         :param str target: The Koji build target tag to pull configuration from
         :param str arch: The Koji build architecture
         :param str koji_profile: The koji configuration profile to use
+        :param KojiCache cache: An optional cache to keep the configuration in
+        :param bool refresh: Pull the configuration from Koji even if it is
+                             found in the cache
 
         One and only one of 'tag' or 'target' must be specified
         """
@@ -27,13 +32,16 @@ class from_koji(ConfigurationObject):
             tag=tag,
             target=target,
             arch=arch,
-            koji_profile=koji_profile
+            koji_profile=koji_profile,
+            cache=cache,
+            refresh=refresh
         )
         super(from_koji, self).__init__(body=config)
 
     @classmethod
-    def koji_mock_config(
-        cls, tag=None, target=None, arch='x86_64', koji_profile='brew'
+    def koji_mock_config(  # pylint: disable=too-many-arguments
+        cls, tag=None, target=None, arch='x86_64', koji_profile='brew',
+        cache=None, refresh=False
     ):
         """Get the Mock configuration for the given koji tag/target and arch
 
@@ -41,12 +49,189 @@ class from_koji(ConfigurationObject):
         :param str target: The Koji build target to pull configuration from
         :param str arch: The Koji build architecture
         :param str koji_profile: The koji configuration profile to use
+        :param KojiCache cache: An optional cache to keep the configuration in
+        :param bool refresh: Pull the configuration from Koji even if it is
+                             found in the cache
 
         One and only one of 'tag' or 'target' must be specified
 
         :rtype: str
         :returns: The Mock configuration as string
         """
+        if cache is None or bool(tag) == bool(target):
+            # Without a cache we go straight to Koji, we also do that when
+            # given bad arguments so they get reported
+            return cls._koji_mock_config(
+                tag=tag, target=target, arch=arch, koji_profile=koji_profile
+            )
+        if target:
+            tag = cls.koji_tag_for_target(
+                target=target,
+                koji_profile=koji_profile,
+                cache=cache,
+                refresh=refresh
+            )
+
+        def fetch():
+            return cls._koji_mock_config(
+                tag=tag, arch=arch, koji_profile=koji_profile
+            )
+        key = cls.cache_key(tag=tag, arch=arch, koji_profile=koji_profile)
+        if refresh:
+            return cache.refresh(key, fetch)
+        return cache.get(key, fetch)
+
+    @classmethod
+    def resolve_many(  # pylint: disable=too-many-arguments,bad-continuation
+        cls, target_arches, koji_profile='brew', max_workers=8, cache=None,
+        refresh=False
+    ):
+        """Create koji-based mock(1) configuration objects for many targets
+        and architectures at once
+
+        The build tags for all the given targets are found with a single Koji
+        query and the configuration is then pulled only once for every
+        distinct build tag and architecture, using multiple concurrent Koji
+        calls.
+
+        :param list target_arches: An Iterable of (target, arch) pairs
+        :param str koji_profile: The koji configuration profile to use
+        :param int max_workers: The maximal amount of concurrent Koji calls
+        :param KojiCache cache: An optional cache to keep the configuration in
+        :param bool refresh: Pull the configuration from Koji even if it is
+                             found in the cache
+
+        :rtype: dict
+        :returns: A dictionary mapping each given (target, arch) pair to a
+                  configuration object
+        """
+        target_arches = list(target_arches)
+        target_tags = cls._tags_for_targets(
+            set(target for target, arch in target_arches),
+            koji_profile=koji_profile, cache=cache, refresh=refresh
+        )
+        tag_arches = list(set(
+            (target_tags[target], arch) for target, arch in target_arches
+        ))
+        if not tag_arches:
+            return {}
+
+        def fetch(tag_arch):
+            return cls.koji_mock_config(
+                tag=tag_arch[0], arch=tag_arch[1], koji_profile=koji_profile,
+                cache=cache, refresh=refresh
+            )
+        pool = ThreadPool(max(1, min(max_workers, len(tag_arches))))
+        try:
+            configs = dict(zip(tag_arches, pool.map(fetch, tag_arches)))
+        finally:
+            pool.close()
+            pool.join()
+        return dict(
+            (
+                (target, arch),
+                cls._from_config(configs[(target_tags[target], arch)])
+            )
+            for target, arch in target_arches
+        )
+
+    @classmethod
+    def _from_config(cls, config):
+        """Create a configuration object from an already pulled configuration
+        string
+        """
+        obj = cls.__new__(cls)
+        ConfigurationObject.__init__(obj, body=config)
+        return obj
+
+    @classmethod
+    def _tags_for_targets(
+        cls, targets, koji_profile='brew', cache=None, refresh=False
+    ):
+        """Get the build tags for the given targets, querying Koji at most once
+
+        :rtype: dict
+        :returns: A dictionary mapping targets to build tags
+        """
+        target_tags = {}
+        missing = set(targets)
+        if cache is not None and not refresh:
+            for target in targets:
+                tag = cache.lookup(
+                    cls.cache_key(target=target, koji_profile=koji_profile)
+                )
+                if tag is not None:
+                    target_tags[target] = tag
+                    missing.discard(target)
+        if missing:
+            all_tags = cls.koji_target_tags(koji_profile=koji_profile)
+            for target in missing:
+                if target not in all_tags:
+                    raise RuntimeError(
+                        "Could not find target '{}'".format(target)
+                    )
+                target_tags[target] = all_tags[target]
+                if cache is not None:
+                    cache.put(
+                        cls.cache_key(
+                            target=target, koji_profile=koji_profile
+                        ),
+                        all_tags[target]
+                    )
+        return target_tags
+
+    @classmethod
+    def koji_target_tags(cls, koji_profile='brew'):
+        """Get the build tags for all the Koji targets
+
+        :param str koji_profile: The koji configuration profile to use
+
+        :rtype: dict
+        :returns: A dictionary mapping target names to build tag names
+        """
+        koji_cmd = [
+            cls.koji_exe(),
+            '--profile', koji_profile,
+            'list-targets',
+            '--quiet',
+        ]
+        output = check_output(koji_cmd)
+        # Each line has 3 whitespace delimited strings in it, the target name,
+        # the build tag and the destination tag
+        return dict(
+            line.split()[:2] for line in output.splitlines()
+            if len(line.split()) >= 3
+        )
+
+    @staticmethod
+    def cache_key(tag=None, target=None, arch='x86_64', koji_profile='brew'):
+        """Get the key under which Koji data is kept in a KojiCache
+
+        When given a tag, this is the key for the configuration of that tag.
+        When given a target, this is the key for the build tag of that target.
+        This can be used to remove specific data from the cache with
+        KojiCache.invalidate()
+
+        :param str tag: The Koji tag configuration was pulled from
+        :param str target: The Koji build target the tag was looked up for
+        :param str arch: The Koji build architecture
+        :param str koji_profile: The koji configuration profile used
+
+        :rtype: tuple
+        :returns: The cache key
+        """
+        if tag:
+            return ('mock_config', koji_profile, tag, arch)
+        else:
+            return ('list-targets', koji_profile, target)
+
+    @classmethod
+    def _koji_mock_config(
+        cls, tag=None, target=None, arch='x86_64', koji_profile='brew'
+    ):
+        """Pull the Mock configuration for the given koji tag/target and arch
+        from Koji, see koji_mock_config() for argument details
+        """
         koji_cmd = [
             cls.koji_exe(),
             '--profile', koji_profile,
@@ -74,14 +259,34 @@ class from_koji(ConfigurationObject):
         return output
 
     @classmethod
-    def koji_tag_for_target(cls, target, koji_profile='brew'):
+    def koji_tag_for_target(
+        cls, target, koji_profile='brew', cache=None, refresh=False
+    ):
         """Get the build tag for the given Koji target
 
         :param str target: The Koji build target to get tag for
+        :param str koji_profile: The koji configuration profile to use
+        :param KojiCache cache: An optional cache to keep the tag in
+        :param bool refresh: Query Koji even if the tag is found in the cache
 
         :rtype: str
         :returns: The Koji tag as string
         """
+        if cache is None:
+            return cls._koji_tag_for_target(target, koji_profile)
+
+        def fetch():
+            return cls._koji_tag_for_target(target, koji_profile)
+        key = cls.cache_key(target=target, koji_profile=koji_profile)
+        if refresh:
+            return cache.refresh(key, fetch)
+        return cache.get(key, fetch)
+
+    @classmethod
+    def _koji_tag_for_target(cls, target, koji_profile='brew'):
+        """Query Koji for the build tag for the given Koji target, see
+        koji_tag_for_target() for argument details
+        """
         koji_cmd = [
             cls.koji_exe(),
             '--profile', koji_profile,
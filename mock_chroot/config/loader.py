@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+"""mock_config/loader.py - Load Mock configuration into dictionaries
+"""
+import os
+from copy import deepcopy
+from threading import RLock
+
+__all__ = [
+    'ConfigLoader', 'load_config', 'render_config', 'config_diff',
+    'default_loader',
+]
+
+DEFAULT_CONFIG_PATH = '/etc/mock'
+SITE_DEFAULTS = 'site-defaults.cfg'
+USER_CONFIG = os.path.join('~', '.config', 'mock.cfg')
+
+_default_loader = None
+_default_loader_lock = RLock()
+
+
+class ConfigOpts(dict):
+    """The 'config_opts' dictionary Mock configuration code is run against
+
+    Mock fills the dictionary with defaults before running configuration
+    files. Rather then repeating all the defaults of some Mock version here,
+    missing keys are created once they are used as dictionaries or lists, so
+    code like "config_opts['plugin_conf']['ccache_opts']['dir'] = '/cache'"
+    or "config_opts['plugin_conf']['bind_mount_opts']['dirs'].append(...)"
+    works on an empty dictionary.
+    """
+    def __missing__(self, key):
+        return _MissingValue(self, key)
+
+
+class _MissingValue(object):
+    """A value missing from a ConfigOpts dictionary, that is placed in it as
+    a dictionary or a list once it is used as one
+    """
+    def __init__(self, parent, key):
+        self._parent = parent
+        self._key = key
+
+    def _become(self, value):
+        """Place a value in the dictionary instead of the missing one"""
+        self._parent[self._key] = value
+        return value
+
+    def __getitem__(self, key):
+        return self._become(ConfigOpts())[key]
+
+    def __setitem__(self, key, value):
+        self._become(ConfigOpts())[key] = value
+
+    def __iadd__(self, value):
+        return value
+
+    def append(self, value):
+        """Place a list with the given value in the dictionary"""
+        self._become([]).append(value)
+
+    def extend(self, values):
+        """Place a list with the given values in the dictionary"""
+        self._become([]).extend(values)
+
+
+class ConfigLoader(object):
+    """Load Mock configuration files and strings into 'config_opts'
+    dictionaries, without running Mock
+
+    Configuration files are run as Python code, as Mock does, with an
+    'include' function for including other files, which are looked up
+    relative to 'config_path' unless given as absolute paths.
+
+    Compiled files are kept in memory, and so are the loaded dictionaries
+    of the files passed to 'load'. They are reused as long as the
+    modification times and sizes of the files, and of all the files they
+    included, do not change.
+
+    :param str config_path: The Mock configuration directory
+    """
+    def __init__(self, config_path=DEFAULT_CONFIG_PATH):
+        """Create the loader"""
+        self.config_path = config_path
+        self._code = {}
+        self._loaded = {}
+        self._lock = RLock()
+
+    def resolve(self, root):
+        """Find the configuration file for a chroot the way 'mock --root'
+        does
+
+        :param str root: The name or path of a configuration file
+
+        :returns: The path to the configuration file
+        :rtype: str
+        """
+        if root.endswith('.cfg'):
+            return os.path.abspath(root)
+        return os.path.join(self.config_path, root + '.cfg')
+
+    def load(self, root, site=False):
+        """Load the configuration of a chroot
+
+        :param str root: The name or path of a configuration file, as given
+                         to MockChroot
+        :param bool site: If True, the site defaults file in the Mock
+                          configuration directory and the configuration file
+                          of the user are loaded around the given file, if
+                          they exist, as Mock does
+
+        :returns: The resulting 'config_opts' dictionary, which the caller
+                  may modify freely
+        :rtype: dict
+        :raises IOError: If the file or a file it includes is not found
+        """
+        path = self.resolve(root)
+        with self._lock:
+            entry = self._loaded.get((path, site))
+            if entry is None or not all(
+                _stat_key(dep_path) == dep_key
+                for dep_path, dep_key in entry[0]
+            ):
+                deps = []
+                config_opts = self._new_config_opts(path)
+                if site:
+                    self._run_file(
+                        os.path.join(self.config_path, SITE_DEFAULTS),
+                        config_opts, deps, optional=True
+                    )
+                self._run_file(path, config_opts, deps)
+                if site:
+                    self._run_file(
+                        os.path.expanduser(USER_CONFIG), config_opts, deps,
+                        optional=True
+                    )
+                entry = self._loaded[(path, site)] = (
+                    deps, _plain(config_opts)
+                )
+            return deepcopy(entry[1])
+
+    def render(self, config, name='<config>'):
+        """Run configuration code against an empty 'config_opts' dictionary
+
+        :param object config: A configuration string or an object that will
+                              yield a configuration string when passed to
+                              'str()', such as a composition of 'config'
+                              module objects
+        :param str name: The name to report in error tracebacks
+
+        :returns: The resulting 'config_opts' dictionary
+        :rtype: dict
+        """
+        config_opts = self._new_config_opts(name)
+        code = compile(str(config), name, 'exec')
+        with self._lock:
+            self._exec(code, config_opts, [])
+        return _plain(config_opts)
+
+    def invalidate(self):
+        """Forget all the compiled and loaded files"""
+        with self._lock:
+            self._code.clear()
+            self._loaded.clear()
+
+    def _new_config_opts(self, path):
+        """Create a 'config_opts' dictionary with the values Mock sets before
+        running configuration files
+        """
+        config_opts = ConfigOpts()
+        config_opts['config_path'] = self.config_path
+        config_opts['chroot_name'] = os.path.basename(path)
+        if config_opts['chroot_name'].endswith('.cfg'):
+            config_opts['chroot_name'] = config_opts['chroot_name'][:-4]
+        return config_opts
+
+    def _run_file(self, path, config_opts, deps, optional=False):
+        """Run a configuration file, compiling it if it was not compiled or
+        had changed, and record it and the files it includes in 'deps'.
+        Optional files that are not found are recorded but not run. Must be
+        called with the lock held.
+        """
+        key = _stat_key(path)
+        deps.append((path, key))
+        if key is None:
+            if optional:
+                return
+            raise IOError('Mock configuration file not found: ' + path)
+        entry = self._code.get(path)
+        if entry is None or entry[0] != key:
+            with open(path, 'r') as ofd:
+                entry = self._code[path] = (
+                    key, compile(ofd.read(), path, 'exec')
+                )
+        self._exec(entry[1], config_opts, deps)
+
+    def _exec(self, code, config_opts, deps):
+        """Run compiled configuration code with an 'include' function that
+        runs included files against the same dictionary
+        """
+        def include(config_file, *_):
+            """Include another Mock configuration file"""
+            self._run_file(
+                os.path.join(self.config_path, config_file),
+                config_opts, deps
+            )
+        exec code in {  # pylint: disable=exec-used
+            'config_opts': config_opts, 'include': include,
+        }
+
+
+def default_loader():
+    """Get the loader shared by the functions of this module, which reads
+    files under the default Mock configuration directory
+
+    :rtype: ConfigLoader
+    """
+    global _default_loader  # pylint: disable=global-statement
+    with _default_loader_lock:
+        if _default_loader is None:
+            _default_loader = ConfigLoader()
+        return _default_loader
+
+
+def load_config(root, site=False):
+    """Load the configuration of a chroot, see ConfigLoader.load
+
+    :param str root: The name or path of a Mock configuration file
+    :param bool site: If True, load the site and user configuration files
+                      as well
+
+    :rtype: dict
+    """
+    return default_loader().load(root, site)
+
+
+def render_config(config):
+    """Render configuration to a 'config_opts' dictionary without running
+    Mock, see ConfigLoader.render
+
+    :param object config: A configuration string or object
+
+    :rtype: dict
+    """
+    return default_loader().render(config)
+
+
+def config_diff(old, new):
+    """Compare two 'config_opts' dictionaries
+
+    Nested dictionaries are compared key by key, other values are compared as
+    a whole
+
+    :param dict old: The dictionary to compare from
+    :param dict new: The dictionary to compare to
+
+    :returns: A sorted list of (key_path, old_value, new_value) tuples for
+              the values that differ, where key_path is a tuple of keys and
+              missing values are given as None
+    :rtype: list
+    """
+    diff = []
+    _diff_into(diff, (), old, new)
+    return sorted(diff)
+
+
+def _diff_into(diff, key_path, old, new):
+    """Add the differences between two dictionaries to a list"""
+    for key in set(old) | set(new):
+        old_value = old.get(key)
+        new_value = new.get(key)
+        if isinstance(old_value, dict) and isinstance(new_value, dict):
+            _diff_into(diff, key_path + (key,), old_value, new_value)
+        elif old_value != new_value or (key in old) != (key in new):
+            diff.append((key_path + (key,), old_value, new_value))
+
+
+def _plain(config_opts):
+    """Convert a ConfigOpts object with the ones nested in it to plain
+    dictionaries
+    """
+    return dict(
+        (key, _plain(value) if isinstance(value, dict) else value)
+        for key, value in config_opts.iteritems()
+    )
+
+
+def _stat_key(path):
+    """Get the modification time and size of a file, or None if it is not
+    found
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+"""mock_config/optimizer.py - Render Mock configuration into a minimal form
+"""
+import ast
+
+from .builder import to
+from .loader import default_loader, config_diff
+
+__all__ = ['optimize']
+
+
+def optimize(config, verify=False):
+    """Render configuration with as few statements as possible
+
+    Configuration composed of many objects can contain many statements that
+    set the same keys or add to the same lists. Mock runs all of them every
+    time it starts. This function evaluates the statements the 'to' code
+    generator emits ahead of time and emits statements that yield the same
+    'config_opts' values:
+
+    * A key that is set more then once is only set to its last value
+    * Values set into dictionaries and lists that were set earlier are
+      merged into them
+    * Consecutive 'append' and 'extend' calls on a list are merged into one
+      'extend' call
+
+    Any other code, like the configuration pulled from Koji, is left as is,
+    and statements are never moved across it.
+
+    :param object config: A configuration string or an object that will yield
+                          a configuration string when passed to 'str()'
+    :param bool verify: If True, both the given and the optimized
+                        configuration are run with the configuration loader
+                        and checked to yield the same values
+
+    :returns: The optimized configuration string
+    :rtype: str
+    :raises RuntimeError: If verification fails
+    """
+    config = str(config)
+    try:
+        chunks = _split_statements(config)
+    except SyntaxError:
+        # Leave reporting the error to Mock
+        return config
+    if chunks is None:
+        return config
+    lines = []
+    ops = []
+    for source, stmts in chunks:
+        op = _parse_op(stmts[0]) if len(stmts) == 1 else None
+        if op is None:
+            lines.extend(_render_ops(ops))
+            ops = []
+            lines.append(source)
+        else:
+            _apply(ops, op)
+    lines.extend(_render_ops(ops))
+    optimized = '\n'.join(lines)
+    if verify:
+        _verify(config, optimized)
+    return optimized
+
+
+def _split_statements(config):
+    """Split configuration code into the source code of its statements
+
+    Statements that share a line are kept together
+
+    :returns: A list of (source, statements) pairs, where statements is a list
+              of AST nodes that may be empty for comments, or None if the
+              code could not be split reliably
+    """
+    body = ast.parse(config).body
+    lines = config.split('\n')
+    groups = []
+    for stmt in body:
+        if groups and groups[-1][0] == stmt.lineno:
+            groups[-1][1].append(stmt)
+        else:
+            groups.append((stmt.lineno, [stmt]))
+    chunks = []
+    if groups and groups[0][0] > 1:
+        chunks.append(('\n'.join(lines[:groups[0][0] - 1]), []))
+    groups.append((len(lines) + 1, []))
+    index = 0
+    while index < len(groups) - 1:
+        lineno, stmts = groups[index]
+        index += 1
+        # Line numbers of multi-line strings point to where they end rather
+        # then to where they start, so make sure the split is right and
+        # add following statements to the chunk until it is
+        while True:
+            source = '\n'.join(lines[lineno - 1:groups[index][0] - 1])
+            try:
+                parsed = ast.parse(source).body
+            except SyntaxError:
+                parsed = None
+            if parsed is not None and \
+                    map(ast.dump, parsed) == map(ast.dump, stmts):
+                break
+            if index == len(groups) - 1:
+                return None
+            stmts = stmts + groups[index][1]
+            index += 1
+        chunks.append((source, stmts))
+    return chunks
+
+
+def _parse_op(stmt):
+    """Parse a statement emitted by the 'to' code generator
+
+    :returns: A (kind, path, value) tuple where kind is one of 'set',
+              'append' or 'extend', path is a tuple of keys and value is the
+              value the statement uses, or None if the statement is not of
+              a supported form
+    """
+    if isinstance(stmt, ast.Assign) and len(stmt.targets) == 1:
+        kind = 'set'
+        path = _parse_path(stmt.targets[0])
+        value_node = stmt.value
+    elif (
+        isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call) and
+        isinstance(stmt.value.func, ast.Attribute) and
+        stmt.value.func.attr in ('append', 'extend') and
+        len(stmt.value.args) == 1 and not stmt.value.keywords and
+        stmt.value.starargs is None and stmt.value.kwargs is None
+    ):
+        kind = stmt.value.func.attr
+        path = _parse_path(stmt.value.func.value)
+        value_node = stmt.value.args[0]
+    else:
+        return None
+    if not path:
+        return None
+    try:
+        value = ast.literal_eval(value_node)
+    except ValueError:
+        return None
+    return (kind, path, value)
+
+
+def _parse_path(node):
+    """Parse a "config_opts[key1][key2]..." expression
+
+    :returns: A tuple of keys or None if the expression is of a different
+              form or the keys are not constants
+    """
+    path = []
+    while isinstance(node, ast.Subscript):
+        if not isinstance(node.slice, ast.Index):
+            return None
+        try:
+            key = ast.literal_eval(node.slice.value)
+            hash(key)
+        except (ValueError, TypeError):
+            return None
+        path.append(key)
+        node = node.value
+    if not (isinstance(node, ast.Name) and node.id == 'config_opts'):
+        return None
+    return tuple(reversed(path))
+
+
+def _apply(ops, op):
+    """Add an operation to a list of operations, merging it with the ones
+    already there where possible
+    """
+    kind, path, value = op
+    if kind == 'set':
+        # Setting a key overrides any earlier changes to it
+        ops[:] = [
+            prev_op for prev_op in ops if not _is_within(prev_op[1], path)
+        ]
+    # Only the latest operation that touches the same key or a key it
+    # contains or is contained in can be merged with
+    for index in xrange(len(ops) - 1, -1, -1):
+        prev_kind, prev_path, prev_value = ops[index]
+        if _is_within(path, prev_path):
+            if prev_kind == 'set':
+                if _fold(prev_value, path[len(prev_path):], kind, value):
+                    return
+            elif prev_path == path and kind != 'set':
+                ops[index] = (
+                    'extend', path,
+                    _items(prev_kind, prev_value) + _items(kind, value)
+                )
+                return
+            break
+        if _is_within(prev_path, path):
+            break
+    ops.append(op)
+
+
+def _is_within(path, other_path):
+    """Check if a key path is the same as, or nested in, another"""
+    return path[:len(other_path)] == other_path
+
+
+def _fold(container, rel_path, kind, value):
+    """Apply an operation to a value that was set earlier
+
+    :param object container: The value that was set
+    :param tuple rel_path: The path the operation applies to, relative to the
+                           value
+    :param str kind: The kind of operation
+    :param object value: The value the operation uses
+
+    :returns: True if the operation could be applied
+    :rtype: bool
+    """
+    target = container
+    for key in rel_path[:-1]:
+        if not isinstance(target, dict) or key not in target:
+            return False
+        target = target[key]
+    if rel_path:
+        if not isinstance(target, dict):
+            return False
+        if kind == 'set':
+            target[rel_path[-1]] = value
+            return True
+        target = target.get(rel_path[-1])
+    if not isinstance(target, list):
+        return False
+    target.extend(_items(kind, value))
+    return True
+
+
+def _items(kind, value):
+    """Get the items an 'append' or 'extend' operation adds to a list"""
+    if kind == 'append':
+        return [value]
+    return list(value)
+
+
+def _render_ops(ops):
+    """Render operations to configuration statements"""
+    lines = []
+    for kind, path, value in ops:
+        config_key = to
+        for key in path:
+            config_key = config_key[key]
+        if kind == 'extend' and isinstance(value, list) and len(value) == 1:
+            lines.append(config_key.append(value[0]))
+        else:
+            lines.append(getattr(config_key, kind)(value))
+    return lines
+
+
+def _verify(config, optimized):
+    """Check that optimized configuration yields the same values as the
+    original configuration
+
+    :raises RuntimeError: If it does not
+    """
+    loader = default_loader()
+    diff = config_diff(loader.render(config), loader.render(optimized))
+    if diff:
+        raise RuntimeError(
+            'optimized configuration differs from the original at: ' +
+            ', '.join(repr(list(key_path)) for key_path, _, _ in diff)
+        )
@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+"""mock_chroot/configfiles.py - Lifecycle management for the configuration
+files mock_chroot writes for mock(1)
+"""
+import os
+import errno
+import atexit
+from shutil import rmtree
+from hashlib import sha256
+from tempfile import mkdtemp
+from threading import Lock
+
+__all__ = ['ConfigFileManager', 'default_manager']
+
+_default_manager = None
+_default_manager_lock = Lock()
+
+
+class ConfigFileManager(object):
+    """Write configuration files for mock(1) and remove them once they are no
+    longer used
+
+    Every distinct configuration is written once, to a file named by the hash
+    of its content, and the users of every file are counted. Acquiring a
+    configuration that is already in use does not touch the disk at all. The
+    file is removed when the last user releases it.
+
+    Objects of this class are context managers, all the files they wrote are
+    removed when the context is exited or when cleanup() is called.
+
+    :param str config_dir: The directory to write files to, a new temporary
+                           directory is created when the first file is
+                           written if this is not given
+    """
+    def __init__(self, config_dir=None):
+        """Create the manager, no files are written until acquire() is
+        called
+        """
+        self._config_dir = config_dir
+        self._own_dir = config_dir is None
+        self._refs = {}
+        self._lock = Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cleanup()
+
+    @property
+    def config_dir(self):
+        """The directory configuration files are written to"""
+        with self._lock:
+            return self._get_config_dir()
+
+    def acquire(self, config, config_fingerprint=None):
+        """Get a file with the given configuration, writing it if needed
+
+        Every call must be matched by a call to release() once the file is
+        not needed any more
+
+        :param str config: The configuration string
+        :param str config_fingerprint: The fingerprint of the configuration,
+                                       calculated from it if not given
+
+        :returns: The path to the configuration file
+        :rtype: str
+        """
+        if config_fingerprint is None:
+            config_fingerprint = sha256(config).hexdigest()
+        with self._lock:
+            cfg_name = os.path.join(
+                self._get_config_dir(),
+                'mock-{0}.cfg'.format(config_fingerprint)
+            )
+            refs = self._refs.get(cfg_name, 0)
+            if refs == 0:
+                with open(cfg_name, 'w') as ofd:
+                    ofd.write(config)
+            self._refs[cfg_name] = refs + 1
+        return cfg_name
+
+    def release(self, cfg_name):
+        """Release a configuration file returned from acquire(), removing it
+        if it is not used any more
+
+        :param str cfg_name: The path to the file
+        """
+        with self._lock:
+            refs = self._refs.pop(cfg_name, 0) - 1
+            if refs > 0:
+                self._refs[cfg_name] = refs
+            elif refs == 0:
+                _remove(cfg_name)
+
+    def users(self, cfg_name):
+        """Get the amount of users of a configuration file
+
+        :param str cfg_name: The path to the file
+
+        :rtype: int
+        """
+        with self._lock:
+            return self._refs.get(cfg_name, 0)
+
+    def cleanup(self):
+        """Remove all the configuration files written by this object,
+        whether or not they are still used
+        """
+        with self._lock:
+            for cfg_name in self._refs:
+                _remove(cfg_name)
+            self._refs = {}
+            if self._own_dir and self._config_dir is not None:
+                rmtree(self._config_dir, ignore_errors=True)
+                self._config_dir = None
+
+    def _get_config_dir(self):
+        """Get the configuration directory, creating it if needed, must be
+        called with the lock held
+        """
+        if self._config_dir is None:
+            self._config_dir = mkdtemp(prefix='mock_chroot-')
+        elif not self._own_dir and not os.path.isdir(self._config_dir):
+            try:
+                os.makedirs(self._config_dir)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+        return self._config_dir
+
+
+def default_manager():
+    """Get the manager MockChroot objects use for their configuration files
+
+    The manager is created on first use, and the files it wrote are removed
+    when the interpreter exits, even if MockChroot objects using them were
+    never closed
+
+    :rtype: ConfigFileManager
+    """
+    global _default_manager  # pylint: disable=global-statement
+    with _default_manager_lock:
+        if _default_manager is None:
+            _default_manager = ConfigFileManager()
+            atexit.register(_default_manager.cleanup)
+        return _default_manager
+
+
+def _remove(path):
+    """Remove a file, ignoring it if it is already gone"""
+    try:
+        os.remove(path)
+    except OSError as e:
+        if e.errno != errno.ENOENT:
+            raise
@@ -0,0 +1,365 @@
+#!/usr/bin/env python
+"""mock_chroot/instrumentation.py - Time and resource accounting for the
+commands mock_chroot runs
+"""
+import os
+import json
+import errno
+from time import time
+from tempfile import mkstemp
+from threading import Lock
+from collections import deque
+
+__all__ = [
+    'Invocation', 'Hook', 'add_hook', 'remove_hook', 'Collector',
+]
+
+_global_hooks = []
+_global_hooks_lock = Lock()
+
+
+class Invocation(object):
+    """A single mock(1) or koji(1) command run by mock_chroot
+
+    Invocation objects are passed to the 'pre' hooks before the command is
+    started, when only 'argv' and 'started' are set, and to the 'post' hooks
+    once the command exits, with all the attributes set.
+
+    Resource usage is taken from wait4(2), so it covers the command and all
+    of the processes it started and waited for.
+
+    :ivar tuple argv: The command line
+    :ivar float started: The time the command was started, in seconds since
+                         epoch
+    :ivar float wall_time: The time the command ran, in seconds
+    :ivar float user_time: The CPU time spent in user mode, in seconds
+    :ivar float system_time: The CPU time spent in kernel mode, in seconds
+    :ivar int max_rss: The maximal resident set size of the command, or of
+                       the largest of the processes it waited for, in bytes
+    :ivar int returncode: The exit code of the command, negative if it was
+                          killed by a signal
+    :ivar int output_size: The amount of bytes read from the command output
+    :ivar bool cancelled: True if the command was cancelled
+    """
+    def __init__(self, argv):
+        """Create an invocation record for a command about to be started"""
+        self.argv = tuple(argv)
+        self.started = time()
+        self.wall_time = None
+        self.user_time = None
+        self.system_time = None
+        self.max_rss = None
+        self.returncode = None
+        self.output_size = 0
+        self.cancelled = False
+        self._hooks = ()
+
+    @property
+    def cpu_time(self):
+        """The total CPU time of the command in seconds"""
+        if self.user_time is None:
+            return None
+        return self.user_time + self.system_time
+
+    @property
+    def tool(self):
+        """The name of the executable that was run"""
+        return os.path.basename(self.argv[0])
+
+    @property
+    def operation(self):
+        """The operation the command performed, which is the first mock(1)
+        option that is not a common option, or the koji(1) sub-command
+        """
+        args = iter(self.argv[1:])
+        for arg in args:
+            if arg == '--profile':
+                next(args, None)
+            elif not arg.startswith(('--root=', '--uniqueext=')):
+                return arg.lstrip('-')
+        return ''
+
+    def as_dict(self):
+        """Get the invocation as a dictionary that can be serialized to JSON
+
+        :rtype: dict
+        """
+        return {
+            'argv': list(self.argv),
+            'tool': self.tool,
+            'operation': self.operation,
+            'started': self.started,
+            'wall_time': self.wall_time,
+            'user_time': self.user_time,
+            'system_time': self.system_time,
+            'cpu_time': self.cpu_time,
+            'max_rss': self.max_rss,
+            'returncode': self.returncode,
+            'output_size': self.output_size,
+            'cancelled': self.cancelled,
+        }
+
+    def __repr__(self):
+        return '<Invocation {0} returncode={1}>'.format(
+            ' '.join(self.argv), self.returncode
+        )
+
+
+class Hook(object):
+    """A pair of functions to call around the commands mock_chroot runs
+
+    Objects of this class are returned from add_hook() and
+    MockChroot.add_hook(), and can be passed to the matching 'remove_hook'
+    function to unregister the functions.
+
+    :param callable pre: An optional function to call with an Invocation
+                         object before the command is started
+    :param callable post: An optional function to call with an Invocation
+                          object after the command exits
+    """
+    def __init__(self, pre=None, post=None):
+        self.pre = pre
+        self.post = post
+
+
+def add_hook(pre=None, post=None):
+    """Register functions to call around every command mock_chroot runs
+
+    See Hook for details about the arguments
+
+    :rtype: Hook
+    """
+    hook = Hook(pre, post)
+    with _global_hooks_lock:
+        _global_hooks.append(hook)
+    return hook
+
+
+def remove_hook(hook):
+    """Unregister functions registered with add_hook()
+
+    :param Hook hook: The object returned from add_hook()
+    """
+    with _global_hooks_lock:
+        _global_hooks.remove(hook)
+
+
+def start(argv, hooks=()):
+    """Create an Invocation for a command about to be started and pass it to
+    the 'pre' hooks
+
+    :param list argv: The command line
+    :param list hooks: Hooks to call in addition to the global ones
+
+    :rtype: Invocation
+    """
+    invocation = Invocation(argv)
+    invocation._hooks = _all_hooks(hooks)  # pylint: disable=protected-access
+    for hook in invocation._hooks:  # pylint: disable=protected-access
+        if hook.pre is not None:
+            hook.pre(invocation)
+    return invocation
+
+
+def finish(invocation, proc, output_size, cancelled=False):
+    """Wait for a command to exit, record its resource usage and pass the
+    Invocation to the 'post' hooks
+
+    :param Invocation invocation: The object returned from start()
+    :param Popen proc: The process running the command
+    :param int output_size: The amount of bytes read from the command
+    :param bool cancelled: True if the command was cancelled
+
+    :returns: The exit code of the command
+    :rtype: int
+    """
+    returncode, rusage = wait4(proc)
+    invocation.wall_time = time() - invocation.started
+    invocation.returncode = returncode
+    invocation.output_size = output_size
+    invocation.cancelled = cancelled
+    if rusage is not None:
+        invocation.user_time = rusage.ru_utime
+        invocation.system_time = rusage.ru_stime
+        # Linux reports the RSS in KiB
+        invocation.max_rss = rusage.ru_maxrss * 1024
+    for hook in invocation._hooks:  # pylint: disable=protected-access
+        if hook.post is not None:
+            hook.post(invocation)
+    return returncode
+
+
+def wait4(proc):
+    """Wait for a Popen process to exit and get its resource usage
+
+    :param Popen proc: The process to wait for
+
+    :returns: A (returncode, rusage) pair, where rusage is None if the
+              process was already waited for
+    :rtype: tuple
+    """
+    if proc.returncode is not None:
+        return proc.returncode, None
+    while True:
+        try:
+            status, rusage = os.wait4(proc.pid, 0)[1:]
+            break
+        except OSError as e:
+            if e.errno == errno.EINTR:
+                continue
+            if e.errno == errno.ECHILD:
+                return proc.wait(), None
+            raise
+    if os.WIFSIGNALED(status):
+        proc.returncode = -os.WTERMSIG(status)
+    else:
+        proc.returncode = os.WEXITSTATUS(status)
+    return proc.returncode, rusage
+
+
+def _all_hooks(hooks):
+    """Get the global hooks followed by the given ones"""
+    with _global_hooks_lock:
+        return list(_global_hooks) + list(hooks or ())
+
+
+class Collector(object):
+    """Collect Invocation objects and export them for monitoring
+
+    A collector is meant to be registered as a 'post' hook::
+
+        collector = Collector(jsonl='/var/log/mock_chroot.jsonl')
+        add_hook(post=collector.record)
+
+    Totals are kept for every (tool, operation, status) combination, and can
+    be exported in the Prometheus text exposition format. The individual
+    invocations can be written as JSON lines.
+
+    :param object jsonl: An optional file object or path of a file to append
+                         every recorded invocation to as a JSON line
+    :param int max_records: The amount of most recent invocations to keep in
+                            memory in 'records'
+    """
+    PREFIX = 'mock_chroot_command'
+
+    def __init__(self, jsonl=None, max_records=1000):
+        """Create an empty collector"""
+        self._jsonl = jsonl
+        self.records = deque(maxlen=max_records)
+        self.totals = {}
+        self._lock = Lock()
+
+    def record(self, invocation):
+        """Record an invocation that finished
+
+        :param Invocation invocation: The invocation to record
+        """
+        with self._lock:
+            self.records.append(invocation)
+            status = 'ok' if invocation.returncode == 0 else 'failed'
+            key = (invocation.tool, invocation.operation, status)
+            totals = self.totals.setdefault(key, dict(
+                count=0, wall_time=0.0, cpu_time=0.0, max_rss=0,
+                output_size=0,
+            ))
+            totals['count'] += 1
+            totals['wall_time'] += invocation.wall_time or 0.0
+            totals['cpu_time'] += invocation.cpu_time or 0.0
+            totals['max_rss'] = max(totals['max_rss'], invocation.max_rss or 0)
+            totals['output_size'] += invocation.output_size
+            if self._jsonl is not None:
+                self._write_jsonl_line(invocation)
+
+    def write_jsonl(self, jsonl):
+        """Write the invocations kept in 'records' as JSON lines
+
+        :param object jsonl: A file object or path of a file to write to
+        """
+        with self._lock:
+            records = list(self.records)
+        if isinstance(jsonl, basestring):
+            with open(jsonl, 'w') as ofd:
+                self.write_jsonl(ofd)
+            return
+        for invocation in records:
+            jsonl.write(json.dumps(invocation.as_dict(), sort_keys=True))
+            jsonl.write('\n')
+
+    def to_prometheus(self):
+        """Export the totals in the Prometheus text exposition format
+
+        :rtype: str
+        """
+        metrics = (
+            ('total', 'count', 'counter', 'Commands run'),
+            (
+                'wall_seconds_total', 'wall_time', 'counter',
+                'Wall clock time spent running commands',
+            ),
+            (
+                'cpu_seconds_total', 'cpu_time', 'counter',
+                'CPU time used by commands',
+            ),
+            (
+                'max_rss_bytes', 'max_rss', 'gauge',
+                'Largest resident set size of a command',
+            ),
+            (
+                'output_bytes_total', 'output_size', 'counter',
+                'Output read from commands',
+            ),
+        )
+        with self._lock:
+            totals = sorted(self.totals.iteritems())
+        lines = []
+        for suffix, field, metric_type, help_text in metrics:
+            name = '{0}_{1}'.format(self.PREFIX, suffix)
+            lines.append('# HELP {0} {1}'.format(name, help_text))
+            lines.append('# TYPE {0} {1}'.format(name, metric_type))
+            for (tool, operation, status), values in totals:
+                lines.append(
+                    '{0}{{tool="{1}",operation="{2}",status="{3}"}} {4}'
+                    .format(
+                        name, _escape_label(tool), _escape_label(operation),
+                        status, repr(values[field])
+                    )
+                )
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Write the totals in the Prometheus text exposition format to a
+        file, replacing it atomically, as needed by the node exporter
+        textfile collector
+
+        :param str path: The path of the file to write
+        """
+        text = self.to_prometheus()
+        (pfd, tmp_name) = mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp'
+        )
+        try:
+            try:
+                os.write(pfd, text)
+            finally:
+                os.close(pfd)
+            os.rename(tmp_name, path)
+        except BaseException:
+            os.remove(tmp_name)
+            raise
+
+    def _write_jsonl_line(self, invocation):
+        """Append an invocation to the JSON lines file, must be called with
+        the collector lock held
+        """
+        line = json.dumps(invocation.as_dict(), sort_keys=True) + '\n'
+        if isinstance(self._jsonl, basestring):
+            with open(self._jsonl, 'a') as ofd:
+                ofd.write(line)
+        else:
+            self._jsonl.write(line)
+            self._jsonl.flush()
+
+
+def _escape_label(value):
+    """Escape a Prometheus label value"""
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,339 @@
+#!/usr/bin/env python
+"""mock_chroot/matrix.py - Run many mock(1) builds concurrently
+"""
+import os
+from time import time
+from threading import Thread, Condition
+from subprocess import CalledProcessError
+from multiprocessing import cpu_count
+
+from .process import MockTimeoutError
+
+__all__ = [
+    'BuildMatrix', 'BuildJob', 'JobResult', 'MatrixResults',
+    'default_concurrency',
+]
+
+GiB = 1024 ** 3
+
+
+class BuildJob(object):
+    """A single build to be run by a BuildMatrix
+
+    :param MockChroot mock: The chroot to build in
+    :param str src_rpm: The path to the .src.rpm file to build
+    :param str name: A name for the job, used for naming its result directory
+    :param str resultdir: Override where the build results get placed
+    """
+    def __init__(self, mock, src_rpm, name, resultdir=None):
+        """Create the job"""
+        self.mock = mock
+        self.src_rpm = src_rpm
+        self.name = name
+        self.resultdir = resultdir
+        self.root_key = _root_key(mock)
+
+    def __repr__(self):
+        return '<BuildJob {0}>'.format(self.name)
+
+
+def _root_key(mock):
+    """Get a key identifying the chroot a MockChroot object builds in
+
+    mock(1) names chroots after the 'root' configuration option and the
+    unique extension, so objects with different configurations can still
+    share a chroot. The location of the chroot is used where it can be
+    found, otherwise objects are assumed to share a chroot only if their
+    configurations are the same.
+    """
+    try:
+        return mock.root_info().root_path
+    except Exception:  # pylint: disable=broad-except
+        return (mock.fingerprint(), mock.unique_ext)
+
+
+class JobResult(object):
+    """The result of a single BuildMatrix job
+
+    :ivar BuildJob job: The job this is the result of
+    :ivar float started: The time the build started, as seconds since epoch
+    :ivar float finished: The time the build finished, as seconds since epoch
+    :ivar int returncode: The exit code of mock(1), or None if the build
+                          failed before mock could run
+    :ivar str output: The output of mock(1)
+    :ivar Exception error: The exception raised by the build, if any
+    """
+    def __init__(self, job):
+        """Create a result object for the given job"""
+        self.job = job
+        self.started = None
+        self.finished = None
+        self.returncode = None
+        self.output = None
+        self.error = None
+
+    @property
+    def resultdir(self):
+        """The directory where the build results were placed"""
+        return self.job.resultdir
+
+    @property
+    def duration(self):
+        """The time the build took in seconds"""
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    @property
+    def ok(self):
+        """True if the build succeeded"""
+        return self.returncode == 0
+
+    def __repr__(self):
+        return '<JobResult {0} returncode={1}>'.format(
+            self.job.name, self.returncode
+        )
+
+
+class MatrixResults(list):
+    """The list of JobResult objects returned by BuildMatrix.run(), in the
+    same order jobs were added to the matrix
+    """
+    @property
+    def ok(self):
+        """True if all the builds succeeded"""
+        return all(result.ok for result in self)
+
+    @property
+    def succeeded(self):
+        """The list of results of the builds that succeeded"""
+        return [result for result in self if result.ok]
+
+    @property
+    def failed(self):
+        """The list of results of the builds that failed"""
+        return [result for result in self if not result.ok]
+
+
+class BuildMatrix(object):
+    """Run many mock(1) builds concurrently
+
+    Jobs are run by a pool of worker threads, each running mock(1) builds via
+    MockChroot.rebuild(). Jobs that use the same chroot are never run at the
+    same time, so the amount of concurrent builds is also limited by the
+    amount of distinct chroots used by the jobs.
+
+    MockChroot objects the matrix creates from configurations given to add()
+    are closed once run() finishes, so their configuration files are removed
+    right away. Objects of this class are also context managers that close
+    them when the context is exited, for matrices that are never run.
+
+    :param list jobs: An optional Iterable of (config, src_rpm) pairs of jobs
+                      to add to the matrix, see add() for details
+    :param int max_workers: The maximal amount of concurrent builds, defaults
+                            to a value derived from the amount of CPUs and
+                            available memory
+    :param int mem_per_job: The amount of memory in bytes to assume each build
+                            needs when calculating the default 'max_workers'
+    :param str resultdir: A directory under which a result directory will be
+                          made for each job
+    :param bool no_clean: Avoid cleaning the chroots before building
+    :param object define: An optional define string for the build process
+                          or an Iterable of multiple such define strings.
+    :param float timeout: An optional amount of seconds each build may run
+                          for, builds that run for longer are killed so they
+                          do not hold on to a worker
+    """
+    def __init__(  # pylint: disable=too-many-arguments,bad-continuation
+        self, jobs=(), max_workers=None, mem_per_job=2 * GiB, resultdir=None,
+        no_clean=False, define=None, timeout=None
+    ):
+        """Create the build matrix"""
+        if max_workers is None:
+            max_workers = default_concurrency(mem_per_job)
+        self.max_workers = max_workers
+        self.resultdir = resultdir
+        self.no_clean = no_clean
+        self.define = define
+        self.timeout = timeout
+        self.jobs = []
+        self._own_mocks = []
+        for config, src_rpm in jobs:
+            self.add(config, src_rpm)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the MockChroot objects the matrix created, the chroots
+        themselves are left in place
+        """
+        while self._own_mocks:
+            self._own_mocks.pop().close()
+
+    def add(self, config, src_rpm, name=None, resultdir=None):
+        """Add a job to the matrix
+
+        :param object config: A MockChroot object to build in, or a
+                              configuration to create one with, as would be
+                              passed to the 'config' argument of MockChroot,
+                              the created object is closed by close()
+        :param str src_rpm: The path to the .src.rpm file to build
+        :param str name: An optional name for the job, if not given, a name
+                         is generated from the job index and src_rpm
+        :param str resultdir: Override where the build results get placed,
+                              if not given, and the matrix was given a
+                              'resultdir', a directory named by the job name
+                              is used under it
+
+        :returns: The added job
+        :rtype: BuildJob
+        """
+        # Avoid a circular import
+        from mock_chroot import MockChroot
+
+        if isinstance(config, MockChroot):
+            mock = config
+        else:
+            mock = MockChroot(config=config)
+            self._own_mocks.append(mock)
+        if name is None:
+            name = '{0:03}-{1}'.format(
+                len(self.jobs),
+                os.path.basename(src_rpm).replace('.src.rpm', '')
+            )
+        if resultdir is None and self.resultdir is not None:
+            resultdir = os.path.join(self.resultdir, name)
+        job = BuildJob(mock, src_rpm, name, resultdir)
+        self.jobs.append(job)
+        return job
+
+    def run(self):
+        """Run all the jobs in the matrix and wait for them to finish, then
+        close the MockChroot objects the matrix created
+
+        :returns: The results of all the jobs
+        :rtype: MatrixResults
+        """
+        scheduler = _Scheduler(self.jobs)
+        workers = [
+            Thread(target=self._worker, args=(scheduler,))
+            for _ in xrange(max(1, min(self.max_workers, len(self.jobs))))
+        ]
+        try:
+            for worker in workers:
+                worker.daemon = True
+                worker.start()
+            for worker in workers:
+                worker.join()
+        finally:
+            self.close()
+        return MatrixResults(scheduler.results[job] for job in self.jobs)
+
+    def _worker(self, scheduler):
+        """Run jobs from the scheduler until there are none left"""
+        while True:
+            job = scheduler.next_job()
+            if job is None:
+                return
+            try:
+                scheduler.results[job] = self._run_job(job)
+            finally:
+                scheduler.job_done(job)
+
+    def _run_job(self, job):
+        """Run a single job
+
+        :rtype: JobResult
+        """
+        result = JobResult(job)
+        result.started = time()
+        try:
+            result.output = job.mock.rebuild(
+                job.src_rpm,
+                no_clean=self.no_clean,
+                define=self.define,
+                resultdir=job.resultdir,
+                timeout=self.timeout,
+            )
+            result.returncode = 0
+        except CalledProcessError as e:
+            result.returncode = e.returncode
+            result.output = e.output
+            result.error = e
+        except MockTimeoutError as e:
+            result.output = e.output
+            result.error = e
+        except Exception as e:  # pylint: disable=broad-except
+            result.error = e
+        result.finished = time()
+        return result
+
+
+class _Scheduler(object):
+    """Hand out jobs to worker threads so that jobs sharing a chroot never
+    run at the same time
+    """
+    def __init__(self, jobs):
+        self.pending = list(jobs)
+        self.busy_roots = set()
+        self.results = {}
+        self.condition = Condition()
+
+    def next_job(self):
+        """Wait for a job that can be run
+
+        :returns: The job to run next, or None if there are no more jobs
+        """
+        with self.condition:
+            while self.pending:
+                for index, job in enumerate(self.pending):
+                    if job.root_key not in self.busy_roots:
+                        del self.pending[index]
+                        self.busy_roots.add(job.root_key)
+                        return job
+                self.condition.wait()
+            return None
+
+    def job_done(self, job):
+        """Mark a job as done, so its chroot could be used again"""
+        with self.condition:
+            self.busy_roots.discard(job.root_key)
+            self.condition.notify_all()
+
+
+def default_concurrency(mem_per_job=2 * GiB):
+    """Calculate a default amount of concurrent builds for this machine
+
+    :param int mem_per_job: The amount of memory in bytes to assume each build
+                            needs
+
+    :returns: The amount of CPUs, or the amount of builds the available memory
+              can sustain, whichever is smaller
+    :rtype: int
+    """
+    workers = cpu_count()
+    mem_available = _mem_available()
+    if mem_available is not None and mem_per_job:
+        workers = min(workers, mem_available // mem_per_job)
+    return max(1, workers)
+
+
+def _mem_available():
+    """Get the amount of available memory in bytes from /proc/meminfo
+
+    :returns: The amount of available memory or None if it cannot be found
+    """
+    meminfo = {}
+    try:
+        with open('/proc/meminfo') as ofd:
+            for line in ofd:
+                fields = line.split()
+                if len(fields) >= 2:
+                    meminfo[fields[0].rstrip(':')] = int(fields[1]) * 1024
+    except (IOError, ValueError):
+        return None
+    return meminfo.get('MemAvailable', meminfo.get('MemTotal'))
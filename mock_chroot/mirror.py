@@ -0,0 +1,377 @@
+#!/usr/bin/env python
+"""mock_chroot/mirror.py - A local caching mirror for the package repositories
+mock(1) chroots use
+"""
+import os
+import re
+import errno
+import shutil
+import urllib
+import urllib2
+from time import time
+from hashlib import sha256
+from tempfile import mkstemp
+from threading import Thread, Lock
+from urlparse import urlsplit
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
+
+from .config import compose, to, render_config
+
+__all__ = ['RepoMirror', 'rewrite_repos']
+
+# Repository metadata files that are replaced in place when the repository
+# changes, all other files are named by their content and never change
+METADATA_FILES = ('repomd.xml', 'repomd.xml.asc', 'repomd.xml.key')
+REPO_CONF_KEYS = ('yum.conf', 'dnf.conf')
+
+_OPTION_LINE = re.compile(r'^(\w+)\s*=\s*(.*)$')
+_SECTION_LINE = re.compile(r'^\[([^\]]+)\]\s*$')
+
+
+class RepoMirror(object):
+    """A local HTTP server that serves package repositories from an on-disk
+    cache, fetching files from the upstream repositories on first use
+
+    Objects of this class are context managers that start the server when
+    the context is entered and stop it when it is exited. Configuration for
+    chroots that should use the mirror is made with 'config'::
+
+        with RepoMirror() as mirror:
+            config = mirror.config(base_config)
+            matrix = BuildMatrix((config, src_rpm) for src_rpm in src_rpms)
+            results = matrix.run()
+
+    Packages are cached forever, since they are named by their content.
+    Repository metadata index files are fetched again once they are older
+    than 'metadata_ttl'.
+
+    :param str cache_dir: The directory to cache files in, defaults to a
+                          'mock_chroot/mirror' directory under the user's
+                          cache directory
+    :param str host: The address to listen on
+    :param int port: The port to listen on, a free port is picked if this is
+                     0
+    :param int metadata_ttl: The time in seconds cached metadata index files
+                             remain valid for
+
+    :ivar int hits: The amount of requests served from the cache
+    :ivar int misses: The amount of requests that required fetching files
+                      from the upstream repositories
+    """
+    def __init__(
+        self, cache_dir=None, host='127.0.0.1', port=0, metadata_ttl=300
+    ):
+        """Create the mirror, the server is not started until 'start' is
+        called
+        """
+        if cache_dir is None:
+            cache_dir = os.path.join(
+                os.environ.get(
+                    'XDG_CACHE_HOME',
+                    os.path.join(os.path.expanduser('~'), '.cache')
+                ),
+                'mock_chroot', 'mirror'
+            )
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.host = host
+        self.port = port
+        self.metadata_ttl = metadata_ttl
+        self.hits = 0
+        self.misses = 0
+        self._repos = {}
+        self._server = None
+        self._thread = None
+        self._lock = Lock()
+        self._fetch_locks = {}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def url(self):
+        """The base URL of the server, available once it is started"""
+        if self._server is None:
+            raise RuntimeError('repository mirror is not started')
+        return 'http://{0}:{1}'.format(*self._server.server_address[:2])
+
+    def start(self):
+        """Start serving in a background thread"""
+        if self._server is not None:
+            return
+        self._server = _MirrorServer((self.host, self.port), _MirrorHandler)
+        self._server.mirror = self
+        self._thread = Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stop serving, cached files are kept"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+
+    def add_repo(self, name, baseurl):
+        """Mirror an upstream repository
+
+        :param str name: A name for the repository
+        :param str baseurl: The URL of the upstream repository, any URL
+                            supported by urllib2, including file:// URLs
+
+        :returns: The URL the repository is served at by the mirror
+        :rtype: str
+        """
+        if not baseurl.endswith('/'):
+            baseurl += '/'
+        key = '{0}-{1}'.format(
+            re.sub(r'[^\w.-]', '_', name), sha256(baseurl).hexdigest()[:12]
+        )
+        with self._lock:
+            self._repos[key] = baseurl
+        return '{0}/{1}/'.format(self.url, key)
+
+    def config(self, config):
+        """Make configuration that points chroots at the mirror
+
+        The repositories in the 'yum.conf' and 'dnf.conf' options of the
+        given configuration are added to the mirror, and configuration that
+        replaces their 'baseurl' options with the mirror URLs is added to
+        it. Repositories that only have 'mirrorlist' or 'metalink' options,
+        or use variables that cannot be expanded, are left as they are.
+
+        :param object config: A configuration string or object
+
+        :returns: Mock configuration object
+        """
+        config_opts = render_config(config)
+        overrides = []
+        for conf_key in REPO_CONF_KEYS:
+            repo_conf = config_opts.get(conf_key)
+            if not isinstance(repo_conf, basestring):
+                continue
+            rewritten = rewrite_repos(
+                repo_conf, self.add_repo, _repo_variables(config_opts)
+            )
+            if rewritten != repo_conf:
+                overrides.append(to[conf_key].set(rewritten))
+        return compose(config, *overrides)
+
+    def _fetch(self, key, rel_path):
+        """Get a file from the cache, fetching it from upstream if needed
+
+        :param str key: The key the repository was added under
+        :param str rel_path: The path of the file in the repository
+
+        :returns: The path to the cached file
+        :rtype: str
+        :raises KeyError: If the repository is not known
+        :raises IOError: If fetching the file failed
+        """
+        upstream = self._repos[key]
+        path = os.path.join(self.cache_dir, key, rel_path)
+        with self._lock:
+            fetch_lock = self._fetch_locks.get(path)
+            if fetch_lock is None:
+                fetch_lock = self._fetch_locks[path] = _FetchLock()
+            fetch_lock.users += 1
+        try:
+            # Only one thread fetches any given file, others wait for it
+            with fetch_lock.lock:
+                fresh = self._is_fresh(path)
+                with self._lock:
+                    if fresh:
+                        self.hits += 1
+                    else:
+                        self.misses += 1
+                if not fresh:
+                    self._download(upstream + urllib.quote(rel_path), path)
+                return path
+        finally:
+            with self._lock:
+                fetch_lock.users -= 1
+                if not fetch_lock.users:
+                    del self._fetch_locks[path]
+
+    def _is_fresh(self, path):
+        """Check if a cached file exists and is still valid"""
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return False
+        if os.path.basename(path) in METADATA_FILES:
+            return time() - mtime < self.metadata_ttl
+        return True
+
+    @staticmethod
+    def _download(url, path):
+        """Atomically download a URL into a file"""
+        try:
+            os.makedirs(os.path.dirname(path))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        upstream = urllib2.urlopen(url)
+        try:
+            (dfd, tmp_name) = mkstemp(
+                dir=os.path.dirname(path), suffix='.tmp'
+            )
+            try:
+                with os.fdopen(dfd, 'wb') as ofd:
+                    shutil.copyfileobj(upstream, ofd)
+                os.chmod(tmp_name, 0644)
+                os.rename(tmp_name, path)
+            except BaseException:
+                os.remove(tmp_name)
+                raise
+        finally:
+            upstream.close()
+
+
+class _FetchLock(object):
+    """A lock for fetching a single file, that is kept only while there are
+    threads using it
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.users = 0
+
+
+class _MirrorServer(ThreadingMixIn, HTTPServer):
+    """HTTP server handling every request in its own thread"""
+    daemon_threads = True
+    mirror = None
+
+
+class _MirrorHandler(BaseHTTPRequestHandler):
+    """Serve files from the RepoMirror the server belongs to"""
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve a file"""
+        self._serve(body=True)
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        """Serve the headers of a file"""
+        self._serve(body=False)
+
+    def _serve(self, body):
+        """Serve a file from the mirror"""
+        parts = urllib.unquote(urlsplit(self.path).path).split('/')
+        parts = [part for part in parts if part]
+        if len(parts) < 2 or '..' in parts or '.' in parts:
+            self.send_error(404)
+            return
+        try:
+            path = self.server.mirror._fetch(  # pylint: disable=W0212
+                parts[0], '/'.join(parts[1:])
+            )
+        except KeyError:
+            self.send_error(404)
+            return
+        except urllib2.HTTPError as e:
+            self.send_error(e.code)
+            return
+        except urllib2.URLError as e:
+            # Missing files in file:// repositories are reported this way
+            missing = getattr(e.reason, 'errno', None) == errno.ENOENT
+            self.send_error(404 if missing else 502)
+            return
+        except (IOError, OSError, ValueError):
+            self.send_error(502)
+            return
+        with open(path, 'rb') as ifd:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header(
+                'Content-Length', str(os.fstat(ifd.fileno()).st_size)
+            )
+            self.end_headers()
+            if body:
+                shutil.copyfileobj(ifd, self.wfile)
+
+    def log_message(self, *args):  # pylint: disable=arguments-differ
+        """Keep quiet, the package manager reports failures"""
+        pass
+
+
+def rewrite_repos(repo_conf, add_repo, variables=None):
+    """Replace the base URLs of the repositories in yum/dnf configuration
+
+    :param str repo_conf: The configuration file content
+    :param callable add_repo: A function that takes a repository name and
+                              upstream URL and returns the URL to use instead
+    :param dict variables: Values for variables such as '$basearch' used in
+                           the URLs
+
+    :returns: The rewritten configuration
+    :rtype: str
+    """
+    sections = [(None, [])]
+    for line in repo_conf.splitlines(True):
+        match = _SECTION_LINE.match(line.strip())
+        if match is not None:
+            sections.append((match.group(1), []))
+        sections[-1][1].append(line)
+    output = []
+    for name, lines in sections:
+        if name is not None and name != 'main':
+            lines = _rewrite_section(name, lines, add_repo, variables or {})
+        output.extend(lines)
+    return ''.join(output)
+
+
+def _rewrite_section(name, lines, add_repo, variables):
+    """Rewrite the lines of a single repository section, if it has a base URL
+    that can be mirrored
+    """
+    options = []
+    for line in lines:
+        match = _OPTION_LINE.match(line)
+        if match is not None:
+            options.append([match.group(1), [line]])
+        elif options and line[:1] in ' \t' and line.strip():
+            # A continuation of the previous option value
+            options[-1][1].append(line)
+        else:
+            options.append([None, [line]])
+    baseurls = [
+        ''.join(option_lines).split('=', 1)[1].split()
+        for option, option_lines in options if option == 'baseurl'
+    ]
+    if not baseurls or not baseurls[0]:
+        return lines
+    upstream = baseurls[0][0].strip(',')
+    for var_name, value in variables.iteritems():
+        upstream = upstream.replace('$' + var_name, value)
+    if '$' in upstream:
+        return lines
+    local_url = add_repo(name, upstream)
+    output = []
+    for option, option_lines in options:
+        if option == 'baseurl':
+            output.append('baseurl={0}\n'.format(local_url))
+        elif option not in ('mirrorlist', 'metalink'):
+            output.extend(option_lines)
+    return output
+
+
+def _repo_variables(config_opts):
+    """Get the values of the variables in repository URLs from the chroot
+    configuration
+    """
+    variables = {}
+    arch = config_opts.get('target_arch')
+    if isinstance(arch, basestring):
+        variables['arch'] = arch
+        variables['basearch'] = 'i386' if re.match(r'i[3-6]86$', arch) \
+            else arch
+    releasever = config_opts.get('releasever')
+    if isinstance(releasever, basestring):
+        variables['releasever'] = releasever
+    return variables
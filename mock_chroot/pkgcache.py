@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""mock_chroot/pkgcache.py - A package cache shared by parallel mock(1)
+chroots
+"""
+import os
+import errno
+import fcntl
+from threading import Lock, Event
+
+from .config import shared_package_cache
+from .process import check_output
+
+__all__ = ['PackageCache']
+
+
+class PackageCache(object):
+    """A package cache directory shared by many chroots
+
+    Chroots are pointed at the cache by composing the object returned from
+    'config' into their configuration. Before building packages in many
+    chroots in parallel, 'prefetch' can be used to download the packages the
+    builds need into the cache once, rather then once in every chroot::
+
+        cache = PackageCache('/var/cache/mock_chroot/packages')
+        mc = MockChroot(config=compose(base_config, cache.config()))
+        cache.prefetch(mc, src_rpms)
+
+    Prefetching is single-flight. Packages that are already being downloaded
+    by another thread are not downloaded again, instead the thread waits for
+    the download to finish, and fails with the same error if it does. A lock
+    file in the cache directory makes other processes sharing the cache wait
+    as well.
+
+    :param str cache_dir: The cache directory on the host
+    :param str package_manager: The package manager the chroots use, either
+                                'dnf' or 'yum', detected from the host if
+                                not given
+    """
+    LOCK_FILE = '.mock_chroot_prefetch.lock'
+
+    def __init__(self, cache_dir, package_manager=None):
+        """Create the cache object, the directory is created if needed"""
+        # Avoid a circular import
+        from mock_chroot import MockChroot
+
+        self.cache_dir = os.path.abspath(cache_dir)
+        if package_manager is None:
+            package_manager = 'dnf' if MockChroot.has_dnf() else 'yum'
+        self.package_manager = package_manager
+        try:
+            os.makedirs(self.cache_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        self._fetched = set()
+        self._in_flight = {}
+        self._lock = Lock()
+
+    def config(self):
+        """Get the configuration that makes a chroot use the cache
+
+        :returns: Mock configuration object
+        """
+        return shared_package_cache(self.cache_dir, self.package_manager)
+
+    @staticmethod
+    def build_requires(src_rpms):
+        """Get the build requirements of source packages
+
+        :param list src_rpms: The paths to .src.rpm files
+
+        :returns: The union of the requirements, sorted
+        :rtype: list
+        """
+        src_rpms = tuple(src_rpms)
+        if not src_rpms:
+            return []
+        output = check_output(
+            ('rpm', '-qp', '--requires', '--nosignature') + src_rpms
+        )
+        return sorted(set(
+            line.strip() for line in output.splitlines()
+            if line.strip() and not line.startswith('rpmlib(')
+        ))
+
+    def prefetch(self, mock, src_rpms=(), packages=()):
+        """Download packages into the cache
+
+        Packages already downloaded through this object are skipped
+
+        :param MockChroot mock: A chroot using the cache, to run the package
+                                manager in, it is initialized if needed
+        :param list src_rpms: Paths to .src.rpm files whose build
+                              requirements to download
+        :param list packages: Additional packages to download
+
+        :returns: The packages that were downloaded by this call
+        :rtype: list
+        :raises CalledProcessError: If the download fails, or the download of
+                                    some of the packages by another thread
+                                    failed
+        """
+        wanted = sorted(set(self.build_requires(src_rpms)) | set(packages))
+        download = _Download()
+        with self._lock:
+            waits = set(
+                self._in_flight[package] for package in wanted
+                if package in self._in_flight
+            )
+            to_fetch = [
+                package for package in wanted
+                if package not in self._fetched and
+                package not in self._in_flight
+            ]
+            for package in to_fetch:
+                self._in_flight[package] = download
+        try:
+            if to_fetch:
+                self._download(mock, to_fetch)
+        except BaseException as e:
+            download.error = e
+            raise
+        finally:
+            with self._lock:
+                for package in to_fetch:
+                    del self._in_flight[package]
+                if download.error is None:
+                    self._fetched.update(to_fetch)
+            download.done.set()
+        for other in waits:
+            other.done.wait()
+            if other.error is not None:
+                raise other.error
+        return to_fetch
+
+    def _download(self, mock, packages):
+        """Download packages into the cache by running the package manager in
+        a chroot, holding the cache lock file
+        """
+        if not mock.is_initialized():
+            mock.init()
+        with open(os.path.join(self.cache_dir, self.LOCK_FILE), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                mock.pm_cmd('install', '--downloadonly', '-y', *packages)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class _Download(object):
+    """A download of packages in progress, for threads waiting for it"""
+    def __init__(self):
+        self.done = Event()
+        self.error = None
@@ -0,0 +1,264 @@
+#!/usr/bin/env python
+"""mock_chroot/pool.py - Keep pre-initialized mock(1) chroots ready for use
+"""
+import os
+from uuid import uuid4
+from itertools import count
+from threading import Condition
+from contextlib import contextmanager
+
+from .process import wait_all
+from .config.composition import fingerprint
+
+__all__ = ['ChrootPool']
+
+
+class ChrootPool(object):
+    """A pool of pre-initialized mock(1) chroots
+
+    The pool keeps up to 'size' chroots for each distinct configuration. The
+    chroots are told apart by giving each one a unique extension, which
+    starts with a prefix unique to the pool, so pools in the same or in
+    different processes never share chroots. Chroots
+    are initialized when they are created, handed out with checkout(), and
+    reset when they are returned to the pool, so the costly initialization
+    is done only once for many uses.
+
+    Since checked out chroots are already initialized, they should be used
+    with the 'no_clean' option of 'rebuild' and 'buildsrpm'.
+
+    :param int size: The maximal amount of chroots to keep for each
+                     configuration
+    :param int max_uses: An optional amount of uses after which a chroot is
+                         retired. Retired chroots are cleaned and replaced
+                         with fresh ones when needed
+    :param object reset: How to reset chroots when they are returned to the
+                         pool, can be one of:
+                         - 'builddir' - Remove the build directory
+                         - 'clean' - Clean the chroot, which causes it to be
+                           initialized again when checked out
+                         - 'rollback' - Roll the chroot back to a snapshot
+                           taken right after it was initialized, this
+                           requires the chroot configuration to enable
+                           snapshots, see mock_chroot.config.snapshots
+                         - None - Do not reset the chroots
+                         - A callable that takes a MockChroot object and
+                           resets it
+    :param str config_dir: An optional directory for configuration files, see
+                           the MockChroot argument of the same name
+
+    :ivar str ext_prefix: The prefix of the unique extensions of the chroots
+                          of the pool
+    """
+    RESET_METHODS = ('builddir', 'clean', 'rollback', None)
+    SNAPSHOT = 'mock_chroot_pool_init'
+
+    def __init__(
+        self, size=2, max_uses=None, reset='builddir', config_dir=None
+    ):
+        """Create an empty pool"""
+        if reset not in self.RESET_METHODS and not callable(reset):
+            raise ValueError("unknown reset method '{0}'".format(reset))
+        self.size = size
+        self.max_uses = max_uses
+        self.reset = reset
+        self.config_dir = config_dir
+        self._condition = Condition()
+        self.ext_prefix = 'pool{0}-{1}-'.format(os.getpid(), uuid4().hex[:8])
+        self._chroot_ids = count()
+        self._idle = {}
+        self._total = {}
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @contextmanager
+    def checkout(self, root=None, config=None):
+        """Check out a chroot from the pool
+
+        The chroot is returned to the pool when the context is exited. If an
+        exception is raised inside the context, the chroot is retired rather
+        then returned to the pool.
+
+        :param str root: The name or path for the mock configuration file to
+                         use
+        :param str config: The Mock configuration for the chroot
+
+        'root' and 'config' are mutually exclusive, see MockChroot for
+        details
+
+        :returns: A context manager yielding an initialized MockChroot object
+        """
+        pooled = self._acquire(root, config)
+        try:
+            if not pooled.initialized:
+                pooled.mock.init()
+                self._initialized(pooled)
+            yield pooled.mock
+        except BaseException:
+            self._retire(pooled)
+            raise
+        self._release(pooled)
+
+    def warm(self, root=None, config=None, amount=None):
+        """Create and initialize chroots for the given configuration ahead of
+        time
+
+        The chroots are initialized concurrently. Chroots that fail to
+        initialize are cleaned and removed from the pool, and the error of the
+        first one is raised once all the others are done.
+
+        :param str root: The name or path for the mock configuration file to
+                         use
+        :param str config: The Mock configuration for the chroot
+        :param int amount: The amount of chroots the pool should have for the
+                           configuration, defaults to the pool size
+        """
+        if amount is None:
+            amount = self.size
+        key = self._key(root, config)
+        created = []
+        with self._condition:
+            while self._total.get(key, 0) < min(amount, self.size):
+                created.append(self._create(key, root, config))
+        error = None
+        try:
+            procs = [pooled.mock.async_init() for pooled in created]
+            wait_all(procs)
+            for pooled, proc in zip(created, procs):
+                try:
+                    proc.result()
+                    self._initialized(pooled)
+                except Exception as e:  # pylint: disable=broad-except
+                    error = error or e
+        finally:
+            for pooled in created:
+                if pooled.initialized:
+                    self._release(pooled, used=False)
+                else:
+                    # The chroot may be partly initialized
+                    self._retire(pooled)
+        if error is not None:
+            raise error  # pylint: disable=raising-bad-type
+
+    def close(self):
+        """Clean and remove all the idle chroots from the pool
+
+        Chroots that are checked out are cleaned when they are returned
+        """
+        with self._condition:
+            self._closed = True
+            idle = [
+                pooled for chroots in self._idle.itervalues()
+                for pooled in chroots
+            ]
+            self._idle = {}
+        for pooled in idle:
+            self._retire(pooled, remove=False)
+
+    def _key(self, root, config):
+        """Get the key chroots of the given configuration are kept under"""
+        # Avoid a circular import
+        from mock_chroot import MockChroot
+
+        if config:
+            return fingerprint(config)
+        return MockChroot(root=root).fingerprint()
+
+    def _create(self, key, root, config):
+        """Create a new pooled chroot, must be called with the pool lock
+        held
+        """
+        # Avoid a circular import
+        from mock_chroot import MockChroot
+
+        mock = MockChroot(
+            root=root, config=config, config_dir=self.config_dir,
+            unique_ext=self.ext_prefix + str(next(self._chroot_ids))
+        )
+        self._total[key] = self._total.get(key, 0) + 1
+        return _PooledChroot(key, mock)
+
+    def _initialized(self, pooled):
+        """Mark a chroot as initialized, and take the snapshot to roll back
+        to if needed
+        """
+        if self.reset == 'rollback':
+            pooled.mock.snapshot(self.SNAPSHOT)
+        pooled.initialized = True
+
+    def _acquire(self, root, config):
+        """Get an idle chroot from the pool, creating a new one or waiting for
+        one to be returned if needed
+        """
+        key = self._key(root, config)
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError('the chroot pool is closed')
+                if self._idle.get(key):
+                    return self._idle[key].pop()
+                if self._total.get(key, 0) < self.size:
+                    return self._create(key, root, config)
+                self._condition.wait()
+
+    def _release(self, pooled, used=True):
+        """Reset a chroot and return it to the pool, or retire it if it was
+        used too many times
+        """
+        if used:
+            pooled.uses += 1
+        if self._closed or (self.max_uses and pooled.uses >= self.max_uses):
+            self._retire(pooled)
+            return
+        if used:
+            try:
+                self._reset(pooled)
+            except Exception:  # pylint: disable=broad-except
+                self._retire(pooled)
+                return
+        with self._condition:
+            self._idle.setdefault(pooled.key, []).append(pooled)
+            self._condition.notify()
+
+    def _reset(self, pooled):
+        """Reset a chroot that was returned to the pool"""
+        if self.reset == 'builddir':
+            pooled.mock.chroot('rm', '-rf', '/builddir/build')
+        elif self.reset == 'clean':
+            pooled.mock.clean()
+            pooled.initialized = False
+        elif self.reset == 'rollback':
+            pooled.mock.rollback(self.SNAPSHOT)
+        elif callable(self.reset):
+            self.reset(pooled.mock)
+
+    def _retire(self, pooled, clean=True, remove=True):
+        """Remove a chroot from the pool, cleaning it to free disk space
+
+        Cleaning is done on a best-effort basis, since there is not much to
+        be done about a chroot that cannot be cleaned beyond not using it
+        """
+        if clean:
+            try:
+                pooled.mock.clean()
+            except Exception:  # pylint: disable=broad-except
+                pass
+        pooled.mock.close()
+        if remove:
+            with self._condition:
+                self._total[pooled.key] -= 1
+                self._condition.notify()
+
+
+class _PooledChroot(object):
+    """A chroot kept in a ChrootPool"""
+    def __init__(self, key, mock):
+        self.key = key
+        self.mock = mock
+        self.uses = 0
+        self.initialized = False
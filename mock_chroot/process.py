@@ -0,0 +1,630 @@
+#!/usr/bin/env python
+"""mock_chroot/process.py - Run mock(1) commands in the background
+"""
+import os
+import errno
+import signal
+import resource
+from time import time
+from collections import deque
+from select import select, error as select_error
+from subprocess import Popen, PIPE, CalledProcessError
+
+from . import instrumentation
+
+__all__ = [
+    'MockProcess', 'MockCancelledError', 'MockTimeoutError', 'wait_any',
+    'wait_all', 'stream_output', 'check_output',
+]
+
+
+class MockCancelledError(RuntimeError):
+    """Raised when getting the result of a MockProcess that was cancelled
+
+    :ivar tuple cmd: The command that was running when the process was
+                     cancelled
+    :ivar str output: The output the command had produced before it was
+                      cancelled
+    """
+    def __init__(self, cmd, output):
+        super(MockCancelledError, self).__init__(
+            "Command '{0}' was cancelled".format(' '.join(cmd))
+        )
+        self.cmd = cmd
+        self.output = output
+
+
+class MockTimeoutError(MockCancelledError):
+    """Raised when getting the result of a MockProcess that was killed
+    because it ran for longer then its timeout
+
+    :ivar tuple cmd: The command that was running when the timeout expired
+    :ivar str output: The output the command had produced before it was
+                      killed
+    :ivar float timeout: The timeout that expired, in seconds
+    """
+    def __init__(self, cmd, output, timeout):
+        super(MockTimeoutError, self).__init__(cmd, output)
+        self.args = (
+            "Command '{0}' timed out after {1} seconds".format(
+                ' '.join(cmd), timeout
+            ),
+        )
+        self.timeout = timeout
+
+
+class MockProcess(object):
+    """A mock(1) operation running in the background
+
+    Objects of this class are not meant to be created directly, instead they
+    are returned from the 'async_*' methods of MockChroot. An operation may
+    consist of several mock(1) commands that are run one after the other,
+    the operation fails as soon as one of them does.
+
+    The output of the running command is only collected when one of the
+    poll(), wait() or result() methods is called, or when the object is passed
+    to wait_any() or wait_all(). Objects of this class have a fileno() method
+    so they can also be passed to select() to find out when they need to be
+    polled.
+
+    Each command is run in its own session and process group so that
+    cancel() can terminate it along with all the processes it started. The
+    same happens when the operation runs for longer then 'timeout', and then
+    result() raises MockTimeoutError. Since output is only collected when the
+    object is polled or waited on, the timeout is also only enforced then.
+    Being in their own sessions, commands do not receive the signals the
+    terminal sends, so if waiting for an operation is interrupted by an
+    exception, such as KeyboardInterrupt, the operation is cancelled.
+
+    :param list commands: The command lines of the commands to run
+    :param callable postprocess: An optional function to pass the output of
+                                 the last command through to get the result
+    :param callable on_output: An optional function to call with a stream
+                               name ('stdout' or 'stderr') and a chunk of data
+                               whenever output is read from the commands
+    :param bool capture_stderr: Read the standard error of the commands
+                                rather then letting it pass through, this only
+                                makes sense if 'on_output' is also given
+    :param bool collect: Keep the standard output of the last command in
+                         memory so it can be returned from 'result'
+    :param callable on_exit: An optional function to call with the exit code
+                             of the operation once it is done
+    :param list hooks: Optional instrumentation hooks to call around every
+                       command, in addition to the global ones, see
+                       mock_chroot.instrumentation for details
+    :param float timeout: An optional amount of seconds the whole operation
+                          may run for
+    :param dict rlimits: Optional resource limits to apply to the commands,
+                         mapping names of limits, such as 'cpu', 'as' or
+                         'nofile', or resource.RLIMIT_* constants to a limit
+                         or to a (soft, hard) pair of limits
+    """
+    READ_SIZE = 64 * 1024
+    # The amount of seconds commands are given to exit after being sent
+    # SIGTERM when they are cancelled, before they are sent SIGKILL
+    KILL_GRACE = 10
+
+    def __init__(  # pylint: disable=too-many-arguments,bad-continuation
+        self, commands, postprocess=None, on_output=None,
+        capture_stderr=False, collect=True, on_exit=None, hooks=None,
+        timeout=None, rlimits=None
+    ):
+        """Start the first command"""
+        self._commands = list(commands)
+        if not self._commands:
+            raise RuntimeError('no commands given to run')
+        self._postprocess = postprocess
+        self._on_output = on_output
+        self._on_exit = on_exit
+        self._hooks = hooks
+        self._capture_stderr = capture_stderr
+        self._collect = collect
+        self._chunks = []
+        self._pipes = {}
+        self._proc = None
+        self._invocation = None
+        self._output_size = 0
+        self._cancelled = False
+        self._timeout = timeout
+        self._deadline = None if timeout is None else time() + timeout
+        self._timed_out = False
+        self._preexec = _preexec(_rlimits(rlimits))
+        self.cmd = None
+        self.returncode = None
+        self._start_next()
+
+    def __del__(self):
+        try:
+            if not self.done:
+                self.cancel()
+        except AttributeError:
+            pass
+
+    @property
+    def done(self):
+        """True if the operation is finished, failed or was cancelled"""
+        return self.returncode is not None
+
+    @property
+    def cancelled(self):
+        """True if the operation was cancelled"""
+        return self._cancelled
+
+    @property
+    def timed_out(self):
+        """True if the operation was killed because its timeout expired"""
+        return self._timed_out
+
+    def fileno(self):
+        """Get the file descriptor the standard output of the running command
+        can be read from
+        """
+        return self._proc.stdout.fileno()
+
+    def poll(self):
+        """Collect any output available without blocking, and start the next
+        command if the running one is finished
+
+        :returns: True if the operation is done
+        :rtype: bool
+        """
+        while not self.done and self._pump(0):
+            pass
+        self._check_timeout()
+        return self.done
+
+    def wait(self, timeout=None):
+        """Wait for the operation to finish
+
+        :param float timeout: An optional amount of seconds to wait for
+
+        :returns: True if the operation is done, False if the timeout
+                  expired
+        :rtype: bool
+        """
+        return self in wait_all((self,), timeout)
+
+    def result(self, timeout=None):
+        """Wait for the operation to finish and get its result
+
+        This method behaves in a similar manner to subprocess.check_output
+        yielding CalledProcessError on command failure
+
+        :param float timeout: An optional amount of seconds to wait for, if
+                              it expires the operation is cancelled
+
+        :returns: The output of the last command, as passed through the
+                  'postprocess' function
+        :rtype: str
+        :raises MockTimeoutError: If the operation ran for longer then the
+                                  timeout it was created with
+        """
+        if not self.wait(timeout):
+            self.cancel()
+        output = ''.join(self._chunks)
+        if self._timed_out:
+            raise MockTimeoutError(self.cmd, output, self._timeout)
+        if self._cancelled:
+            raise MockCancelledError(self.cmd, output)
+        if self.returncode != 0:
+            raise CalledProcessError(self.returncode, self.cmd, output=output)
+        if self._postprocess is not None:
+            return self._postprocess(output)
+        return output
+
+    def cancel(self, grace=None):
+        """Cancel the operation by killing the running command and all the
+        processes it started
+
+        If the processes cannot be signalled, as happens when mock(1) runs
+        via consolehelper or a setuid wrapper, they are left running and the
+        operation is marked as done without waiting for them.
+
+        :param float grace: An optional amount of seconds to give the
+                            processes to exit after sending them SIGTERM,
+                            before sending them SIGKILL. Output they produce
+                            meanwhile is still collected. Defaults to
+                            KILL_GRACE, pass 0 to kill them right away.
+        """
+        if self.done:
+            return
+        if grace is None:
+            grace = self.KILL_GRACE
+        self._cancelled = True
+        signalled = True
+        if grace > 0:
+            signalled = _killpg(self._proc.pid, signal.SIGTERM)
+            if signalled:
+                self._drain(grace)
+        if signalled:
+            signalled = _killpg(self._proc.pid, signal.SIGKILL)
+        if not signalled:
+            # Waiting for processes we cannot kill could block forever
+            self._proc.returncode = -signal.SIGKILL
+        self._finish_command()
+        self._exited()
+
+    def _drain(self, timeout):
+        """Collect output until the running command closes its output pipes
+        or the timeout expires
+        """
+        deadline = time() + timeout
+        while self._pipes:
+            remaining = deadline - time()
+            if remaining <= 0:
+                return
+            try:
+                readable = select(self._fds(), [], [], remaining)[0]
+            except select_error as e:
+                if e.args[0] != errno.EINTR:
+                    raise
+                continue
+            for fd in readable:
+                if not self._consume(fd):
+                    del self._pipes[fd]
+
+    def _time_left(self):
+        """Get the amount of seconds until the timeout expires, or None if
+        there is no timeout
+        """
+        if self._deadline is None or self.done:
+            return None
+        return max(0, self._deadline - time())
+
+    def _check_timeout(self):
+        """Kill the operation if its timeout expired"""
+        if self._time_left() == 0:
+            self._timed_out = True
+            self.cancel()
+
+    def _start_next(self):
+        """Start the next command of the operation"""
+        self.cmd = self._commands.pop(0)
+        self._chunks = []
+        self._output_size = 0
+        self._invocation = instrumentation.start(self.cmd, self._hooks)
+        self._proc = Popen(
+            self.cmd,
+            stdout=PIPE,
+            stderr=PIPE if self._capture_stderr else None,
+            close_fds=True,
+            preexec_fn=self._preexec,
+        )
+        self._pipes = {self._proc.stdout.fileno(): 'stdout'}
+        if self._capture_stderr:
+            self._pipes[self._proc.stderr.fileno()] = 'stderr'
+
+    def _fds(self):
+        """Get the file descriptors output can currently be read from"""
+        return list(self._pipes)
+
+    def _pump(self, timeout=None):
+        """Wait for output from the running command and read it
+
+        :param float timeout: An optional amount of seconds to wait for
+
+        :returns: True if any output was read or the operation is done, False
+                  if the timeout expired
+        :rtype: bool
+        """
+        time_left = self._time_left()
+        if time_left is not None and (timeout is None or time_left < timeout):
+            timeout = time_left
+        try:
+            readable = select(self._fds(), [], [], timeout)[0]
+        except select_error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            return False
+        for fd in readable:
+            self._read(fd)
+        self._check_timeout()
+        return bool(readable) or self.done
+
+    def _read(self, fd):
+        """Read a chunk of output from the running command, blocking until
+        some output is available or the pipe is closed
+
+        :param int fd: The file descriptor to read from
+        """
+        if self._consume(fd):
+            return
+        del self._pipes[fd]
+        if self._pipes:
+            return
+        returncode = self._finish_command()
+        if returncode == 0 and self._commands:
+            self.returncode = None
+            self._start_next()
+        else:
+            self._exited()
+
+    def _consume(self, fd):
+        """Read a chunk of output from the running command and pass it on
+
+        :param int fd: The file descriptor to read from
+
+        :returns: False if the pipe was closed
+        :rtype: bool
+        """
+        data = os.read(fd, self.READ_SIZE)
+        if not data:
+            return False
+        self._output_size += len(data)
+        stream = self._pipes[fd]
+        if self._collect and stream == 'stdout':
+            self._chunks.append(data)
+        if self._on_output is not None:
+            self._on_output(stream, data)
+        return True
+
+    def _exited(self):
+        """Notify the 'on_exit' function that the operation is done"""
+        if self._on_exit is not None:
+            self._on_exit(self.returncode)
+
+    def _finish_command(self):
+        """Close the output pipes of the running command and wait for it to
+        exit
+
+        :returns: The exit code of the command
+        """
+        self._pipes = {}
+        self._proc.stdout.close()
+        if self._proc.stderr is not None:
+            self._proc.stderr.close()
+        self.returncode = instrumentation.finish(
+            self._invocation, self._proc, self._output_size, self._cancelled
+        )
+        return self.returncode
+
+
+def wait_any(processes, timeout=None):
+    """Wait for at least one of the given operations to finish
+
+    :param list processes: An Iterable of MockProcess objects
+    :param float timeout: An optional amount of seconds to wait for
+
+    :returns: The set of finished operations, which is empty if the timeout
+              expired before any operation finished
+    :rtype: set
+    """
+    return _wait(processes, timeout, any)
+
+
+def wait_all(processes, timeout=None):
+    """Wait for all of the given operations to finish
+
+    :param list processes: An Iterable of MockProcess objects
+    :param float timeout: An optional amount of seconds to wait for
+
+    :returns: The set of finished operations, which includes all of them
+              unless the timeout expired
+    :rtype: set
+    """
+    return _wait(processes, timeout, all)
+
+
+def _wait(processes, timeout, condition):
+    """Collect the output of the given operations until they satisfy the given
+    condition or the timeout expires
+
+    :param callable condition: Either 'any' or 'all'
+    """
+    processes = list(processes)
+    try:
+        return _wait_until(processes, timeout, condition)
+    except BaseException:
+        # The commands run in their own sessions so they do not see signals
+        # sent to the terminal, make sure they do not outlive an interrupted
+        # wait
+        for proc in processes:
+            proc.cancel()
+        raise
+
+
+def _wait_until(processes, timeout, condition):
+    """Collect the output of the given operations until they satisfy the
+    given condition or the timeout expires, see _wait
+    """
+    deadline = None if timeout is None else time() + timeout
+    while True:
+        running = [proc for proc in processes if not proc.done]
+        if not running or condition(proc.done for proc in processes):
+            break
+        if deadline is None:
+            remaining = None
+        else:
+            remaining = deadline - time()
+            if remaining <= 0:
+                break
+        # Wake up in time to kill operations whose timeouts expire
+        for proc in running:
+            time_left = proc._time_left()  # pylint: disable=protected-access
+            if time_left is not None and (
+                remaining is None or time_left < remaining
+            ):
+                remaining = time_left
+        fd_procs = dict(
+            (fd, proc) for proc in running for fd in proc._fds()
+        )
+        try:
+            readable = select(list(fd_procs), [], [], remaining)[0]
+        except select_error as e:
+            if e.args[0] != errno.EINTR:
+                raise
+            continue
+        for fd in readable:
+            fd_procs[fd]._read(fd)  # pylint: disable=protected-access
+        for proc in running:
+            proc._check_timeout()  # pylint: disable=protected-access
+    return set(proc for proc in processes if proc.done)
+
+
+def stream_output(  # pylint: disable=too-many-arguments
+    commands, tee=None, lines=True, on_exit=None, hooks=None, timeout=None,
+    rlimits=None
+):
+    """Run mock(1) commands and yield their output as it is produced
+
+    Output is not kept in memory beyond what is needed to split it into
+    lines, so this is suitable for commands that produce huge amounts of
+    output. If the generator is closed before the commands finish, they are
+    cancelled.
+
+    :param list commands: The command lines of the commands to run one after
+                          the other
+    :param object tee: An optional file object or path of a file to write all
+                       the output to as it is produced
+    :param bool lines: If True, the output is yielded line by line, otherwise
+                       it is yielded in chunks as it is read
+    :param callable on_exit: An optional function to call with the exit code
+                             of the commands once they are done
+    :param list hooks: Optional instrumentation hooks to call around every
+                       command, in addition to the global ones
+    :param float timeout: An optional amount of seconds the commands may run
+                          for
+    :param dict rlimits: Optional resource limits to apply to the commands,
+                         see MockProcess
+
+    :returns: A generator yielding (stream, data) pairs, where 'stream' is
+              'stdout' or 'stderr', and 'data' is a line or a chunk of output.
+              The generator raises CalledProcessError once it is exhausted
+              if one of the commands failed, or MockTimeoutError, with the
+              output left empty, if the timeout expired
+    """
+    tee_file = open(tee, 'w') if isinstance(tee, basestring) else tee
+    pending = deque()
+    splitters = dict(
+        (stream, _LineSplitter(stream, pending))
+        for stream in ('stdout', 'stderr')
+    )
+
+    def on_output(stream, data):
+        if tee_file is not None:
+            tee_file.write(data)
+        if lines:
+            splitters[stream].feed(data)
+        else:
+            pending.append((stream, data))
+    proc = MockProcess(
+        commands, on_output=on_output, capture_stderr=True, collect=False,
+        on_exit=on_exit, hooks=hooks, timeout=timeout, rlimits=rlimits
+    )
+    try:
+        while not proc.done:
+            proc._pump()  # pylint: disable=protected-access
+            while pending:
+                yield pending.popleft()
+        for splitter in splitters.itervalues():
+            splitter.flush()
+        while pending:
+            yield pending.popleft()
+        if proc.timed_out:
+            raise MockTimeoutError(proc.cmd, '', timeout)
+        if proc.returncode != 0:
+            raise CalledProcessError(proc.returncode, proc.cmd)
+    finally:
+        proc.cancel()
+        if tee_file is not None and tee_file is not tee:
+            tee_file.close()
+
+
+class _LineSplitter(object):
+    """Split chunks of output into lines for stream_output()"""
+    MAX_LINE = MockProcess.READ_SIZE
+
+    def __init__(self, stream, pending):
+        """Create a splitter that places (stream, line) pairs in 'pending'"""
+        self.stream = stream
+        self.pending = pending
+        self.partial = ''
+
+    def feed(self, data):
+        """Split the given chunk of output into lines"""
+        data = self.partial + data
+        end = data.rfind('\n') + 1
+        self.partial = data[end:]
+        for line in data[:end].split('\n')[:-1]:
+            self.pending.append((self.stream, line + '\n'))
+        if len(self.partial) > self.MAX_LINE:
+            # Do not let lines grow without a limit
+            self.flush()
+
+    def flush(self):
+        """Pass on any partial line"""
+        if self.partial:
+            self.pending.append((self.stream, self.partial))
+            self.partial = ''
+
+
+def check_output(cmd, hooks=None, timeout=None, rlimits=None):
+    """Run a mock(1) command and return its output
+
+    This behaves like subprocess.check_output, but the command is run in its
+    own process group like all the other commands run by this module
+
+    :param tuple cmd: The command line to run
+    :param list hooks: Optional instrumentation hooks to call around the
+                       command, in addition to the global ones
+    :param float timeout: An optional amount of seconds the command may run
+                          for
+    :param dict rlimits: Optional resource limits to apply to the command,
+                         see MockProcess
+
+    :rtype: str
+    :returns: The output of the command
+    :raises MockTimeoutError: If the timeout expired
+    """
+    return MockProcess(
+        (cmd,), hooks=hooks, timeout=timeout, rlimits=rlimits
+    ).result()
+
+
+def _rlimits(rlimits):
+    """Convert the resource limits given to MockProcess to a list of
+    (resource, (soft, hard)) pairs
+
+    :raises ValueError: If an unknown limit name is given
+    """
+    limits = []
+    for name, limit in (rlimits or {}).iteritems():
+        if isinstance(name, basestring):
+            res = getattr(resource, 'RLIMIT_' + name.upper(), None)
+            if res is None:
+                raise ValueError('unknown resource limit: {0}'.format(name))
+        else:
+            res = name
+        if isinstance(limit, (int, long)):
+            limit = (limit, limit)
+        limits.append((res, tuple(limit)))
+    return limits
+
+
+def _killpg(pid, sig):
+    """Send a signal to the process group led by the given process
+
+    :returns: False if the signal could not be delivered because of missing
+              permissions, True otherwise, including when the processes are
+              already gone
+    :rtype: bool
+    """
+    try:
+        os.killpg(pid, sig)
+    except OSError as e:
+        if e.errno == errno.EPERM:
+            return False
+        if e.errno != errno.ESRCH:
+            raise
+    return True
+
+
+def _preexec(limits):
+    """Create a function to run in the child processes of commands, that
+    starts a new session and applies resource limits
+    """
+    def preexec():
+        os.setsid()
+        for res, limit in limits:
+            resource.setrlimit(res, limit)
+    return preexec
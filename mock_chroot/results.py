@@ -0,0 +1,382 @@
+#!/usr/bin/env python
+"""mock_chroot/results.py - Build results and the phase timeline mock(1)
+logs for them
+"""
+import os
+import re
+from datetime import datetime
+from time import mktime
+from collections import OrderedDict
+
+__all__ = [
+    'BuildResult', 'Timeline', 'Phase', 'LogSummary', 'StateLogParser',
+    'parse_state_log', 'summarize_log',
+]
+
+# Lines in the mock(1) state.log look like:
+#   2016-09-13 12:18:49,613 - INFO - Start: build phase for foo.src.rpm
+# Older versions do not include the log level, and newer versions may tag
+# the phase with a context, as in 'Start(bootstrap): chroot init'
+_STATE_LINE = re.compile(
+    r'^(?P<time>\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:[,.]\d+)?)\s+-\s+'
+    r'(?:[A-Z]+\s+-\s+)?'
+    r'(?P<event>Start|Finish)(?:\((?P<context>[^)]*)\))?:\s*'
+    r'(?P<name>.*?)\s*$'
+)
+_TIMESTAMP = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:[,.]\d+)?)')
+
+LOG_FILES = ('root.log', 'build.log')
+
+
+class BuildResult(str):
+    """The result of a mock(1) build
+
+    This is the output of the build as a string, as was returned by the build
+    methods of MockChroot before, with additional information about the
+    build attached to it.
+
+    :ivar str output: The build output
+    """
+    def __new__(cls, output, resultdir=None, mock=None):
+        """Create a build result
+
+        :param str output: The build output
+        :param str resultdir: The directory the build results were placed in
+        :param MockChroot mock: The chroot the build ran in, used to find the
+                                default result directory if 'resultdir' is
+                                not given
+        """
+        result = super(BuildResult, cls).__new__(cls, output)
+        result._resultdir = resultdir
+        result._mock = mock
+        return result
+
+    @property
+    def output(self):
+        """The build output as a plain string"""
+        return str.__str__(self)
+
+    @property
+    def resultdir(self):
+        """The directory the build results were placed in
+
+        If the build was not given a result directory, this is the directory
+        set in the chroot configuration, or the default directory mock(1)
+        uses, which may require invoking mock to find
+        """
+        if self._resultdir is None and self._mock is not None:
+            info = self._mock.root_info()
+            self._resultdir = info.resultdir
+            if self._resultdir is None:
+                self._resultdir = os.path.join(
+                    os.path.dirname(info.root_path), 'result'
+                )
+            self._mock = None
+        return self._resultdir
+
+    @property
+    def timeline(self):
+        """The phase timeline of the build, parsed from the logs in the
+        result directory when first accessed
+
+        :rtype: Timeline
+        """
+        try:
+            return self._timeline
+        except AttributeError:
+            self._timeline = Timeline.from_resultdir(self.resultdir)
+            return self._timeline
+
+
+class Phase(object):
+    """A phase of a mock(1) run, as logged in state.log
+
+    :ivar str name: The phase name, such as 'chroot init'
+    :ivar str context: The context mock tagged the phase with, such as
+                       'bootstrap', or None
+    :ivar float started: The time the phase started, in seconds since epoch
+    :ivar float finished: The time the phase finished, in seconds since epoch,
+                          or None if it never did
+    :ivar Phase parent: The phase this phase is nested in, or None
+    :ivar list children: The phases nested in this phase
+    """
+    def __init__(self, name, context, started, parent=None):
+        self.name = name
+        self.context = context
+        self.started = started
+        self.finished = None
+        self.parent = parent
+        self.children = []
+
+    @property
+    def duration(self):
+        """The time the phase took in seconds, or None if it did not finish
+        """
+        if self.finished is None:
+            return None
+        return self.finished - self.started
+
+    @property
+    def depth(self):
+        """The amount of phases this phase is nested in"""
+        depth = 0
+        parent = self.parent
+        while parent is not None:
+            depth += 1
+            parent = parent.parent
+        return depth
+
+    def __repr__(self):
+        return '<Phase {0!r} duration={1}>'.format(self.name, self.duration)
+
+
+class LogSummary(object):
+    """A summary of a mock(1) log file such as root.log or build.log
+
+    :ivar str path: The path to the log file
+    :ivar int size: The size of the file in bytes
+    :ivar int lines: The amount of lines in the file
+    :ivar float started: The first time stamp found in the file, or None
+    :ivar float finished: The last time stamp found in the file, falling back
+                          to the file modification time
+    """
+    def __init__(self, path, size, lines, started, finished):
+        self.path = path
+        self.size = size
+        self.lines = lines
+        self.started = started
+        self.finished = finished
+
+    @property
+    def duration(self):
+        """The time between the first and last time stamps in the file, or
+        None if they are not known
+        """
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def __repr__(self):
+        return '<LogSummary {0} lines={1}>'.format(self.path, self.lines)
+
+
+class Timeline(object):
+    """The timeline of the phases of a mock(1) run
+
+    :ivar list phases: All the phases in the order they started
+    :ivar dict logs: LogSummary objects for the root.log and build.log files,
+                     keyed by file name, for those that exist
+    """
+    def __init__(self, phases=(), logs=None):
+        self.phases = list(phases)
+        self.logs = logs or {}
+
+    @classmethod
+    def from_resultdir(cls, resultdir):
+        """Parse the logs mock(1) left in the given result directory
+
+        Missing log files are ignored, yielding an empty timeline if there
+        are none
+
+        :param str resultdir: The result directory
+        :rtype: Timeline
+        """
+        try:
+            phases = parse_state_log(os.path.join(resultdir, 'state.log'))
+        except IOError:
+            phases = []
+        logs = {}
+        for log_file in LOG_FILES:
+            try:
+                logs[log_file] = summarize_log(
+                    os.path.join(resultdir, log_file)
+                )
+            except (IOError, OSError):
+                pass
+        return cls(phases, logs)
+
+    @property
+    def roots(self):
+        """The phases that are not nested in other phases"""
+        return [phase for phase in self.phases if phase.parent is None]
+
+    @property
+    def started(self):
+        """The time the first phase started, or None if there are none"""
+        if not self.phases:
+            return None
+        return self.phases[0].started
+
+    @property
+    def finished(self):
+        """The time the last phase finished, or None if none did"""
+        finished = [
+            phase.finished for phase in self.phases
+            if phase.finished is not None
+        ]
+        return max(finished) if finished else None
+
+    @property
+    def duration(self):
+        """The time between the start of the first phase and the end of the
+        last one, or None if it is not known
+        """
+        if self.started is None or self.finished is None:
+            return None
+        return self.finished - self.started
+
+    def durations(self):
+        """Get the total duration of the phases by name
+
+        Phases that occur many times, as happens when building more then one
+        package, are summed up. Phases that did not finish are left out.
+
+        :returns: A dictionary mapping phase names to durations in seconds,
+                  in the order phases first started
+        :rtype: OrderedDict
+        """
+        durations = OrderedDict()
+        for phase in self.phases:
+            if phase.duration is not None:
+                durations[phase.name] = (
+                    durations.get(phase.name, 0.0) + phase.duration
+                )
+        return durations
+
+    def fractions(self):
+        """Get the fraction of the total run time each phase took
+
+        :returns: A dictionary mapping phase names to fractions between 0 and
+                  1, in the order phases first started
+        :rtype: OrderedDict
+        """
+        total = self.duration
+        if not total:
+            return OrderedDict()
+        return OrderedDict(
+            (name, duration / total)
+            for name, duration in self.durations().iteritems()
+        )
+
+    def __repr__(self):
+        return '<Timeline phases={0} duration={1}>'.format(
+            len(self.phases), self.duration
+        )
+
+
+class StateLogParser(object):
+    """Incrementally parse the contents of a mock(1) state.log file
+
+    Data can be fed to the parser in arbitrary chunks as it is written,
+    only the last partial line is kept in memory.
+
+    :ivar list phases: The phases found so far, in the order they started
+    """
+    def __init__(self):
+        self.phases = []
+        self._open = []
+        self._partial = ''
+
+    def feed(self, data):
+        """Parse a chunk of the log
+
+        :param str data: The chunk to parse
+        """
+        data = self._partial + data
+        end = data.rfind('\n') + 1
+        self._partial = data[end:]
+        for line in data[:end].splitlines():
+            self.feed_line(line)
+
+    def feed_line(self, line):
+        """Parse a single line of the log
+
+        :param str line: The line to parse
+        """
+        match = _STATE_LINE.match(line)
+        if match is None:
+            return
+        timestamp = _parse_timestamp(match.group('time'))
+        name = match.group('name')
+        context = match.group('context')
+        if match.group('event') == 'Start':
+            parent = self._open[-1] if self._open else None
+            phase = Phase(name, context, timestamp, parent)
+            if parent is not None:
+                parent.children.append(phase)
+            self.phases.append(phase)
+            self._open.append(phase)
+            return
+        # Finish the innermost open phase by that name, phases nested in it
+        # that did not log their end are left unfinished
+        for index in xrange(len(self._open) - 1, -1, -1):
+            phase = self._open[index]
+            if phase.name == name and phase.context == context:
+                phase.finished = timestamp
+                del self._open[index:]
+                return
+
+    def close(self):
+        """Parse any partial line left at the end of the log
+
+        :returns: The phases found in the log
+        :rtype: list
+        """
+        if self._partial:
+            self.feed_line(self._partial)
+            self._partial = ''
+        return self.phases
+
+
+def parse_state_log(path):
+    """Parse a mock(1) state.log file, reading it line by line
+
+    :param str path: The path to the file
+
+    :returns: The phases found in the file, in the order they started
+    :rtype: list
+    """
+    parser = StateLogParser()
+    with open(path, 'r') as ofd:
+        for line in ofd:
+            parser.feed_line(line)
+    return parser.close()
+
+
+def summarize_log(path):
+    """Summarize a mock(1) log file, reading it line by line so huge files
+    are never loaded into memory
+
+    :param str path: The path to the file
+    :rtype: LogSummary
+    """
+    lines = 0
+    started = finished = None
+    with open(path, 'r') as ofd:
+        for line in ofd:
+            lines += 1
+            match = _TIMESTAMP.match(line)
+            if match is not None:
+                finished = _parse_timestamp(match.group(1))
+                if started is None:
+                    started = finished
+        size = os.fstat(ofd.fileno()).st_size
+        if finished is None:
+            finished = os.fstat(ofd.fileno()).st_mtime
+    return LogSummary(path, size, lines, started, finished)
+
+
+def _parse_timestamp(text):
+    """Convert a mock(1) log time stamp to seconds since epoch
+
+    Mock logs local time, so the time stamp is taken to be in the local time
+    zone
+    """
+    text = text.replace(',', '.')
+    if '.' in text:
+        text, fraction = text.split('.')
+        fraction = float('0.' + fraction)
+    else:
+        fraction = 0.0
+    parsed = datetime.strptime(text, '%Y-%m-%d %H:%M:%S').timetuple()
+    return mktime(parsed) + fraction
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+"""mock_chroot/rootinfo.py - Where mock(1) keeps the files of a chroot
+"""
+import os
+import re
+
+__all__ = ['RootInfo']
+
+DEFAULT_BASEDIR = '/var/lib/mock'
+DEFAULT_CACHE_TOPDIR = '/var/cache/mock'
+DEFAULT_RESULTDIR = '{{basedir}}/{{root}}/result'
+
+# Templates in Mock configuration use either the Python '%(key)s' syntax
+# (older Mock versions) or the Jinja '{{ key }}' syntax (newer ones)
+_TEMPLATE_KEY = re.compile(r'%\((\w+)\)s|\{\{\s*(\w+)\s*\}\}')
+
+
+class RootInfo(object):
+    """The locations mock(1) uses for a chroot
+
+    Objects of this class are returned from MockChroot.root_info(). When the
+    chroot configuration could not be evaluated, only 'root_path' is known
+    and the other attributes are None.
+
+    :ivar str root_path: The path of the chroot
+    :ivar str root: The name of the chroot, including the unique extension
+    :ivar str basedir: The directory chroots are placed under
+    :ivar str cache_dir: The directory the caches of the chroot are placed
+                         in, which is shared by chroots with the same
+                         configuration and different unique extensions
+    :ivar str resultdir_template: The template of the result directory as
+                                  found in the configuration
+    :ivar str resultdir: The default result directory of builds, or None if
+                         the template could not be expanded
+    """
+    def __init__(  # pylint: disable=too-many-arguments,bad-continuation
+        self, root_path, root=None, basedir=None, cache_dir=None,
+        resultdir_template=None, resultdir=None
+    ):
+        self.root_path = root_path
+        self.root = root
+        self.basedir = basedir
+        self.cache_dir = cache_dir
+        self.resultdir_template = resultdir_template
+        self.resultdir = resultdir
+
+    @classmethod
+    def from_config(cls, config_opts, unique_ext=None):
+        """Evaluate the locations of a chroot from its loaded configuration
+        the way mock(1) does
+
+        :param dict config_opts: The configuration as loaded by
+                                 mock_chroot.config.load_config
+        :param str unique_ext: The unique extension given to the chroot
+
+        :returns: The locations, or None if the configuration does not name
+                  the chroot or uses templates that cannot be expanded here
+        :rtype: RootInfo
+        """
+        shared_root = config_opts.get('root')
+        if not isinstance(shared_root, basestring) or '{' in shared_root:
+            return None
+        root = shared_root
+        if unique_ext:
+            root = '{0}-{1}'.format(shared_root, unique_ext)
+        values = dict(config_opts, root=root)
+        values.setdefault('basedir', DEFAULT_BASEDIR)
+        values.setdefault('cache_topdir', DEFAULT_CACHE_TOPDIR)
+        basedir = _expand(values['basedir'], values)
+        cache_topdir = _expand(values['cache_topdir'], values)
+        if basedir is None or cache_topdir is None:
+            return None
+        values.update(basedir=basedir, cache_topdir=cache_topdir)
+        if config_opts.get('rootdir') is not None:
+            root_path = _expand(config_opts['rootdir'], values)
+            if root_path is None:
+                return None
+        else:
+            root_path = os.path.join(basedir, root, 'root')
+        resultdir_template = config_opts.get('resultdir', DEFAULT_RESULTDIR)
+        return cls(
+            root_path=root_path,
+            root=root,
+            basedir=basedir,
+            cache_dir=os.path.join(cache_topdir, shared_root),
+            resultdir_template=resultdir_template,
+            resultdir=_expand(resultdir_template, values),
+        )
+
+    def __repr__(self):
+        return '<RootInfo {0}>'.format(self.root_path)
+
+
+def _expand(template, values):
+    """Expand the keys in a configuration template
+
+    :returns: The expanded string or None if the template uses keys that are
+              not found in 'values', or values that are not strings
+    """
+    if not isinstance(template, basestring):
+        return None
+    missing = []
+
+    def replace(match):
+        """Get the value for a template key"""
+        value = values.get(match.group(1) or match.group(2))
+        if not isinstance(value, basestring):
+            missing.append(match.group(0))
+            return ''
+        return value
+    expanded = _TEMPLATE_KEY.sub(replace, template)
+    if missing or '{{' in expanded or '{%' in expanded:
+        return None
+    return expanded
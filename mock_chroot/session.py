@@ -0,0 +1,424 @@
+#!/usr/bin/env python
+"""mock_chroot/session.py - Persistent shell sessions inside mock(1) chroots
+"""
+import os
+import errno
+import signal
+import tarfile
+from shutil import copyfileobj
+from tempfile import TemporaryFile
+from collections import Iterable
+from itertools import count
+from pipes import quote
+from subprocess import Popen, PIPE, CalledProcessError
+from select import select, error as select_error
+from time import time
+from uuid import uuid4
+
+from . import instrumentation
+from .process import MockProcess, MockTimeoutError, _killpg, _preexec, \
+    _rlimits
+
+__all__ = ['ChrootSession']
+
+
+class ChrootSession(object):
+    """A long-lived shell running inside a mock(1) chroot
+
+    Objects of this class are not meant to be created directly, instead they
+    are returned from MockChroot.session(). The session keeps a single
+    'mock --shell' process open and feeds commands to it over its standard
+    input, so commands run in the session do not pay for mock startup, locking
+    and mounting on every call.
+
+    Each command is run in its own sub-shell, so changes to the working
+    directory or environment made by one command do not leak into the next.
+    Objects of this class are context managers, the shell is terminated when
+    the context is exited or when close() is called.
+
+    The shell runs in its own session and process group, like the commands
+    of MockProcess. If a command runs for longer then 'timeout', or waiting
+    for it is interrupted by an exception, the shell is terminated along with
+    all the processes it started and the session is closed.
+
+    :param tuple mock_cmd: The mock command line that starts the shell
+    :param list hooks: Optional instrumentation hooks to call around the mock
+                       shell process, in addition to the global ones
+    :param float timeout: An optional amount of seconds each command run in
+                          the session may run for
+    :param dict rlimits: Optional resource limits to apply to the shell
+                         process, see MockProcess for details
+    """
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, mock_cmd, hooks=None, timeout=None, rlimits=None):
+        """Start the mock shell process"""
+        self._mock_cmd = tuple(mock_cmd)
+        self._marker = '__mock_chroot_{0}__'.format(uuid4().hex)
+        self._cmd_counter = count()
+        self._buffer = ''
+        self._output_size = 0
+        self._cancelled = False
+        self.timeout = timeout
+        self._invocation = instrumentation.start(self._mock_cmd, hooks)
+        self._proc = Popen(
+            self._mock_cmd, stdin=PIPE, stdout=PIPE, close_fds=True,
+            preexec_fn=_preexec(_rlimits(rlimits)),
+        )
+        # Make sure an interactive shell does not litter our output with
+        # prompts
+        self._send("PS1=''; PS2=''; export PS1 PS2")
+        self._cwd = self._run_framed('pwd')[1].rstrip('\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except AttributeError:
+            pass
+
+    @property
+    def closed(self):
+        """True if the shell process had been terminated"""
+        return self._proc.returncode is not None
+
+    def run(self, *cmd, **more_options):
+        """Run a non-interactive command in the session
+
+        All positional arguments are passes as the command to run and its
+        argumens
+        This method will behave in a similliar manner to MockChroot.chroot
+        yeilding CalledProcessError on command failure
+
+        Optional named agruments passed via 'more_options' can be as follows:
+        :param str cwd: Working directory inside the chroot to run in
+        :param float timeout: A timeout to use instead of the one given to
+                              the session
+
+        :returns: the command output as string
+        :rtype: str
+        :raises MockTimeoutError: If the command ran for longer then the
+                                  timeout, the session is closed then
+        """
+        if not cmd:
+            raise RuntimeError('no command given to run')
+        if 'cwd' in more_options:
+            # Like 'mock --cwd', paths are relative to the chroot root
+            cwd = os.path.join('/', more_options['cwd'])
+        else:
+            cwd = self._cwd
+        shell_cmd = '(cd {0} && exec {1}) </dev/null'.format(
+            quote(cwd), ' '.join(quote(arg) for arg in cmd)
+        )
+        returncode, output = self._run_framed(
+            shell_cmd, cmd=cmd, timeout=more_options.get('timeout')
+        )
+        if returncode != 0:
+            raise CalledProcessError(returncode, cmd, output=output)
+        return output
+
+    def copyin(self, paths, dest):
+        """Copy files or directories from the host into the chroot
+
+        All the files are sent to the shell as a single tar stream, so
+        copying many files does not require running many commands. The
+        stream is spooled to a temporary file on the host first, so its
+        length could be sent ahead of it.
+
+        :param object paths: The path of a file or directory to copy or an
+                             Iterable of such paths
+        :param str dest: The directory inside the chroot to copy the files
+                         into, it is created if it does not exist
+
+        :raises CalledProcessError: If extracting the files failed
+        """
+        dest = os.path.join('/', dest)
+        with TemporaryFile() as spool:
+            tar = tarfile.open(fileobj=spool, mode='w|')
+            try:
+                for path in _path_list(paths):
+                    tar.add(path, arcname=os.path.basename(path.rstrip('/')))
+            finally:
+                tar.close()
+            size = spool.tell()
+            spool.seek(0)
+            # 'head' reads exactly the size of the stream from the input of
+            # the shell, what it reads is drained even if 'tar' fails, so the
+            # rest of the stream is never taken for shell commands
+            shell_cmd = (
+                'head -c {0} | {{ mkdir -p {1} && tar -x -C {1}; rc=$?; '
+                'cat > /dev/null; exit $rc; }}'
+            ).format(size, quote(dest))
+            returncode, output = self._run_framed(shell_cmd, stdin=spool)
+        if returncode != 0:
+            raise CalledProcessError(returncode, ('copyin', dest), output)
+
+    def copyout(self, paths, dest):
+        """Copy files or directories from the chroot to the host
+
+        The files are read from the shell as a single tar stream which is
+        spooled to a temporary file on the host rather then kept in memory.
+        Files are never extracted outside of 'dest', including via symbolic
+        or hard links found in the stream.
+
+        :param object paths: The path of a file or directory inside the
+                             chroot to copy or an Iterable of such paths
+        :param str dest: The directory on the host to copy the files into,
+                         it is created if it does not exist
+
+        :raises CalledProcessError: If reading the files failed
+        :raises RuntimeError: If the files include paths that lead outside
+                              of 'dest'
+        """
+        tar_args = []
+        for path in _path_list(paths):
+            path = os.path.join('/', path).rstrip('/') or '/'
+            tar_args.extend((
+                '-C', os.path.dirname(path), os.path.basename(path) or '.'
+            ))
+        shell_cmd = 'tar -c {0} </dev/null'.format(
+            ' '.join(quote(arg) for arg in tar_args)
+        )
+        with TemporaryFile() as spool:
+            returncode, _ = self._run_framed(shell_cmd, stdout=spool)
+            if returncode != 0:
+                raise CalledProcessError(returncode, ('copyout', dest))
+            spool.seek(0)
+            if not os.path.isdir(dest):
+                os.makedirs(dest)
+            tar = tarfile.open(fileobj=spool, mode='r|')
+            try:
+                for member in tar:
+                    if not _member_is_safe(member, dest):
+                        raise RuntimeError(
+                            'unsafe path in copied files: {0}'.format(
+                                member.name
+                            )
+                        )
+                    tar.extract(member, dest)
+            finally:
+                tar.close()
+
+    def close(self):
+        """Terminate the shell process
+
+        The shell is asked to exit and given MockProcess.KILL_GRACE seconds
+        to do so, after which it is killed along with all the processes it
+        started.
+
+        :returns: The exit code of the mock shell process
+        :rtype: int
+        """
+        if self.closed:
+            return self._proc.returncode
+        try:
+            self._send('exit 0')
+            self._proc.stdin.close()
+        except (IOError, OSError):
+            # The shell may have already gone away
+            pass
+        deadline = time() + MockProcess.KILL_GRACE
+        while self._wait_readable(deadline):
+            data = os.read(self._proc.stdout.fileno(), self.READ_SIZE)
+            if not data:
+                self._proc.stdout.close()
+                return self._wait()
+            self._output_size += len(data)
+        self._kill()
+        return self._proc.returncode
+
+    def _send(self, line):
+        """Send a line of shell code to the shell process"""
+        if self.closed:
+            raise RuntimeError('mock chroot session is closed')
+        self._proc.stdin.write(line + '\n')
+        self._proc.stdin.flush()
+
+    def _run_framed(  # pylint: disable=too-many-arguments,bad-continuation
+        self, shell_cmd, stdin=None, stdout=None, cmd=None, timeout=None
+    ):
+        """Run a shell command and collect its output and exit code
+
+        The output is framed by printing a unique marker line followed by the
+        exit code of the command once it is done. A newline is always printed
+        before the marker so commands with output that does not end with a
+        newline can be told apart from the marker.
+
+        :param str shell_cmd: The shell code to run
+        :param file stdin: An optional file to send to the shell right after
+                           the command, for the command to read
+        :param file stdout: An optional file to write the output to as it is
+                            read, rather then collecting it in memory
+        :param tuple cmd: The command to report in errors, defaults to the
+                          shell code
+        :param float timeout: A timeout to use instead of the one given to
+                              the session
+
+        :returns: A (returncode, output) pair, where output is empty if
+                  'stdout' is given
+        :rtype: tuple
+        :raises MockTimeoutError: If the timeout expired before the command
+                                  was done
+        """
+        if timeout is None:
+            timeout = self.timeout
+        deadline = None if timeout is None else time() + timeout
+        marker = '{0}{1}'.format(self._marker, next(self._cmd_counter))
+        self._send("{0}; printf '\\n%s %d\\n' {1} $?".format(
+            shell_cmd, marker
+        ))
+        if stdin is not None:
+            copyfileobj(stdin, self._proc.stdin)
+            self._proc.stdin.flush()
+        frame_start = '\n{0} '.format(marker)
+        stdout_fd = self._proc.stdout.fileno()
+        search_from = 0
+        while True:
+            start = self._buffer.find(frame_start, search_from)
+            if start >= 0:
+                end = self._buffer.find('\n', start + len(frame_start))
+                if end >= 0:
+                    break
+            else:
+                # Avoid re-scanning output we already know has no marker in it
+                search_from = max(0, len(self._buffer) - len(frame_start))
+                if stdout is not None and search_from:
+                    stdout.write(self._buffer[:search_from])
+                    self._buffer = self._buffer[search_from:]
+                    search_from = 0
+            try:
+                data = None
+                if self._wait_readable(deadline):
+                    data = os.read(stdout_fd, self.READ_SIZE)
+            except BaseException:
+                # The shell runs in its own session so it does not see
+                # signals sent to the terminal, make sure it does not outlive
+                # an interrupted command
+                self._kill()
+                raise
+            if data is None:
+                self._kill()
+                raise MockTimeoutError(
+                    cmd or (shell_cmd,),
+                    '' if stdout is not None else self._buffer, timeout
+                )
+            if not data:
+                self._wait()
+                raise RuntimeError(
+                    'mock shell exited unexpectedly with code {0}'.format(
+                        self._proc.returncode
+                    )
+                )
+            self._output_size += len(data)
+            self._buffer += data
+        output = self._buffer[:start]
+        if stdout is not None:
+            stdout.write(output)
+            output = ''
+        returncode = int(self._buffer[start + len(frame_start):end])
+        self._buffer = self._buffer[end + 1:]
+        return returncode, output
+
+    def _wait_readable(self, deadline):
+        """Wait for output from the shell process
+
+        :param float deadline: The time to stop waiting at, or None to wait
+                               for as long as it takes
+
+        :returns: False if the deadline passed before output was available
+        :rtype: bool
+        """
+        stdout_fd = self._proc.stdout.fileno()
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = max(0, deadline - time())
+            try:
+                return bool(select([stdout_fd], [], [], timeout)[0])
+            except select_error as e:
+                if e.args[0] != errno.EINTR:
+                    raise
+
+    def _kill(self):
+        """Terminate the shell process and all the processes it started
+
+        The processes are sent SIGTERM and given MockProcess.KILL_GRACE
+        seconds to exit before they are sent SIGKILL. If they cannot be
+        signalled they are left running without waiting for them.
+        """
+        if self.closed:
+            return
+        self._cancelled = True
+        signalled = _killpg(self._proc.pid, signal.SIGTERM)
+        if signalled:
+            deadline = time() + MockProcess.KILL_GRACE
+            while self._wait_readable(deadline):
+                data = os.read(self._proc.stdout.fileno(), self.READ_SIZE)
+                if not data:
+                    break
+                self._output_size += len(data)
+            signalled = _killpg(self._proc.pid, signal.SIGKILL)
+        if not signalled:
+            # Waiting for processes we cannot kill could block forever
+            self._proc.returncode = -signal.SIGKILL
+        for pipe in (self._proc.stdin, self._proc.stdout):
+            try:
+                pipe.close()
+            except (IOError, OSError):
+                pass
+        self._wait()
+
+    def _wait(self):
+        """Wait for the shell process to exit
+
+        :returns: The exit code of the mock shell process
+        :rtype: int
+        """
+        return instrumentation.finish(
+            self._invocation, self._proc, self._output_size, self._cancelled
+        )
+
+
+def _path_list(paths):
+    """Get a list of paths from a single path or an Iterable of paths"""
+    if isinstance(paths, basestring):
+        return [paths]
+    elif isinstance(paths, Iterable):
+        return list(paths)
+    raise TypeError("given 'paths' is not an Iterable or a string")
+
+
+def _member_is_safe(member, dest):
+    """Check that extracting a tar member into a directory only touches files
+    inside it
+
+    Members are checked right before they are extracted, so links made by
+    members extracted earlier are taken into account.
+
+    :param tarfile.TarInfo member: The member to check
+    :param str dest: The directory the member is extracted into
+
+    :rtype: bool
+    """
+    if member.name.startswith('/') or '..' in member.name.split('/'):
+        return False
+    dest = os.path.realpath(dest)
+    target = os.path.join(dest, member.name)
+    if member.issym():
+        # The link itself is made in its parent directory, what it points to
+        # is checked when members are extracted through it
+        target = os.path.dirname(target.rstrip('/'))
+    paths = [target]
+    if member.islnk():
+        paths.append(os.path.join(dest, member.linkname))
+    return all(_is_inside(os.path.realpath(path), dest) for path in paths)
+
+
+def _is_inside(path, directory):
+    """Check if a path is the same as, or under, a directory"""
+    return path == directory or path.startswith(directory.rstrip('/') + '/')
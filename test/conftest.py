@@ -39,3 +39,50 @@ def dir_to_mount():
             }
         }
     )
+
+
+@pytest.fixture
+def fake_mock(monkeypatch, tmpdir):
+    """Make MockChroot use a fake mock(1) that runs commands on the host
+
+    :returns: The path to a file where the fake mock logs its invocations
+    """
+    from mock_chroot import MockChroot
+
+    fake_mock_exe = os.path.join(
+        os.path.dirname(__file__),
+        'fixtures',
+        'fake_mock'
+    )
+    log_file = str(tmpdir.join('fake_mock.log'))
+    monkeypatch.setattr(
+        MockChroot, 'mock_exe', staticmethod(lambda: fake_mock_exe)
+    )
+    monkeypatch.setenv('FAKE_MOCK_LOG', log_file)
+    monkeypatch.setenv('FAKE_MOCK_LOCK_DIR', str(tmpdir))
+    monkeypatch.setenv('FAKE_MOCK_BASEDIR', str(tmpdir.join('basedir')))
+    # Root paths depend on the base directory above
+    monkeypatch.setattr(MockChroot, '_root_info_cache', {})
+    return log_file
+
+
+@pytest.fixture
+def fake_koji(monkeypatch, tmpdir):
+    """Make from_koji use a fake koji(1) that knows about a few targets
+
+    :returns: The path to a file where the fake koji logs its invocations
+    """
+    from mock_chroot.config import from_koji
+
+    fake_koji_exe = os.path.join(
+        os.path.dirname(__file__),
+        'fixtures',
+        'fake_koji'
+    )
+    log_file = str(tmpdir.join('fake_koji.log'))
+    monkeypatch.setattr(
+        from_koji, 'koji_exe', staticmethod(lambda: fake_koji_exe)
+    )
+    monkeypatch.setenv('FAKE_KOJI_LOG', log_file)
+    return log_file
+
@@ -1,11 +1,13 @@
 #!/usr/bin/env python
 """test_mock_chroot.py - Testing for mock_chroot.py
 """
+import os
 import pytest
 from subprocess import CalledProcessError
 
 from mock_chroot import MockChroot
 import mock_chroot
+import mock_chroot.config
 
 
 class TestMockChroot(object):
@@ -47,6 +49,33 @@ class TestMockChroot(object):
         # non blank string only if the package is found
         assert output
 
+    def test_fingerprint(self, custom_mock_cfg):
+        mc1 = MockChroot(config=custom_mock_cfg)
+        mc2 = MockChroot(config=mock_chroot.config.compose(custom_mock_cfg))
+        assert mc1.fingerprint() == mc2.fingerprint()
+        assert mc1.fingerprint() == mock_chroot.config.fingerprint(
+            custom_mock_cfg
+        )
+        assert mc1.fingerprint() != MockChroot(config='other').fingerprint()
+        assert MockChroot(root='some_root').fingerprint() == \
+            MockChroot(root='some_root').fingerprint()
+        assert MockChroot(root='some_root').fingerprint() != \
+            MockChroot(root='other_root').fingerprint()
+
+    def test_config_dir(self, custom_mock_cfg, tmpdir):
+        config_dir = str(tmpdir.join('configs'))
+        mc1 = MockChroot(config=custom_mock_cfg, config_dir=config_dir)
+        mc2 = MockChroot(config=custom_mock_cfg, config_dir=config_dir)
+        mc3 = MockChroot(config='other', config_dir=config_dir)
+        assert mc1._root == mc2._root
+        assert mc1._root != mc3._root
+        assert mc1._root.startswith(config_dir)
+        with open(mc1._root) as cfg:
+            assert cfg.read() == custom_mock_cfg
+        del mc1, mc2, mc3
+        # The shared configuration files are kept around
+        assert len(tmpdir.join('configs').listdir()) == 2
+
     def test_init_bad_params(self, custom_mock_cfg):
         with pytest.raises(RuntimeError):
             MockChroot(
@@ -113,7 +142,7 @@ class TestMockChroot(object):
         # Set to list to get it passed by reference to clusures
         checked_cmd = [[]]
 
-        def check_output(cmd):
+        def check_output(cmd, **kwargs):
             checked_cmd[0] = list(cmd)
             return 'some output'
         monkeypatch.setattr(mock_chroot, 'check_output', check_output)
@@ -140,7 +169,7 @@ class TestMockChroot(object):
         # Set to list to get it passed by reference to clusures
         checked_cmd = [[]]
 
-        def check_output(cmd):
+        def check_output(cmd, **kwargs):
             checked_cmd[0] = list(cmd)
             return 'some output'
         monkeypatch.setattr(mock_chroot, 'check_output', check_output)
@@ -168,3 +197,136 @@ class TestMockChroot(object):
         ]
         assert checked_cmd[0] == expected
         assert output == 'some output'
+
+    @pytest.fixture
+    def with_dnf(self, monkeypatch):
+        monkeypatch.setattr(MockChroot, 'has_dnf', classmethod(lambda c: True))
+
+    @staticmethod
+    def _logged_actions(log_file):
+        with open(log_file) as ofd:
+            return [
+                [
+                    arg for arg in line.split() if arg.startswith('--') and
+                    not arg.startswith(('--root=', '--uniqueext='))
+                ][0]
+                for line in ofd
+            ]
+
+    def test_no_duplicate_init(self, fake_mock, with_dnf, tmpdir):
+        mc = MockChroot(root='some_root')
+        resultdir = str(tmpdir.join('results'))
+        mc.buildsrpm('pkg.spec', '/sources', resultdir=resultdir)
+        mc.rebuild(
+            str(tmpdir.join('results', 'pkg.src.rpm')), no_clean=True,
+            resultdir=resultdir
+        )
+        assert self._logged_actions(fake_mock) == [
+            '--init', '--buildsrpm', '--rebuild',
+        ]
+        mc.clean()
+        mc.rebuild('pkg.src.rpm', no_clean=True)
+        assert self._logged_actions(fake_mock)[-2:] == ['--init', '--rebuild']
+
+    def test_init_marker(self, fake_mock, with_dnf):
+        mc = MockChroot(root='some_root')
+        assert not mc.is_initialized()
+        mc.init()
+        assert mc.is_initialized()
+        assert MockChroot(root='some_root').is_initialized()
+        assert not MockChroot(root='other_root').is_initialized()
+        assert not MockChroot(
+            root='some_root', unique_ext='other'
+        ).is_initialized()
+        MockChroot(root='some_root').rebuild('pkg.src.rpm', no_clean=True)
+        actions = self._logged_actions(fake_mock)
+        assert actions[-1] == '--rebuild'
+        assert actions.count('--init') == 1
+        mc.clean()
+        assert not MockChroot(root='some_root').is_initialized()
+
+    def test_failed_init_marker(self, fake_mock, with_dnf, monkeypatch):
+        mc = MockChroot(root='some_root')
+        mc.init()
+        assert MockChroot(root='some_root').is_initialized()
+        # Make the next initialization fail
+        basedir = os.environ['FAKE_MOCK_BASEDIR']
+        monkeypatch.setenv('FAKE_MOCK_BASEDIR', '/dev/null/basedir')
+        with pytest.raises(CalledProcessError):
+            mc.rebuild('pkg.src.rpm')
+        assert not mc.is_initialized()
+        monkeypatch.setenv('FAKE_MOCK_BASEDIR', basedir)
+        mc = MockChroot(root='some_root')
+        assert not mc.is_initialized()
+        mc.rebuild('pkg.src.rpm', no_clean=True)
+        # The failed initialization is not trusted by the new object
+        assert self._logged_actions(fake_mock) == [
+            '--init', '--print-root-path', '--init', '--init', '--rebuild',
+        ]
+
+    def test_build_from_sources(self, fake_mock, with_dnf, tmpdir):
+        mc = MockChroot(root='some_root')
+        resultdir = tmpdir.join('results')
+        resultdir.ensure('old.src.rpm')
+        output = mc.build_from_sources('pkg.spec', '/sources', str(resultdir))
+        assert output == 'built {0}\n'.format(resultdir.join('pkg.src.rpm'))
+        assert self._logged_actions(fake_mock) == [
+            '--init', '--buildsrpm', '--rebuild',
+        ]
+        with open(fake_mock) as ofd:
+            assert '--no-clean' in ofd.readlines()[-1].split()
+
+    def test_build_from_sources_no_srpm(self, monkeypatch, tmpdir):
+        mc = MockChroot(root='some_root')
+        monkeypatch.setattr(mc, 'buildsrpm', lambda *args, **kwargs: '')
+        with pytest.raises(RuntimeError):
+            mc.build_from_sources(
+                'pkg.spec', '/sources', str(tmpdir.join('empty'))
+            )
+
+    def test_snapshots(self, fake_mock, tmpdir):
+        mc = MockChroot(root='some_root')
+        mc.init()
+        assert mc.list_snapshots() == []
+        assert mc.current_snapshot() is None
+        root_path = tmpdir.join('basedir', 'some_root', 'root')
+        mc.snapshot('clean')
+        root_path.join('dirty').ensure()
+        mc.snapshot('dirty')
+        assert mc.list_snapshots() == ['clean', 'dirty']
+        assert mc.current_snapshot() == 'dirty'
+        mc.rollback('clean')
+        assert not root_path.join('dirty').exists()
+        assert mc.current_snapshot() == 'clean'
+        assert mc.is_initialized()
+        mc.remove_snapshot('dirty')
+        assert mc.list_snapshots() == ['clean']
+        with pytest.raises(CalledProcessError):
+            mc.rollback('dirty')
+
+    def test_copyin_copyout(self, fake_mock, tmpdir, monkeypatch):
+        mc = MockChroot(root='some_root')
+        src = tmpdir.mkdir('src')
+        paths = [str(src.join('file{0}'.format(i))) for i in xrange(10)]
+        for path in paths:
+            with open(path, 'w') as ofd:
+                ofd.write(path)
+        dest = tmpdir.mkdir('dest')
+        mc.copyin(paths, str(dest))
+        assert sorted(dest.listdir()) == sorted(
+            dest.join(src.join(path).basename) for path in paths
+        )
+        assert dest.join('file3').read() == paths[3]
+        out = tmpdir.mkdir('out')
+        mc.copyout(str(dest.join('file3')), str(out))
+        assert out.join('file3').read() == paths[3]
+        assert self._logged_actions(fake_mock) == ['--copyin', '--copyout']
+        # Paths are split between commands when there are too many of them
+        monkeypatch.setattr(
+            MockChroot, 'MAX_COPY_ARGS_LENGTH', len(paths[0]) * 4
+        )
+        mc.copyin(paths, str(tmpdir.mkdir('dest2')))
+        assert len(tmpdir.join('dest2').listdir()) == len(paths)
+        assert self._logged_actions(fake_mock)[2:] == ['--copyin'] * 4
+        with pytest.raises(TypeError):
+            mc.copyin(7, str(dest))
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+"""test_mock_chroot_batch.py - Testing for mock_chroot/batch.py
+"""
+from mock_chroot import MockChroot
+from mock_chroot.batch import batch_script, parse_batch_output
+
+
+class TestBatch(object):
+    def test_parse(self):
+        commands = [('echo', 'a'), ('false',)]
+        output = (
+            'noise from mock\n'
+            'MARK 0 0 1000000000 1500000000 2 6\n'
+            'a\nMARK 0'
+            'MARK 1 1 2000000000 2000000000 0 0\n'
+        )
+        results = parse_batch_output(output, commands, 'MARK')
+        assert [r.argv for r in results] == commands
+        assert results[0].output == 'a\n'
+        assert results[0].error == 'MARK 0'
+        assert results[0].duration == 0.5
+        assert results[0].succeeded
+        assert results[1].returncode == 1
+        assert results[1].output == results[1].error == ''
+        assert not results[1].succeeded
+
+    def test_script(self):
+        script = batch_script([('echo', "it's")], 'MARK')
+        assert "exec echo 'it'\"'\"'s'" in script
+        assert '[ $rc -eq 0 ]' not in script
+        script = batch_script([('true',)], 'MARK', stop_on_failure=True)
+        assert '[ $rc -eq 0 ] || exit 0' in script
+
+    def test_chroot_many(self, fake_mock):
+        mc = MockChroot(root='some_root')
+        results = mc.chroot_many([
+            ('echo', 'testing'),
+            ('bash', '-c', 'echo out; echo err >&2; exit 3'),
+            ('printf', 'no newline'),
+        ])
+        assert [r.returncode for r in results] == [0, 3, 0]
+        assert [r.output for r in results] == [
+            'testing\n', 'out\n', 'no newline'
+        ]
+        assert results[1].error == 'err\n'
+        assert all(r.duration >= 0 for r in results)
+        with open(fake_mock) as log:
+            # The script spans many lines in the log, but mock ran once
+            invocations = [
+                line for line in log if line.startswith('--root=')
+            ]
+        assert len(invocations) == 1
+
+    def test_stop_on_failure(self, fake_mock):
+        mc = MockChroot(root='some_root')
+        results = mc.chroot_many(
+            [('true',), ('false',), ('true',)], stop_on_failure=True
+        )
+        assert [r.returncode for r in results] == [0, 1]
+
+    def test_async_cwd(self, fake_mock):
+        mc = MockChroot(root='some_root')
+        results = mc.async_chroot_many([('pwd',)], cwd='etc').result()
+        assert results[0].output == '/etc\n'
@@ -122,3 +122,82 @@ class TestMockConfig(object):
                 assert output == method_inp_exp.expected
         output = str(conf_obj)
         assert output == expected_str
+
+
+class TestCompositMemoization(object):
+    class counting_obj(object):
+        """Configuration object that counts how many times it was rendered"""
+        def __init__(self, tag):
+            self.tag = tag
+            self.renders = 0
+
+        def body(self, composition_context):
+            self.renders += 1
+            return self.tag
+
+    def test_memoized(self):
+        obj = self.counting_obj('c1')
+        composit = mock_chroot.config.compose(obj, 'plain string')
+        assert str(composit) == 'c1\nplain string'
+        assert str(composit) == 'c1\nplain string'
+        assert obj.renders == 1
+
+    @pytest.mark.parametrize(
+        ('modification', 'expected'),
+        [
+            (lambda c: c.append('new'), 'c1\nplain string\nnew'),
+            (lambda c: c.extend(('n1', 'n2')), 'c1\nplain string\nn1\nn2'),
+            (lambda c: c.insert(0, 'new'), 'new\nc1\nplain string'),
+            (lambda c: c.__setitem__(1, 'new'), 'c1\nnew'),
+            (lambda c: c.__setitem__(slice(1, 2), ['n1']), 'c1\nn1'),
+            (lambda c: c.__setslice__(0, 1, ['n1']), 'n1\nplain string'),
+            (lambda c: c.__iadd__(['new']), 'c1\nplain string\nnew'),
+            (lambda c: c.__imul__(2), 'c1\nplain string\nc1\nplain string'),
+            (lambda c: c.pop(), 'c1'),
+            (lambda c: c.remove('plain string'), 'c1'),
+            (lambda c: c.reverse(), 'plain string\nc1'),
+            (
+                lambda c: c.sort(key=lambda o: o != 'plain string'),
+                'plain string\nc1'
+            ),
+            (lambda c: c.__delitem__(0), 'plain string'),
+            (lambda c: c.__delslice__(0, 1), 'plain string'),
+        ]
+    )
+    def test_invalidation(self, modification, expected):
+        obj = self.counting_obj('c1')
+        composit = mock_chroot.config.compose(obj, 'plain string')
+        str(composit)
+        modification(composit)
+        assert str(composit) == expected
+
+    def test_nested_invalidation(self):
+        inner = mock_chroot.config.compose('i1')
+        middle = mock_chroot.config.compose(inner)
+        outer = mock_chroot.config.compose('o1', middle)
+        other = mock_chroot.config.compose()
+        other.append(inner)
+        assert str(outer) == 'o1\ni1'
+        assert str(other) == 'i1'
+        inner.append('i2')
+        assert str(outer) == 'o1\ni1\ni2'
+        assert str(other) == 'i1\ni2'
+        assert str(middle) == 'i1\ni2'
+
+
+class TestFingerprint(object):
+    def test_fingerprint(self):
+        composit = mock_chroot.config.compose(
+            mock_chroot.config.to['a'].set(1),
+            mock_chroot.config.bind_mount(('/a', '/b'))
+        )
+        fingerprint = composit.fingerprint()
+        assert fingerprint == mock_chroot.config.fingerprint(str(composit))
+        assert fingerprint == mock_chroot.config.compose(
+            mock_chroot.config.to['a'].set(1),
+            mock_chroot.config.bind_mount(('/a', '/b'))
+        ).fingerprint()
+        composit.append(mock_chroot.config.to['b'].set(2))
+        assert composit.fingerprint() != fingerprint
+        conf_obj = mock_chroot.config.ConfigurationObject(body=str(composit))
+        assert conf_obj.fingerprint() == composit.fingerprint()
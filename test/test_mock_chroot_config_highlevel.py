@@ -2,6 +2,10 @@
 """test_mock_chroot_config_highlevel.py - Testing for high-level Mock
 configuration generators in mock_chroot.config.highlevel
 """
+import os
+import pytest
+from time import time
+
 import mock_chroot.config
 from mock_chroot import MockChroot
 
@@ -49,3 +53,167 @@ class TestMockConfigHighLevel(object):
         output = cmc.chroot('getent', 'hosts', host_name)
         # If we got here, we've no exception so DNS worked
         assert output
+
+
+def _exec_config(config):
+    """Run configuration code against empty plugin option dictionaries
+
+    :returns: The resulting 'plugin_conf' dictionary
+    """
+    plugins = (
+        'tmpfs', 'overlayfs', 'lvm_root', 'ccache', 'root_cache',
+        'yum_cache',
+    )
+    config_opts = {
+        'plugin_conf': dict(
+            ('{0}_opts'.format(plugin), {}) for plugin in plugins
+        )
+    }
+    exec str(config) in {'config_opts': config_opts}
+    return config_opts['plugin_conf']
+
+
+class TestPluginConfig(object):
+    def test_tmpfs(self):
+        plugin_conf = _exec_config(
+            mock_chroot.config.tmpfs(max_fs_size='4g', keep_mounted=True)
+        )
+        assert plugin_conf['tmpfs_enable'] is True
+        assert plugin_conf['tmpfs_opts'] == {
+            'max_fs_size': '4g', 'keep_mounted': True,
+        }
+
+    def test_enabled_once(self):
+        config = str(mock_chroot.config.compose(
+            mock_chroot.config.ccache(max_cache_size='4G'),
+            mock_chroot.config.ccache(cache_dir='/var/cache/ccache'),
+        ))
+        assert config.count("['ccache_enable']") == 1
+        plugin_conf = _exec_config(config)
+        assert plugin_conf['ccache_opts'] == {
+            'max_cache_size': '4G', 'dir': '/var/cache/ccache',
+        }
+
+    def test_caches(self):
+        plugin_conf = _exec_config(mock_chroot.config.compose(
+            mock_chroot.config.root_cache(max_age_days=7),
+            mock_chroot.config.yum_cache(max_metadata_age_days=1),
+        ))
+        assert plugin_conf['root_cache_enable'] is True
+        assert plugin_conf['root_cache_opts'] == {'max_age_days': 7}
+        assert plugin_conf['yum_cache_opts'] == {'max_metadata_age_days': 1}
+
+    def test_dnf_cache(self):
+        # Mock caches dnf downloads with the yum_cache plugin
+        plugin_conf = _exec_config(
+            mock_chroot.config.dnf_cache(online=False, cache_dir='/cache')
+        )
+        assert plugin_conf['yum_cache_enable'] is True
+        assert plugin_conf['yum_cache_opts'] == {
+            'online': False, 'dir': '/cache',
+        }
+        assert not [key for key in plugin_conf if key.startswith('dnf_')]
+
+    def test_snapshot_disables_root_cache(self):
+        plugin_conf = _exec_config(mock_chroot.config.compose(
+            mock_chroot.config.root_cache(max_age_days=7),
+            mock_chroot.config.overlayfs(base_dir='/overlays'),
+            mock_chroot.config.lvm_root('mock_vg', size='8G'),
+        ))
+        assert plugin_conf['overlayfs_enable'] is True
+        assert plugin_conf['overlayfs_opts'] == {'base_dir': '/overlays'}
+        assert plugin_conf['lvm_root_opts'] == {
+            'volume_group': 'mock_vg', 'size': '8G',
+        }
+        assert plugin_conf['root_cache_enable'] is False
+
+    def test_standalone(self):
+        config = str(mock_chroot.config.tmpfs())
+        assert config == "config_opts['plugin_conf']['tmpfs_enable'] = True"
+
+    def test_snapshots(self):
+        plugin_conf = _exec_config(mock_chroot.config.snapshots())
+        assert plugin_conf['overlayfs_enable'] is True
+        plugin_conf = _exec_config(
+            mock_chroot.config.snapshots('lvm_root', volume_group='mock_vg')
+        )
+        assert plugin_conf['lvm_root_enable'] is True
+        assert plugin_conf['lvm_root_opts'] == {'volume_group': 'mock_vg'}
+        with pytest.raises(ValueError):
+            mock_chroot.config.snapshots('btrfs')
+
+    def test_shared_package_cache(self):
+        config_opts = mock_chroot.config.render_config(
+            mock_chroot.config.shared_package_cache('/cache', 'yum')
+        )
+        assert config_opts['plugin_conf']['bind_mount_opts']['dirs'] == [
+            ('/cache', '/var/cache/yum'),
+        ]
+        assert config_opts['plugin_conf']['yum_cache_enable'] is False
+        assert 'dnf_cache_enable' not in config_opts['plugin_conf']
+        assert config_opts['yum_common_opts'] == ['--setopt=keepcache=1']
+        with pytest.raises(ValueError):
+            mock_chroot.config.shared_package_cache('/cache', 'apt')
+
+
+class TestFile(object):
+    def test_small_file(self, tmpdir):
+        config = mock_chroot.config.file(
+            '/etc/small', 'content', store_dir=str(tmpdir)
+        )
+        assert config == "config_opts['files']['/etc/small'] = 'content'"
+        assert tmpdir.listdir() == []
+
+    def test_large_file(self, tmpdir):
+        content = 'large content\n' * 10000
+        config = str(mock_chroot.config.compose(
+            mock_chroot.config.file(
+                '/etc/large1', content, store_dir=str(tmpdir)
+            ),
+            mock_chroot.config.file(
+                '/etc/large2', content, store_dir=str(tmpdir)
+            ),
+        ))
+        assert len(config) < 1000
+        [side_file] = tmpdir.listdir()
+        assert side_file.read() == content
+        config_opts = {'files': {}}
+        exec config in {'config_opts': config_opts}
+        assert config_opts['files'] == {
+            '/etc/large1': content, '/etc/large2': content,
+        }
+
+    def test_threshold(self, tmpdir):
+        config = mock_chroot.config.file(
+            '/etc/small', 'content', threshold=3, store_dir=str(tmpdir)
+        )
+        assert 'content' not in config
+        assert len(tmpdir.listdir()) == 1
+        config = mock_chroot.config.file(
+            '/etc/large', 'content' * 10000, threshold=None,
+            store_dir=str(tmpdir)
+        )
+        assert 'content' in config
+        assert len(tmpdir.listdir()) == 1
+
+    def test_clean_file_store(self, tmpdir):
+        store_dir = str(tmpdir.join('files'))
+        assert mock_chroot.config.clean_file_store(store_dir=store_dir) == 0
+        for content in ('old', 'used', 'new'):
+            mock_chroot.config.file(
+                '/etc/' + content, content, threshold=0, store_dir=store_dir
+            )
+        old_time = time() - 3600
+        for side_file in tmpdir.join('files').listdir():
+            os.utime(str(side_file), (old_time, old_time))
+        tmpdir.join('files').listdir(lambda f: f.read() == 'new')[0].setmtime()
+        # Using a stored file again marks it as used
+        mock_chroot.config.file(
+            '/etc/used', 'used', threshold=0, store_dir=store_dir
+        )
+        assert mock_chroot.config.clean_file_store(60, store_dir) == 1
+        assert sorted(f.read() for f in tmpdir.join('files').listdir()) == [
+            'new', 'used',
+        ]
+        assert mock_chroot.config.clean_file_store(0, store_dir) == 2
+        assert tmpdir.join('files').listdir() == []
@@ -4,7 +4,7 @@
 import pytest
 
 from mock_chroot import MockChroot
-from mock_chroot.config import from_koji
+from mock_chroot.config import from_koji, KojiCache
 
 
 class TestMockConfigKoji(object):
@@ -50,3 +50,135 @@ class TestMockConfigKoji(object):
             from_koji.koji_tag_for_target(
                 target='does-not-exist'
             )
+
+
+class TestKojiCache(object):
+    @staticmethod
+    def invocations(log_file):
+        try:
+            with open(log_file) as log:
+                return log.read().splitlines()
+        except IOError:
+            return []
+
+    def test_from_koji_cached(self, fake_koji, tmpdir):
+        cache = KojiCache(cache_dir=str(tmpdir.join('cache')))
+        expected = "config_opts['root'] = 'tag1-build-i686'\n" \
+            "config_opts['koji_profile'] = 'koji'\n"
+        cfg = from_koji(
+            target='target1', arch='i686', koji_profile='koji', cache=cache
+        )
+        assert str(cfg) == expected
+        assert len(self.invocations(fake_koji)) == 2
+        cfg = from_koji(
+            target='target1', arch='i686', koji_profile='koji', cache=cache
+        )
+        assert str(cfg) == expected
+        assert len(self.invocations(fake_koji)) == 2
+        # A fresh cache object sharing the directory hits the on-disk store
+        other_cache = KojiCache(cache_dir=str(tmpdir.join('cache')))
+        cfg = from_koji(
+            target='target1', arch='i686', koji_profile='koji',
+            cache=other_cache
+        )
+        assert str(cfg) == expected
+        assert len(self.invocations(fake_koji)) == 2
+        # Looking up another target with the same build tag only needs to
+        # look up the tag
+        cfg = from_koji(
+            target='target3', arch='i686', koji_profile='koji', cache=cache
+        )
+        assert str(cfg) == expected
+        assert len(self.invocations(fake_koji)) == 3
+        from_koji(
+            tag='tag1-build', arch='i686', koji_profile='koji', cache=cache
+        )
+        assert len(self.invocations(fake_koji)) == 3
+        with pytest.raises(RuntimeError):
+            from_koji(tag='tag1-build', target='target1', cache=cache)
+
+    def test_refresh_and_invalidate(self, fake_koji, tmpdir):
+        cache = KojiCache(cache_dir=str(tmpdir.join('cache')))
+        from_koji(tag='tag1-build', cache=cache)
+        assert len(self.invocations(fake_koji)) == 1
+        from_koji(tag='tag1-build', cache=cache, refresh=True)
+        assert len(self.invocations(fake_koji)) == 2
+        cache.invalidate(from_koji.cache_key(tag='tag1-build'))
+        from_koji(tag='tag1-build', cache=cache)
+        assert len(self.invocations(fake_koji)) == 3
+        from_koji(tag='tag2-build', cache=cache)
+        assert len(self.invocations(fake_koji)) == 4
+        cache.invalidate()
+        assert not tmpdir.join('cache').listdir()
+        from_koji(tag='tag1-build', cache=cache)
+        from_koji(tag='tag2-build', cache=cache)
+        assert len(self.invocations(fake_koji)) == 6
+
+    def test_ttl(self, fake_koji, tmpdir):
+        cache = KojiCache(cache_dir=str(tmpdir.join('cache')), ttl=0)
+        from_koji(tag='tag1-build', cache=cache)
+        from_koji(tag='tag1-build', cache=cache)
+        assert len(self.invocations(fake_koji)) == 2
+        cache = KojiCache(cache_dir=str(tmpdir.join('cache')), ttl=None)
+        from_koji(tag='tag1-build', cache=cache)
+        assert len(self.invocations(fake_koji)) == 2
+
+    def test_lru(self, tmpdir):
+        cache = KojiCache(cache_dir=str(tmpdir.join('cache')), max_entries=2)
+        for key in ('a', 'b', 'c'):
+            cache.get((key,), lambda key=key: key * 3)
+        assert list(cache._memory) == [('b',), ('c',)]
+        # Values dropped from memory are still found on disk
+        assert cache.get(('a',), lambda: 'not cached') == 'aaa'
+        assert list(cache._memory) == [('c',), ('a',)]
+
+
+class TestResolveMany(object):
+    @staticmethod
+    def invocations(log_file):
+        try:
+            with open(log_file) as log:
+                return log.read().splitlines()
+        except IOError:
+            return []
+
+    def test_resolve_many(self, fake_koji):
+        target_arches = [
+            (target, arch)
+            for target in ('target1', 'target2', 'target3')
+            for arch in ('x86_64', 'ppc64le')
+        ]
+        configs = from_koji.resolve_many(target_arches, koji_profile='koji')
+        assert sorted(configs) == sorted(target_arches)
+        for (target, arch), cfg in configs.iteritems():
+            assert isinstance(cfg, from_koji)
+            expected = from_koji.koji_mock_config(
+                target=target, arch=arch, koji_profile='koji'
+            )
+            assert str(cfg) == expected
+        invocations = self.invocations(fake_koji)[:5]
+        # One query for all the targets and one configuration pull for every
+        # distinct tag and arch
+        assert invocations.count('--profile koji list-targets --quiet') == 1
+        assert sorted(invocations[1:]) == sorted(
+            '--profile koji mock_config --arch {0} --tag {1}'.format(arch, tag)
+            for tag in ('tag1-build', 'tag2-build')
+            for arch in ('x86_64', 'ppc64le')
+        )
+
+    def test_resolve_many_cached(self, fake_koji, tmpdir):
+        cache = KojiCache(cache_dir=str(tmpdir.join('cache')))
+        target_arches = [('target1', 'x86_64'), ('target2', 'x86_64')]
+        from_koji.resolve_many(target_arches, cache=cache)
+        assert len(self.invocations(fake_koji)) == 3
+        configs = from_koji.resolve_many(target_arches, cache=cache)
+        assert len(self.invocations(fake_koji)) == 3
+        # Tags found by resolve_many are used for single target lookups
+        cfg = from_koji(target='target1', cache=cache)
+        assert len(self.invocations(fake_koji)) == 3
+        assert str(cfg) == str(configs[('target1', 'x86_64')])
+
+    def test_resolve_many_bad_target(self, fake_koji):
+        with pytest.raises(RuntimeError):
+            from_koji.resolve_many([('target1', 'x86_64'), ('nope', 'x86_64')])
+        assert from_koji.resolve_many([]) == {}
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""test_mock_chroot_config_loader.py - Testing for
+mock_chroot/config/loader.py
+"""
+import os
+import pytest
+
+import mock_chroot.config
+from mock_chroot import MockChroot
+from mock_chroot.config.loader import ConfigLoader
+
+
+@pytest.fixture
+def config_path(tmpdir):
+    """Create a Mock configuration directory with a template that is included
+    by a chroot configuration file
+    """
+    config_path = tmpdir.mkdir('mock')
+    config_path.mkdir('templates').join('base.tpl').write(
+        "config_opts['chroot_setup_cmd'] = 'install @buildsys-build'\n"
+        "config_opts['plugin_conf']['ccache_enable'] = False\n"
+        "config_opts['dist'] = 'el7'\n"
+    )
+    config_path.join('some-root.cfg').write(
+        "include('templates/base.tpl')\n"
+        "config_opts['root'] = config_opts['chroot_name']\n"
+        "config_opts['plugin_conf']['ccache_opts']['dir'] = '/cache'\n"
+    )
+    return config_path
+
+
+class TestConfigLoader(object):
+    def test_load(self, config_path):
+        loader = ConfigLoader(str(config_path))
+        config_opts = loader.load('some-root')
+        assert config_opts['root'] == 'some-root'
+        assert config_opts['dist'] == 'el7'
+        assert config_opts['plugin_conf'] == {
+            'ccache_enable': False, 'ccache_opts': {'dir': '/cache'},
+        }
+        assert type(config_opts['plugin_conf']) is dict
+        assert loader.load(str(config_path.join('some-root.cfg'))) == \
+            config_opts
+        with pytest.raises(IOError):
+            loader.load('no-such-root')
+
+    def test_cache(self, config_path, monkeypatch):
+        loader = ConfigLoader(str(config_path))
+        config_opts = loader.load('some-root')
+        config_opts['dist'] = 'changed'
+        opened = []
+        monkeypatch.setattr(
+            'mock_chroot.config.loader.open',
+            lambda *args: opened.append(args) or open(*args), raising=False
+        )
+        assert loader.load('some-root')['dist'] == 'el7'
+        assert opened == []
+        template = config_path.join('templates', 'base.tpl')
+        template.write("config_opts['dist'] = 'el8'\n")
+        os.utime(str(template), (0, 0))
+        assert loader.load('some-root')['dist'] == 'el8'
+        assert [os.path.basename(args[0]) for args in opened] == ['base.tpl']
+
+    def test_site(self, config_path, monkeypatch, tmpdir):
+        monkeypatch.setenv('HOME', str(tmpdir.mkdir('home')))
+        loader = ConfigLoader(str(config_path))
+        assert 'basedir' not in loader.load('some-root', site=True)
+        config_path.join('site-defaults.cfg').write(
+            "config_opts['basedir'] = '/site'\n"
+            "config_opts['dist'] = 'site'\n"
+        )
+        config_opts = loader.load('some-root', site=True)
+        assert config_opts['basedir'] == '/site'
+        assert config_opts['dist'] == 'el7'
+        tmpdir.join('home', '.config', 'mock.cfg').write(
+            "config_opts['basedir'] = '/user'\n", ensure=True
+        )
+        assert loader.load('some-root', site=True)['basedir'] == '/user'
+        assert 'basedir' not in loader.load('some-root')
+
+    def test_render(self):
+        config_opts = mock_chroot.config.render_config(
+            mock_chroot.config.compose(
+                mock_chroot.config.to['root'].set('composed'),
+                mock_chroot.config.ccache(max_cache_size='4G'),
+                mock_chroot.config.env_vars(LANG='C'),
+                mock_chroot.config.bind_mount(('/host', '/mnt')),
+            )
+        )
+        assert config_opts['plugin_conf']['bind_mount_opts'] == {
+            'dirs': [('/host', '/mnt')],
+        }
+        assert config_opts['root'] == 'composed'
+        assert config_opts['plugin_conf']['ccache_opts'] == {
+            'max_cache_size': '4G',
+        }
+        assert config_opts['environment'] == {'LANG': 'C'}
+
+    def test_config_diff(self):
+        old = {'root': 'a', 'opts': {'x': 1, 'y': 2}, 'gone': None}
+        new = {'root': 'a', 'opts': {'x': 1, 'y': 3}, 'added': [1]}
+        assert mock_chroot.config.config_diff(old, new) == [
+            (('added',), None, [1]),
+            (('gone',), None, None),
+            (('opts', 'y'), 2, 3),
+        ]
+
+
+class TestMockChrootConfigOpts(object):
+    def test_config_opts(self):
+        with MockChroot(config="config_opts['root'] = 'from_string'") as mc:
+            assert mc.config_opts()['root'] == 'from_string'
+            assert "config_opts['root'] = 'from_string'" in mc.dump_config()
+
+    def test_root_fingerprint(self, tmpdir):
+        cfg_file = tmpdir.join('some-root.cfg')
+        cfg_file.write("config_opts['dist'] = 'el7'\n")
+        mc = MockChroot(root=str(cfg_file))
+        assert "'dist': 'el7'" in mc.dump_config()
+        fingerprint = mc.fingerprint()
+        cfg_file.write("config_opts['root'] = 'changed'\n")
+        assert MockChroot(root=str(cfg_file)).fingerprint() != fingerprint
+        assert MockChroot(root='opaque').dump_config() == \
+            'Using opaque Mock root string: opaque'
@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+"""test_mock_chroot_config_optimizer.py - Testing for
+mock_chroot/config/optimizer.py
+"""
+import pytest
+
+from mock_chroot.config import (
+    compose, to, bind_mount, ccache, env_vars, optimize, render_config
+)
+from mock_chroot.config.optimizer import _verify
+
+
+class TestOptimize(object):
+    def test_last_write_wins(self):
+        config = compose(
+            to['a'].set(1),
+            to['b'].set('b'),
+            to['a'].set(2),
+            to['c']['d'].set(3),
+            to['c'].set({}),
+        )
+        assert optimize(config, verify=True) == '\n'.join((
+            "config_opts['b'] = 'b'",
+            "config_opts['a'] = 2",
+            "config_opts['c'] = {}",
+        ))
+
+    def test_coalesce(self):
+        config = compose(*(
+            bind_mount(('/host{0}'.format(i), '/mnt{0}'.format(i)))
+            for i in xrange(100)
+        ))
+        optimized = optimize(config, verify=True)
+        assert optimized.count('config_opts') == 2
+        assert optimized.count('.extend(') == 1
+        assert render_config(optimized) == render_config(config)
+
+    def test_fold_into_set(self):
+        config = compose(
+            to['x'].set({'y': [], 'z': {}}),
+            to['x']['y'].append(1),
+            to['x']['y'].extend((2, 3)),
+            to['x']['z']['w'].set('w'),
+            to['l'].set(['a']),
+            to['l'].append('b'),
+        )
+        assert optimize(config, verify=True) == '\n'.join((
+            "config_opts['x'] = {'y': [1, 2, 3], 'z': {'w': 'w'}}",
+            "config_opts['l'] = ['a', 'b']",
+        ))
+
+    def test_barrier(self):
+        config = compose(
+            to['a'].set(1),
+            to['l'].append(1),
+            "config_opts['b'] = config_opts['a'] + len(config_opts['l'])",
+            to['a'].set(2),
+            to['l'].append(2),
+        )
+        optimized = optimize(config, verify=True)
+        assert optimized.splitlines() == [
+            "config_opts['a'] = 1",
+            "config_opts['l'].append(1)",
+            "config_opts['b'] = config_opts['a'] + len(config_opts['l'])",
+            "config_opts['a'] = 2",
+            "config_opts['l'].append(2)",
+        ]
+        assert render_config(optimized)['b'] == 2
+
+    def test_multiline_values(self):
+        config = compose(
+            ccache(max_cache_size='4G'),
+            env_vars(LANG='C', LC_ALL='C'),
+            '"""a\nmulti-line\nstring"""',
+            to['yum.conf'].set('[main]\ncachedir=/var/cache/yum\n'),
+            to['yum.conf'].set('[main]\n'),
+        )
+        optimized = optimize(config, verify=True)
+        assert "cachedir" not in optimized
+        assert 'multi-line' in optimized
+
+    def test_verify(self):
+        with pytest.raises(RuntimeError):
+            _verify("config_opts['a'] = 1", "config_opts['a'] = 2")
+
+    def test_syntax_error(self):
+        assert optimize('not python(') == 'not python('
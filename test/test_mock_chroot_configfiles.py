@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+"""test_mock_chroot_configfiles.py - Testing for mock_chroot/configfiles.py
+"""
+import os
+
+from mock_chroot import MockChroot
+from mock_chroot.configfiles import ConfigFileManager, default_manager
+
+
+class TestConfigFileManager(object):
+    def test_refcount(self, tmpdir):
+        manager = ConfigFileManager(str(tmpdir.join('configs')))
+        cfg1 = manager.acquire('config1')
+        assert cfg1 == manager.acquire('config1')
+        cfg2 = manager.acquire('config2')
+        assert cfg1 != cfg2
+        assert cfg1.endswith('.cfg')
+        with open(cfg1) as ofd:
+            assert ofd.read() == 'config1'
+        assert manager.users(cfg1) == 2
+        manager.release(cfg1)
+        assert os.path.exists(cfg1)
+        manager.release(cfg1)
+        assert not os.path.exists(cfg1)
+        assert manager.users(cfg1) == 0
+        # Releasing too many times does no harm
+        manager.release(cfg1)
+        assert os.path.exists(cfg2)
+        manager.cleanup()
+        assert not os.path.exists(cfg2)
+        assert tmpdir.join('configs').check(dir=True)
+
+    def test_temporary_dir(self):
+        with ConfigFileManager() as manager:
+            cfg = manager.acquire('config')
+            config_dir = manager.config_dir
+            assert os.path.dirname(cfg) == config_dir
+        assert not os.path.exists(config_dir)
+
+
+class TestMockChrootConfigFiles(object):
+    def test_shared_file(self):
+        mc1 = MockChroot(config='some config')
+        mc2 = MockChroot(config='some config')
+        cfg_name = mc1._root
+        assert mc2._root == cfg_name
+        assert default_manager().users(cfg_name) == 2
+        mc1.close()
+        mc1.close()
+        assert os.path.exists(cfg_name)
+        del mc2
+        assert not os.path.exists(cfg_name)
+
+    def test_context_manager(self):
+        with MockChroot(config='some config') as mc:
+            cfg_name = mc._root
+            assert os.path.exists(cfg_name)
+        assert not os.path.exists(cfg_name)
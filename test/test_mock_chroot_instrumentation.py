@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""test_mock_chroot_instrumentation.py - Testing for
+mock_chroot/instrumentation.py
+"""
+import json
+import pytest
+from subprocess import CalledProcessError
+
+from mock_chroot import MockChroot
+from mock_chroot.config import from_koji
+from mock_chroot.instrumentation import add_hook, remove_hook, Collector
+
+
+@pytest.fixture
+def global_hook(request):
+    """Register a global hook that records the invocations it sees
+
+    :returns: A dictionary with 'pre' and 'post' lists of invocations
+    """
+    seen = dict(pre=[], post=[])
+    hook = add_hook(
+        pre=lambda inv: seen['pre'].append((inv, inv.returncode)),
+        post=seen['post'].append
+    )
+    request.addfinalizer(lambda: remove_hook(hook))
+    return seen
+
+
+class TestHooks(object):
+    def test_global_hook(self, fake_mock, global_hook):
+        mc = MockChroot(root='some_root')
+        mc.chroot('echo', 'testing')
+        [(pre_inv, pre_returncode)] = global_hook['pre']
+        assert pre_returncode is None
+        [inv] = global_hook['post']
+        assert inv is pre_inv
+        assert inv.argv == mc._chroot_cmd('echo', 'testing')
+        assert inv.tool == 'fake_mock'
+        assert inv.operation == 'chroot'
+        assert inv.returncode == 0
+        assert inv.output_size == len('testing\n')
+        assert inv.wall_time > 0
+        assert inv.cpu_time >= 0
+        assert inv.max_rss > 0
+        assert not inv.cancelled
+
+    def test_failure(self, fake_mock, global_hook):
+        mc = MockChroot(root='some_root')
+        with pytest.raises(CalledProcessError):
+            mc.chroot('false')
+        assert global_hook['post'][0].returncode == 1
+
+    def test_cancel(self, fake_mock, global_hook):
+        mc = MockChroot(root='some_root')
+        proc = mc.async_chroot('sleep', '10')
+        proc.cancel()
+        [inv] = global_hook['post']
+        assert inv.cancelled
+        assert inv.returncode < 0
+
+    def test_instance_hook(self, fake_mock, global_hook):
+        mc1 = MockChroot(root='root1')
+        mc2 = MockChroot(root='root2')
+        seen = []
+        hook = mc1.add_hook(post=seen.append)
+        mc1.chroot('true')
+        mc1.async_init().result()
+        mc2.chroot('true')
+        assert [inv.operation for inv in seen] == ['chroot', 'init']
+        assert len(global_hook['post']) == 3
+        mc1.remove_hook(hook)
+        mc1.chroot('true')
+        assert len(seen) == 2
+
+    def test_session(self, fake_mock, global_hook):
+        mc = MockChroot(root='some_root')
+        with mc.session() as session:
+            session.run('echo', 'testing')
+            assert len(global_hook['pre']) == 1
+            assert not global_hook['post']
+        [inv] = global_hook['post']
+        assert inv.operation == 'shell'
+        assert inv.returncode == 0
+        assert inv.output_size > len('testing\n')
+
+    def test_koji(self, fake_koji, global_hook):
+        from_koji(target='target1', koji_profile='prof')
+        assert [inv.operation for inv in global_hook['post']] == [
+            'list-targets', 'mock_config',
+        ]
+
+
+class TestCollector(object):
+    def test_collect(self, fake_mock, tmpdir):
+        jsonl = str(tmpdir.join('invocations.jsonl'))
+        collector = Collector(jsonl=jsonl, max_records=2)
+        mc = MockChroot(root='some_root')
+        mc.add_hook(post=collector.record)
+        mc.chroot('true')
+        mc.chroot('echo', 'testing')
+        with pytest.raises(CalledProcessError):
+            mc.chroot('false')
+        assert len(collector.records) == 2
+        with open(jsonl) as ofd:
+            lines = [json.loads(line) for line in ofd]
+        assert [line['returncode'] for line in lines] == [0, 0, 1]
+        assert lines[1]['output_size'] == len('testing\n')
+        assert lines[1]['argv'][-1] == 'testing'
+
+        dump = tmpdir.join('dump.jsonl')
+        collector.write_jsonl(str(dump))
+        assert len(dump.readlines()) == 2
+
+        prom = collector.to_prometheus()
+        assert '# TYPE mock_chroot_command_total counter' in prom
+        assert (
+            'mock_chroot_command_total{tool="fake_mock",operation="chroot",'
+            'status="ok"} 2'
+        ) in prom.splitlines()
+        assert (
+            'mock_chroot_command_total{tool="fake_mock",operation="chroot",'
+            'status="failed"} 1'
+        ) in prom.splitlines()
+        assert (
+            'mock_chroot_command_output_bytes_total{tool="fake_mock",'
+            'operation="chroot",status="ok"} 8'
+        ) in prom.splitlines()
+
+        prom_file = tmpdir.join('metrics.prom')
+        collector.write_prometheus(str(prom_file))
+        assert prom_file.read() == prom
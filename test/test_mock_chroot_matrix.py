@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+"""test_mock_chroot_matrix.py - Testing for mock_chroot/matrix.py
+"""
+import os
+import pytest
+from time import time
+
+from mock_chroot import MockChroot, BuildMatrix
+from mock_chroot.matrix import default_concurrency
+from mock_chroot.process import MockTimeoutError
+
+
+class TestBuildMatrix(object):
+    @pytest.fixture(autouse=True)
+    def no_dnf(self, monkeypatch):
+        monkeypatch.setattr(MockChroot, 'has_dnf', classmethod(lambda c: False))
+
+    def test_run(self, fake_mock, monkeypatch, tmpdir):
+        monkeypatch.setenv('FAKE_MOCK_BUILD_TIME', '0.3')
+        roots = [MockChroot(root='root1'), MockChroot(root='root2')]
+        matrix = BuildMatrix(max_workers=4, resultdir=str(tmpdir))
+        for src_rpm in ('pkg1.src.rpm', 'pkg2.src.rpm'):
+            for mock in roots:
+                matrix.add(mock, src_rpm)
+        started = time()
+        results = matrix.run()
+        duration = time() - started
+        # The fake mock fails builds that run in parallel in the same root, so
+        # if all builds succeeded, they never shared one
+        assert results.ok
+        assert len(results.succeeded) == 4
+        # Builds in different roots did run in parallel
+        assert duration < 4 * 0.3
+        for result, job in zip(results, matrix.jobs):
+            assert result.job is job
+            assert result.duration >= 0.3
+            assert result.output == 'built {0}\n'.format(job.src_rpm)
+            assert result.resultdir == str(tmpdir.join(job.name))
+            assert os.path.exists(os.path.join(result.resultdir, job.src_rpm))
+        assert [job.name for job in matrix.jobs] == [
+            '000-pkg1', '001-pkg1', '002-pkg2', '003-pkg2'
+        ]
+
+    def test_same_root(self, fake_mock, tmpdir):
+        config = "config_opts['root'] = 'shared'\n"
+        matrix = BuildMatrix(
+            [(config, 'pkg1.src.rpm'), (config, 'pkg2.src.rpm')],
+            max_workers=2
+        )
+        assert matrix.jobs[0].root_key == matrix.jobs[1].root_key
+        # Configurations that differ in anything but the root name still
+        # share the chroot
+        matrix.add(config + "config_opts['macros']['%foo'] = '1'\n", 'p3')
+        assert matrix.jobs[0].root_key == matrix.jobs[2].root_key
+        # As do chroots given by a configuration file
+        cfg_file = tmpdir.join('shared.cfg')
+        cfg_file.write(config)
+        matrix.add(MockChroot(root=str(cfg_file)), 'p4')
+        assert matrix.jobs[0].root_key == matrix.jobs[3].root_key
+        matrix.add("config_opts['root'] = 'other'\n", 'p5')
+        matrix.add(MockChroot(config=config, unique_ext='x'), 'p6')
+        assert len(set(job.root_key for job in matrix.jobs)) == 3
+
+    def test_close(self, fake_mock):
+        mock = MockChroot(config="config_opts['root'] = 'given'\n")
+        matrix = BuildMatrix([
+            ("config_opts['root'] = 'root1'\n", 'pkg1.src.rpm'),
+            (mock, 'pkg2.src.rpm'),
+        ])
+        cfg_files = [job.mock._root for job in matrix.jobs]
+        assert all(os.path.exists(cfg_file) for cfg_file in cfg_files)
+        assert matrix.run().ok
+        # Only the chroots the matrix created are closed
+        assert not os.path.exists(cfg_files[0])
+        assert os.path.exists(cfg_files[1])
+        assert mock.chroot('echo', 'testing') == 'testing\n'
+        mock.close()
+        with BuildMatrix() as matrix:
+            job = matrix.add("config_opts['root'] = 'root1'\n", 'pkg1.src.rpm')
+            cfg_file = job.mock._root
+        assert not os.path.exists(cfg_file)
+
+    def test_failure(self, fake_mock):
+        matrix = BuildMatrix(
+            [
+                (MockChroot(root='root1'), 'pkg1.src.rpm'),
+                (MockChroot(root='root2'), 'fail.src.rpm'),
+            ],
+        )
+        results = matrix.run()
+        assert not results.ok
+        assert [r.job.src_rpm for r in results.succeeded] == ['pkg1.src.rpm']
+        assert [r.job.src_rpm for r in results.failed] == ['fail.src.rpm']
+        assert results.failed[0].returncode == 1
+        assert results.failed[0].error is not None
+
+    def test_timeout(self, fake_mock, monkeypatch):
+        monkeypatch.setenv('FAKE_MOCK_BUILD_TIME', '10')
+        matrix = BuildMatrix(
+            [(MockChroot(root='root1'), 'pkg1.src.rpm')], timeout=0.3
+        )
+        started = time()
+        results = matrix.run()
+        assert time() - started < 5
+        assert not results.ok
+        assert isinstance(results[0].error, MockTimeoutError)
+        assert results[0].returncode is None
+
+    def test_default_concurrency(self):
+        assert default_concurrency() >= 1
+        assert default_concurrency(mem_per_job=2 ** 60) == 1
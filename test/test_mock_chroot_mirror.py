@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+"""test_mock_chroot_mirror.py - Testing for mock_chroot/mirror.py
+"""
+import os
+import urllib2
+from threading import Thread
+
+import pytest
+
+from mock_chroot import RepoMirror
+from mock_chroot.config import compose, to, render_config
+from mock_chroot.mirror import rewrite_repos
+
+REPO_CONF = """
+[main]
+keepcache=1
+
+[base]
+name=base
+baseurl={upstream}
+        http://example.com/unused/
+enabled=1
+
+[updates]
+name=updates
+mirrorlist=http://example.com/mirrorlist?arch=$basearch
+baseurl=http://example.com/updates/$basearch/
+gpgcheck=0
+
+[other]
+metalink=http://example.com/metalink
+"""
+
+
+@pytest.fixture
+def upstream(tmpdir):
+    repo = tmpdir.join('upstream')
+    repo.join('repodata', 'repomd.xml').write('<repomd/>', ensure=True)
+    repo.join('Packages', 'foo-1.0-1.noarch.rpm').write('foo', ensure=True)
+    return repo
+
+
+@pytest.yield_fixture
+def mirror(tmpdir):
+    with RepoMirror(cache_dir=str(tmpdir.join('cache'))) as repo_mirror:
+        yield repo_mirror
+
+
+def _get(url):
+    response = urllib2.urlopen(url)
+    try:
+        return response.read()
+    finally:
+        response.close()
+
+
+class TestRepoMirror(object):
+    def test_serve(self, mirror, upstream):
+        repo_url = mirror.add_repo('base', 'file://' + str(upstream))
+        assert repo_url.startswith(mirror.url + '/base-')
+        assert _get(repo_url + 'Packages/foo-1.0-1.noarch.rpm') == 'foo'
+        assert (mirror.hits, mirror.misses) == (0, 1)
+        upstream.join('Packages', 'foo-1.0-1.noarch.rpm').remove()
+        assert _get(repo_url + 'Packages/foo-1.0-1.noarch.rpm') == 'foo'
+        assert (mirror.hits, mirror.misses) == (1, 1)
+
+    def test_missing(self, mirror, upstream):
+        repo_url = mirror.add_repo('base', 'file://' + str(upstream))
+        for url in (
+            repo_url + 'Packages/bar-1.0-1.noarch.rpm',
+            mirror.url + '/unknown/repodata/repomd.xml',
+            repo_url + '../../etc/passwd',
+        ):
+            with pytest.raises(urllib2.HTTPError) as excinfo:
+                _get(url)
+            assert excinfo.value.code == 404
+
+    def test_metadata_ttl(self, mirror, upstream):
+        repo_url = mirror.add_repo('base', 'file://' + str(upstream))
+        assert _get(repo_url + 'repodata/repomd.xml') == '<repomd/>'
+        upstream.join('repodata', 'repomd.xml').write('<repomd new="1"/>')
+        assert _get(repo_url + 'repodata/repomd.xml') == '<repomd/>'
+        mirror.metadata_ttl = 0
+        assert _get(repo_url + 'repodata/repomd.xml') == '<repomd new="1"/>'
+
+    def test_parallel(self, mirror, upstream):
+        repo_url = mirror.add_repo('base', 'file://' + str(upstream))
+        results = []
+        threads = [
+            Thread(target=lambda: results.append(
+                _get(repo_url + 'Packages/foo-1.0-1.noarch.rpm')
+            ))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == ['foo'] * 8
+        assert (mirror.hits, mirror.misses) == (7, 1)
+        # Locks for fetching files are not kept once they are fetched
+        assert mirror._fetch_locks == {}  # pylint: disable=protected-access
+
+    def test_parallel_files(self, mirror, upstream):
+        for index in range(16):
+            upstream.join('Packages', 'p{0}.rpm'.format(index)).write('p')
+        repo_url = mirror.add_repo('base', 'file://' + str(upstream))
+        threads = [
+            Thread(target=_get, args=(
+                repo_url + 'Packages/p{0}.rpm'.format(index % 16),
+            ))
+            for index in range(48)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert (mirror.hits, mirror.misses) == (32, 16)
+        assert mirror._fetch_locks == {}  # pylint: disable=protected-access
+
+    def test_config(self, mirror, upstream):
+        base_config = compose(
+            to['target_arch'].set('x86_64'),
+            to['yum.conf'].set(
+                REPO_CONF.format(upstream='file://' + str(upstream))
+            ),
+        )
+        config_opts = render_config(mirror.config(base_config))
+        assert config_opts['target_arch'] == 'x86_64'
+        repo_conf = config_opts['yum.conf']
+        assert 'mirrorlist' not in repo_conf
+        assert 'example.com/updates' not in repo_conf
+        assert 'example.com/unused' not in repo_conf
+        assert 'metalink=http://example.com/metalink' in repo_conf
+        base_url = [
+            line.split('=', 1)[1] for line in repo_conf.splitlines()
+            if line.startswith('baseurl=') and '/base-' in line
+        ][0]
+        assert _get(base_url + 'repodata/repomd.xml') == '<repomd/>'
+
+    def test_not_started(self, tmpdir):
+        with pytest.raises(RuntimeError):
+            RepoMirror(cache_dir=str(tmpdir)).add_repo('base', 'file:///x')
+
+    def test_restart(self, tmpdir, upstream):
+        repo_mirror = RepoMirror(cache_dir=str(tmpdir.join('cache')))
+        with repo_mirror:
+            repo_url = repo_mirror.add_repo('base', 'file://' + str(upstream))
+            _get(repo_url + 'Packages/foo-1.0-1.noarch.rpm')
+        assert os.listdir(str(tmpdir.join('cache')))
+        with repo_mirror:
+            repo_url = repo_mirror.add_repo('base', 'file://' + str(upstream))
+            assert _get(repo_url + 'Packages/foo-1.0-1.noarch.rpm') == 'foo'
+        assert repo_mirror.hits == 1
+
+
+class TestRewriteRepos(object):
+    def test_rewrite(self):
+        added = []
+
+        def add_repo(name, baseurl):
+            added.append((name, baseurl))
+            return 'http://mirror/{0}/'.format(name)
+        rewritten = rewrite_repos(
+            REPO_CONF.format(upstream='http://example.com/base/'), add_repo,
+            {'basearch': 'i386'}
+        )
+        assert added == [
+            ('base', 'http://example.com/base/'),
+            ('updates', 'http://example.com/updates/i386/'),
+        ]
+        assert rewritten.splitlines() == [
+            '', '[main]', 'keepcache=1', '',
+            '[base]', 'name=base', 'baseurl=http://mirror/base/', 'enabled=1',
+            '',
+            '[updates]', 'name=updates', 'baseurl=http://mirror/updates/',
+            'gpgcheck=0', '',
+            '[other]', 'metalink=http://example.com/metalink',
+        ]
+
+    def test_unknown_variables(self):
+        repo_conf = REPO_CONF.format(upstream='http://example.com/$foo/')
+        assert rewrite_repos(repo_conf, lambda name, url: 'x') == repo_conf
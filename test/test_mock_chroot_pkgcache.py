@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""test_mock_chroot_pkgcache.py - Testing for mock_chroot/pkgcache.py
+"""
+from threading import Thread, Event
+from subprocess import CalledProcessError
+
+import mock_chroot.pkgcache
+from mock_chroot import MockChroot, PackageCache
+from mock_chroot.config.loader import ConfigLoader
+
+
+def _pm_invocations(log_file):
+    with open(log_file) as log:
+        return [
+            line.split(' -- ', 1)[1].split() for line in log
+            if ' --dnf-cmd -- ' in line or ' --yum-cmd -- ' in line
+        ]
+
+
+class TestPackageCache(object):
+    def test_config(self, tmpdir):
+        cache = PackageCache(str(tmpdir.join('cache')), package_manager='dnf')
+        assert tmpdir.join('cache').check(dir=True)
+        config_opts = ConfigLoader().render(cache.config())
+        assert config_opts['plugin_conf']['bind_mount_opts']['dirs'] == [
+            (str(tmpdir.join('cache')), '/var/cache/dnf'),
+        ]
+        assert config_opts['plugin_conf']['yum_cache_enable'] is False
+        assert config_opts['dnf_common_opts'] == ['--setopt=keepcache=1']
+
+    def test_build_requires(self, monkeypatch):
+        commands = []
+
+        def check_output(cmd):
+            commands.append(cmd)
+            return 'gcc\nmake >= 4\nrpmlib(CompressedFileNames) <= 3.0.4-1\n' \
+                'gcc\n'
+        monkeypatch.setattr(mock_chroot.pkgcache, 'check_output', check_output)
+        assert PackageCache.build_requires(['a.src.rpm', 'b.src.rpm']) == [
+            'gcc', 'make >= 4',
+        ]
+        assert commands[0][-2:] == ('a.src.rpm', 'b.src.rpm')
+        assert PackageCache.build_requires([]) == []
+        assert len(commands) == 1
+
+    def test_prefetch(self, fake_mock, tmpdir):
+        cache = PackageCache(str(tmpdir.join('cache')))
+        mc = MockChroot(root='some_root')
+        assert cache.prefetch(mc, packages=['gcc', 'make']) == ['gcc', 'make']
+        assert mc.is_initialized()
+        assert cache.prefetch(mc, packages=['make', 'bison']) == ['bison']
+        assert cache.prefetch(mc, packages=['gcc']) == []
+        assert _pm_invocations(fake_mock) == [
+            ['install', '--downloadonly', '-y', 'gcc', 'make'],
+            ['install', '--downloadonly', '-y', 'bison'],
+        ]
+
+    def test_single_flight(self, fake_mock, tmpdir, monkeypatch):
+        monkeypatch.setattr(MockChroot, 'has_dnf', classmethod(lambda c: True))
+        cache = PackageCache(str(tmpdir.join('cache')))
+        mc = MockChroot(root='some_root')
+        mc.init()
+        threads = [
+            Thread(target=cache.prefetch, args=(mc,), kwargs=dict(
+                packages=['gcc', 'make', 'pkg{0}'.format(i)]
+            ))
+            for i in xrange(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        fetched = [
+            package for args in _pm_invocations(fake_mock)
+            for package in args[3:]
+        ]
+        assert sorted(fetched) == sorted(
+            ['gcc', 'make'] + ['pkg{0}'.format(i) for i in xrange(5)]
+        )
+
+    def test_failed_flight(self, tmpdir, monkeypatch):
+        cache = PackageCache(str(tmpdir.join('cache')), package_manager='dnf')
+        started = Event()
+        release = Event()
+
+        def download(mock, packages):
+            started.set()
+            release.wait()
+            raise CalledProcessError(1, ['dnf'])
+        monkeypatch.setattr(cache, '_download', download)
+        errors = []
+
+        def prefetch():
+            try:
+                cache.prefetch(None, packages=['gcc'])
+            except CalledProcessError as e:
+                errors.append(e)
+        fetcher = Thread(target=prefetch)
+        fetcher.start()
+        started.wait()
+        # Find out when the other thread starts waiting for the download
+        in_flight = cache._in_flight['gcc']  # pylint: disable=W0212
+        done, waiting = in_flight.done, Event()
+
+        class WatchedEvent(object):
+            def wait(self):
+                waiting.set()
+                done.wait()
+
+            def set(self):
+                done.set()
+        in_flight.done = WatchedEvent()
+        waiter = Thread(target=prefetch)
+        waiter.start()
+        waiting.wait()
+        release.set()
+        fetcher.join()
+        waiter.join()
+        # The thread that waited for the download failed along with it
+        assert len(errors) == 2
+        assert errors[0] is errors[1]
+        # Nothing was recorded as fetched
+        monkeypatch.setattr(cache, '_download', lambda mock, packages: None)
+        assert cache.prefetch(None, packages=['gcc']) == ['gcc']
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""test_mock_chroot_pool.py - Testing for mock_chroot/pool.py
+"""
+import pytest
+from threading import Thread
+from subprocess import CalledProcessError
+
+from mock_chroot import MockChroot, ChrootPool
+
+
+class TestChrootPool(object):
+    @staticmethod
+    def invocations(log_file, action):
+        try:
+            with open(log_file) as log:
+                return [
+                    line for line in log.read().splitlines() if action in line
+                ]
+        except IOError:
+            return []
+
+    def test_checkout(self, fake_mock):
+        resets = []
+        pool = ChrootPool(size=1, reset=resets.append)
+        with pool.checkout(root='some_root') as mc:
+            assert isinstance(mc, MockChroot)
+            assert mc.unique_ext == pool.ext_prefix + '0'
+            first_mc = mc
+        assert resets == [first_mc]
+        with pool.checkout(root='some_root') as mc:
+            assert mc is first_mc
+        with pool.checkout(root='other_root') as mc:
+            assert mc is not first_mc
+        assert len(self.invocations(fake_mock, '--init')) == 2
+        assert self.invocations(fake_mock, '--init')[0] == \
+            '--root=some_root --uniqueext={0}0 --init'.format(pool.ext_prefix)
+        with pool:
+            pass
+        assert len(self.invocations(fake_mock, '--clean')) == 2
+        with pytest.raises(RuntimeError):
+            with pool.checkout(root='some_root'):
+                pass
+
+    def test_builddir_reset(self, fake_mock, monkeypatch):
+        chroot_calls = []
+        monkeypatch.setattr(
+            MockChroot, 'chroot', lambda self, *cmd: chroot_calls.append(cmd)
+        )
+        pool = ChrootPool()
+        with pool.checkout(config='some config'):
+            pass
+        assert chroot_calls == [('rm', '-rf', '/builddir/build')]
+
+    def test_clean_reset(self, fake_mock):
+        pool = ChrootPool(reset='clean')
+        for _ in range(2):
+            with pool.checkout(root='some_root'):
+                pass
+        assert len(self.invocations(fake_mock, '--init')) == 2
+        assert len(self.invocations(fake_mock, '--clean')) == 2
+        with pytest.raises(ValueError):
+            ChrootPool(reset='bad method')
+
+    def test_max_uses(self, fake_mock):
+        pool = ChrootPool(size=1, max_uses=2, reset=None)
+        mcs = []
+        for _ in range(3):
+            with pool.checkout(root='some_root') as mc:
+                mcs.append(mc)
+        assert mcs[0] is mcs[1]
+        assert mcs[2] is not mcs[0]
+        assert len(self.invocations(fake_mock, '--init')) == 2
+        assert len(self.invocations(fake_mock, '--clean')) == 1
+
+    def test_failure_retires(self, fake_mock):
+        pool = ChrootPool(size=1, reset=None)
+        with pytest.raises(KeyError):
+            with pool.checkout(root='some_root') as mc:
+                first_mc = mc
+                raise KeyError()
+        with pool.checkout(root='some_root') as mc:
+            assert mc is not first_mc
+
+    def test_warm(self, fake_mock):
+        pool = ChrootPool(size=3, reset=None)
+        pool.warm(config='some config', amount=2)
+        assert len(self.invocations(fake_mock, '--init')) == 2
+        pool.warm(config='some config')
+        assert len(self.invocations(fake_mock, '--init')) == 3
+        with pool.checkout(config='some config'):
+            pass
+        assert len(self.invocations(fake_mock, '--init')) == 3
+
+    def test_warm_failure(self, fake_mock, monkeypatch):
+        inits = []
+        async_init = MockChroot.async_init
+
+        def failing_async_init(mock, timeout=None):
+            inits.append(mock)
+            if len(inits) == 2:
+                return mock.async_chroot('false')
+            return async_init(mock, timeout)
+        monkeypatch.setattr(MockChroot, 'async_init', failing_async_init)
+        pool = ChrootPool(size=3, reset=None)
+        with pytest.raises(CalledProcessError):
+            pool.warm(config='some config')
+        # Only the chroot that failed was cleaned, the others were kept
+        assert self.invocations(fake_mock, '--clean') == [
+            '--root={0} --uniqueext={1} --clean'.format(
+                inits[1]._root, inits[1].unique_ext
+            )
+        ]
+        pool.warm(config='some config')
+        assert len(inits) == 4
+
+    def test_unique_pools(self, fake_mock):
+        first = ChrootPool(size=1, reset=None)
+        second = ChrootPool(size=1, reset=None)
+        with first.checkout(root='some_root') as first_mc:
+            with second.checkout(root='some_root') as second_mc:
+                assert first_mc.unique_ext != second_mc.unique_ext
+
+    def test_concurrent_checkout(self, fake_mock):
+        pool = ChrootPool(size=2, reset=None)
+        in_use = []
+        overlaps = []
+
+        def worker():
+            for _ in range(5):
+                with pool.checkout(root='some_root') as mc:
+                    if mc in in_use:
+                        overlaps.append(mc)
+                    in_use.append(mc)
+                    in_use.remove(mc)
+        threads = [Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not overlaps
+        assert len(self.invocations(fake_mock, '--init')) <= 2
+
+    def test_rollback_reset(self, fake_mock, tmpdir):
+        pool = ChrootPool(size=1, reset='rollback')
+        for _ in range(3):
+            with pool.checkout(root='some_root') as mc:
+                root_path = tmpdir.join(
+                    'basedir', 'some_root-' + pool.ext_prefix + '0', 'root'
+                )
+                assert not root_path.join('dirty').exists()
+                root_path.join('dirty').ensure()
+        assert len(self.invocations(fake_mock, '--init')) == 1
+        assert len(self.invocations(fake_mock, '--snapshot')) == 1
+        assert len(self.invocations(fake_mock, '--rollback-to')) == 3
+        assert mc.list_snapshots() == [ChrootPool.SNAPSHOT]
@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+"""test_mock_chroot_process.py - Testing for mock_chroot/process.py
+"""
+import os
+import errno
+import signal
+import pytest
+from time import time
+from subprocess import CalledProcessError
+
+from mock_chroot import MockChroot
+from mock_chroot.process import (
+    MockProcess, MockCancelledError, MockTimeoutError, wait_all, wait_any
+)
+
+
+class TestMockProcess(object):
+    def test_async_chroot(self, fake_mock):
+        mc = MockChroot(root='some_root')
+        proc = mc.async_chroot('echo', 'testing')
+        assert proc.result() == 'testing\n'
+        assert proc.done and not proc.cancelled
+        proc = mc.async_chroot('pwd', cwd='etc')
+        assert proc.result() == '/etc\n'
+        proc = mc.async_chroot('bash', '-c', 'echo failing; exit 3')
+        with pytest.raises(CalledProcessError) as excinfo:
+            proc.result()
+        assert excinfo.value.returncode == 3
+        assert excinfo.value.output == 'failing\n'
+
+    def test_async_get_root_path(self, fake_mock, tmpdir):
+        mc = MockChroot(root='some_root')
+        proc = mc.async_get_root_path()
+        assert proc.result() == str(tmpdir.join('basedir/some_root/root'))
+
+    def test_async_rebuild(self, fake_mock, monkeypatch):
+        monkeypatch.setattr(MockChroot, 'has_dnf', classmethod(lambda c: True))
+        mc = MockChroot(root='some_root')
+        proc = mc.async_rebuild('some.src.rpm', define='def1')
+        assert proc.result() == 'built some.src.rpm\n'
+        with open(fake_mock) as log:
+            invocations = log.read().splitlines()
+        assert invocations == [
+            '--root=some_root --init --define def1',
+            '--root=some_root --rebuild some.src.rpm --no-clean '
+            '--define def1 --dnf',
+        ]
+
+    def test_concurrency(self, fake_mock):
+        mc = MockChroot(root='some_root')
+        started = time()
+        procs = [mc.async_chroot('sleep', '0.3') for _ in range(5)]
+        assert wait_any(procs, timeout=0.05) == set()
+        assert not any(proc.poll() for proc in procs)
+        assert wait_all(procs) == set(procs)
+        assert time() - started < 1
+        assert [proc.result() for proc in procs] == [''] * 5
+
+    def test_cancel(self, fake_mock):
+        mc = MockChroot(root='some_root')
+        started = time()
+        proc = mc.async_chroot('bash', '-c', 'echo started; sleep 10')
+        assert not proc.wait(timeout=0.2)
+        proc.cancel()
+        assert proc.done and proc.cancelled
+        with pytest.raises(MockCancelledError) as excinfo:
+            proc.result()
+        assert excinfo.value.output == 'started\n'
+        proc = mc.async_chroot('sleep', '10')
+        with pytest.raises(MockCancelledError):
+            proc.result(timeout=0.2)
+        assert time() - started < 2
+
+    def test_interrupted_wait(self, fake_mock, tmpdir):
+        mc = MockChroot(root='some_root')
+        marker = tmpdir.join('terminated')
+        proc = mc.async_chroot(
+            'bash', '-c',
+            'trap "touch {0}; exit 1" TERM; sleep 10 & wait'.format(marker)
+        )
+
+        def interrupt(signum, frame):
+            raise KeyboardInterrupt()
+        previous = signal.signal(signal.SIGALRM, interrupt)
+        try:
+            signal.setitimer(signal.ITIMER_REAL, 0.3)
+            with pytest.raises(KeyboardInterrupt):
+                proc.result()
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+        assert proc.done and proc.cancelled
+        # The command was given a chance to clean up
+        assert marker.check()
+
+    def test_timeout(self, fake_mock):
+        mc = MockChroot(root='some_root')
+        started = time()
+        proc = mc.async_chroot(
+            'bash', '-c', 'echo started; sleep 10', timeout=0.3
+        )
+        with pytest.raises(MockTimeoutError) as excinfo:
+            proc.result()
+        assert time() - started < 2
+        assert proc.done and proc.cancelled and proc.timed_out
+        assert excinfo.value.output == 'started\n'
+        assert excinfo.value.timeout == 0.3
+        assert isinstance(excinfo.value, MockCancelledError)
+        procs = [mc.async_chroot('sleep', '10', timeout=0.3)]
+        procs.append(mc.async_chroot('sleep', '0.1'))
+        assert wait_all(procs) == set(procs)
+        assert [proc.timed_out for proc in procs] == [True, False]
+
+    def test_timeout_grace(self, fake_mock, monkeypatch):
+        mc = MockChroot(root='some_root', timeout=0.3)
+        # Commands are given a chance to clean up after SIGTERM
+        with pytest.raises(MockTimeoutError) as excinfo:
+            mc.chroot(
+                'bash', '-c',
+                'trap "echo terminated; exit 0" TERM; echo started; '
+                'sleep 10 & wait'
+            )
+        assert excinfo.value.output == 'started\nterminated\n'
+        # Commands that ignore SIGTERM are killed once the grace time is over
+        monkeypatch.setattr(MockProcess, 'KILL_GRACE', 0.3)
+        started = time()
+        with pytest.raises(MockTimeoutError):
+            mc.chroot('bash', '-c', 'trap "" TERM; echo started; sleep 10')
+        assert time() - started < 2
+
+    def test_cancel_grace(self, fake_mock):
+        mc = MockChroot(root='some_root')
+        trap_cmd = (
+            'bash', '-c',
+            'trap "echo terminated; exit 0" TERM; echo started; '
+            'sleep 10 & wait'
+        )
+        # Cancelling gives commands a chance to clean up by default
+        proc = mc.async_chroot(*trap_cmd)
+        with pytest.raises(MockCancelledError) as excinfo:
+            proc.result(timeout=0.3)
+        assert excinfo.value.output == 'started\nterminated\n'
+        proc = mc.async_chroot(*trap_cmd)
+        proc.cancel(grace=0)
+        assert proc.done and proc.returncode == -signal.SIGKILL
+
+    def test_cancel_not_permitted(self, fake_mock, monkeypatch):
+        # Commands may run as a different user, e.g. via consolehelper
+        killpg = os.killpg
+
+        def no_killpg(pid, sig):
+            raise OSError(errno.EPERM, os.strerror(errno.EPERM))
+        monkeypatch.setattr(os, 'killpg', no_killpg)
+        mc = MockChroot(root='some_root')
+        proc = mc.async_chroot('sleep', '10', timeout=0.3)
+        started = time()
+        try:
+            with pytest.raises(MockTimeoutError):
+                proc.result()
+            assert time() - started < 2
+            assert proc.done and proc.timed_out
+        finally:
+            killpg(proc._proc.pid, signal.SIGKILL)  # pylint: disable=W0212
+
+    def test_instance_timeout(self, fake_mock, monkeypatch):
+        mc = MockChroot(root='some_root', timeout=0.3)
+        with pytest.raises(MockTimeoutError):
+            mc.chroot('sleep', '10')
+        assert mc.chroot('sleep', '0.5', timeout=5) == ''
+        monkeypatch.setenv('FAKE_MOCK_BUILD_TIME', '10')
+        started = time()
+        with pytest.raises(MockTimeoutError):
+            mc.rebuild('some.src.rpm')
+        with pytest.raises(MockTimeoutError):
+            list(mc.stream_rebuild('some.src.rpm'))
+        # The timeout covers all the commands of an operation together
+        with pytest.raises(MockTimeoutError):
+            mc.rebuild('some.src.rpm', timeout=0.5)
+        assert time() - started < 5
+
+    def test_rlimits(self, fake_mock):
+        mc = MockChroot(root='some_root', rlimits={'nofile': 64, 'cpu': 50})
+        assert mc.chroot('bash', '-c', 'ulimit -n; ulimit -t') == '64\n50\n'
+        mc = MockChroot(root='some_root', rlimits={'no_such_limit': 1})
+        with pytest.raises(ValueError):
+            mc.chroot('true')
+
+
+class TestStreamOutput(object):
+    def test_stream_chroot(self, fake_mock, tmpdir):
+        mc = MockChroot(root='some_root')
+        tee = str(tmpdir.join('tee.log'))
+        output = list(mc.stream_chroot(
+            'bash', '-c', 'echo out1; echo err1 >&2; printf "out2"',
+            tee=tee
+        ))
+        assert sorted(output) == [
+            ('stderr', 'err1\n'), ('stdout', 'out1\n'), ('stdout', 'out2'),
+        ]
+        assert [d for s, d in output if s == 'stdout'] == ['out1\n', 'out2']
+        with open(tee) as tee_file:
+            assert sorted(tee_file.read()) == sorted('out1\nerr1\nout2')
+
+    def test_chunks(self, fake_mock):
+        mc = MockChroot(root='some_root')
+        output = mc.stream_chroot(
+            'bash', '-c', 'head -c 200000 /dev/zero', lines=False
+        )
+        chunks = [data for stream, data in output]
+        assert len(chunks) > 1
+        assert ''.join(chunks) == '\0' * 200000
+        output = mc.stream_chroot('bash', '-c', 'head -c 200000 /dev/zero')
+        lines = [data for stream, data in output]
+        # Lines are cut if they become too long
+        assert max(len(line) for line in lines) < 200000
+        assert ''.join(lines) == '\0' * 200000
+
+    def test_stream_rebuild(self, fake_mock, monkeypatch):
+        monkeypatch.setattr(MockChroot, 'has_dnf', classmethod(lambda c: True))
+        mc = MockChroot(root='some_root')
+        output = list(mc.stream_rebuild('some.src.rpm'))
+        assert output == [('stdout', 'built some.src.rpm\n')]
+        output = mc.stream_rebuild('fail.src.rpm')
+        with pytest.raises(CalledProcessError):
+            list(output)
+
+    def test_stream_timeout(self, fake_mock):
+        mc = MockChroot(root='some_root')
+        output = mc.stream_chroot(
+            'bash', '-c', 'echo started; sleep 10', timeout=0.3
+        )
+        assert next(output) == ('stdout', 'started\n')
+        with pytest.raises(MockTimeoutError):
+            list(output)
+
+    def test_close(self, fake_mock):
+        mc = MockChroot(root='some_root')
+        started = time()
+        output = mc.stream_chroot('bash', '-c', 'echo started; sleep 10')
+        assert next(output) == ('stdout', 'started\n')
+        output.close()
+        assert time() - started < 2
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+"""test_mock_chroot_results.py - Testing for mock_chroot/results.py
+"""
+import pytest
+
+from mock_chroot import MockChroot, BuildResult
+from mock_chroot.results import StateLogParser, Timeline, summarize_log
+
+STATE_LOG = """\
+2016-09-13 12:18:49,613 - INFO - Start: run
+2016-09-13 12:18:49,616 - INFO - Start(bootstrap): chroot init
+2016-09-13 12:18:59,616 - INFO - Finish(bootstrap): chroot init
+2016-09-13 12:18:59,616 - INFO - Start: chroot init
+2016-09-13 12:19:09,616 - INFO - Finish: chroot init
+2016-09-13 12:19:09,616 - Start: build phase for foo.src.rpm
+2016-09-13 12:19:09,616 - Start: build setup for foo.src.rpm
+2016-09-13 12:20:19,616 - Finish: build setup for foo.src.rpm
+2016-09-13 12:20:19,616 - Start: rpmbuild foo.src.rpm
+2016-09-13 12:20:29,616 - Finish: rpmbuild foo.src.rpm
+2016-09-13 12:20:29,616 - Finish: build phase for foo.src.rpm
+2016-09-13 12:20:29,616 - Start: clean chroot
+2016-09-13 12:20:39,616 - Finish: run
+"""
+
+
+class TestStateLogParser(object):
+    @pytest.mark.parametrize('chunk_size', [1, 7, 100000])
+    def test_feed(self, chunk_size):
+        parser = StateLogParser()
+        for start in xrange(0, len(STATE_LOG), chunk_size):
+            parser.feed(STATE_LOG[start:start + chunk_size])
+        phases = parser.close()
+        assert [(p.name, p.context, p.depth) for p in phases] == [
+            ('run', None, 0),
+            ('chroot init', 'bootstrap', 1),
+            ('chroot init', None, 1),
+            ('build phase for foo.src.rpm', None, 1),
+            ('build setup for foo.src.rpm', None, 2),
+            ('rpmbuild foo.src.rpm', None, 2),
+            ('clean chroot', None, 1),
+        ]
+        assert [p.duration for p in phases[:-1]] == pytest.approx(
+            [110.003, 10, 10, 80, 70, 10]
+        )
+        assert phases[-1].duration is None
+        assert phases[3].children == phases[4:6]
+
+    def test_partial_last_line(self):
+        parser = StateLogParser()
+        parser.feed(STATE_LOG.rstrip('\n'))
+        assert parser.phases[0].finished is None
+        assert parser.close()[0].finished is not None
+
+
+class TestTimeline(object):
+    def test_from_resultdir(self, tmpdir):
+        tmpdir.join('state.log').write(STATE_LOG)
+        tmpdir.join('build.log').write('line\n' * 1000)
+        tmpdir.join('root.log').write(
+            '2016-09-13 12:18:50,000 - DEBUG - first\n'
+            'continued\n'
+            '2016-09-13 12:19:00,500 - DEBUG - last\n'
+        )
+        timeline = Timeline.from_resultdir(str(tmpdir))
+        assert timeline.duration == pytest.approx(110.003)
+        assert [p.name for p in timeline.roots] == ['run']
+        durations = timeline.durations()
+        assert list(durations)[:2] == ['run', 'chroot init']
+        assert durations['chroot init'] == pytest.approx(20)
+        fractions = timeline.fractions()
+        assert fractions['build setup for foo.src.rpm'] == pytest.approx(
+            70 / 110.003
+        )
+        assert timeline.logs['build.log'].lines == 1000
+        assert timeline.logs['build.log'].size == 5000
+        assert timeline.logs['build.log'].started is None
+        assert timeline.logs['root.log'].duration == pytest.approx(10.5)
+
+    def test_missing_logs(self, tmpdir):
+        timeline = Timeline.from_resultdir(str(tmpdir))
+        assert timeline.phases == []
+        assert timeline.logs == {}
+        assert timeline.duration is None
+
+    def test_summarize_log(self, tmpdir):
+        log = tmpdir.join('build.log')
+        log.write('no time stamps\n')
+        summary = summarize_log(str(log))
+        assert summary.lines == 1
+        assert summary.finished == pytest.approx(log.mtime())
+
+
+class TestBuildResult(object):
+    def test_str(self):
+        result = BuildResult('some output', '/some/dir')
+        assert result == 'some output'
+        assert isinstance(result, str)
+        assert type(result.output) is str
+        assert result.resultdir == '/some/dir'
+
+    def test_rebuild(self, fake_mock, tmpdir):
+        mc = MockChroot(root='some_root')
+        resultdir = str(tmpdir.join('results'))
+        result = mc.rebuild('pkg.src.rpm', resultdir=resultdir)
+        assert isinstance(result, BuildResult)
+        assert result == 'built pkg.src.rpm\n'
+        assert result.resultdir == resultdir
+        assert [p.name for p in result.timeline.phases] == [
+            'run', 'rpmbuild pkg.src.rpm',
+        ]
+        assert result.timeline.duration >= 0
+        assert result.timeline.logs['build.log'].lines == 1
+
+    def test_async_buildsrpm(self, fake_mock, tmpdir):
+        mc = MockChroot(root='some_root')
+        resultdir = str(tmpdir.join('results'))
+        result = mc.async_buildsrpm(
+            'pkg.spec', '/sources', resultdir=resultdir
+        ).result()
+        assert isinstance(result, BuildResult)
+        assert 'rpmbuild pkg.src.rpm' in result.timeline.durations()
+
+    def test_default_resultdir(self, fake_mock, tmpdir):
+        mc = MockChroot(root='some_root')
+        result = mc.rebuild('pkg.src.rpm')
+        assert result.resultdir == str(tmpdir.join('basedir/some_root/result'))
+        assert result.timeline.phases == []
+
+    def test_config_resultdir(self, fake_mock, tmpdir):
+        resultdir = str(tmpdir.join('out'))
+        with MockChroot(config=(
+            "config_opts['root'] = 'from_config'\n"
+            "config_opts['basedir'] = '{0}'\n"
+            "config_opts['resultdir'] = '{1}'\n"
+        ).format(tmpdir.join('basedir'), resultdir)) as mc:
+            result = mc.rebuild('pkg.src.rpm')
+            assert result.resultdir == resultdir
+            assert [p.name for p in result.timeline.phases] == [
+                'run', 'rpmbuild pkg.src.rpm',
+            ]
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""test_mock_chroot_rootinfo.py - Testing for mock_chroot/rootinfo.py
+"""
+from mock_chroot import MockChroot
+from mock_chroot.rootinfo import RootInfo
+
+
+class TestRootInfo(object):
+    def test_defaults(self):
+        info = RootInfo.from_config({'root': 'epel-7-x86_64'})
+        assert info.root_path == '/var/lib/mock/epel-7-x86_64/root'
+        assert info.cache_dir == '/var/cache/mock/epel-7-x86_64'
+        assert info.resultdir == '/var/lib/mock/epel-7-x86_64/result'
+
+    def test_unique_ext(self):
+        info = RootInfo.from_config(
+            {
+                'root': 'epel-7-x86_64', 'basedir': '/mock',
+                'cache_topdir': '/cache',
+                'resultdir': '%(basedir)s/results/%(root)s',
+            },
+            unique_ext='ext'
+        )
+        assert info.root == 'epel-7-x86_64-ext'
+        assert info.root_path == '/mock/epel-7-x86_64-ext/root'
+        assert info.cache_dir == '/cache/epel-7-x86_64'
+        assert info.resultdir == '/mock/results/epel-7-x86_64-ext'
+
+    def test_templates(self):
+        info = RootInfo.from_config({
+            'root': 'r', 'rootdir': '{{ basedir }}/roots/{{root}}',
+            'resultdir': '{{ unknown }}/result',
+        })
+        assert info.root_path == '/var/lib/mock/roots/r'
+        assert info.resultdir_template == '{{ unknown }}/result'
+        assert info.resultdir is None
+        assert RootInfo.from_config({'root': '{{ name }}'}) is None
+        assert RootInfo.from_config({}) is None
+
+
+class TestMockChrootRootInfo(object):
+    def test_memoized(self, fake_mock, tmpdir):
+        root_path = str(tmpdir.join('basedir', 'some_root', 'root'))
+        assert MockChroot(root='some_root').get_root_path() == root_path
+        mc = MockChroot(root='some_root')
+        assert mc.get_root_path() == root_path
+        assert mc.root_info().cache_dir is None
+        assert MockChroot(root='some_root', unique_ext='x').get_root_path() \
+            == root_path.replace('some_root', 'some_root-x')
+        with open(fake_mock) as log:
+            invocations = log.readlines()
+        assert len(invocations) == 2
+        MockChroot.forget_root_info()
+        MockChroot(root='some_root').get_root_path()
+        with open(fake_mock) as log:
+            assert len(log.readlines()) == 3
+
+    def test_from_config(self, fake_mock, tmpdir):
+        with MockChroot(config=(
+            "config_opts['root'] = 'from_config'\n"
+            "config_opts['basedir'] = '/somewhere'\n"
+        )) as mc:
+            info = mc.root_info()
+            assert info.root_path == '/somewhere/from_config/root'
+            assert mc.get_root_path() == info.root_path
+        assert not tmpdir.join('fake_mock.log').check()
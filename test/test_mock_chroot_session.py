@@ -0,0 +1,169 @@
+#!/usr/bin/env python
+"""test_mock_chroot_session.py - Testing for mock_chroot/session.py
+"""
+import os
+import signal
+import tarfile
+import pytest
+from time import time
+from subprocess import CalledProcessError
+
+from mock_chroot import MockChroot
+from mock_chroot.process import MockProcess, MockTimeoutError
+from mock_chroot.session import ChrootSession, _member_is_safe
+
+
+class TestChrootSession(object):
+    def test_run(self, fake_mock):
+        mc = MockChroot(root='some_root')
+        with mc.session() as session:
+            output = session.run('echo', 'testing')
+            assert output == 'testing\n'
+            output = session.run('printf', 'no newline')
+            assert output == 'no newline'
+            output = session.run('printf', '')
+            assert output == ''
+            output = session.run('bash', '-c', 'echo "a  b" \'$HOME\'')
+            assert output == 'a  b $HOME\n'
+            with pytest.raises(CalledProcessError) as excinfo:
+                session.run('bash', '-c', 'echo failing; exit 3')
+            assert excinfo.value.returncode == 3
+            assert excinfo.value.output == 'failing\n'
+            # The session remains usable after a command failure
+            output = session.run('pwd', cwd='etc')
+            assert output == '/etc\n'
+            output = session.run('bash', '-c', 'cd /tmp; pwd')
+            assert output == '/tmp\n'
+            # Directory changes do not leak between commands
+            assert session.run('pwd') == session.run('pwd')
+            assert session.run('pwd') != '/tmp\n'
+        assert session.closed
+        with open(fake_mock) as log:
+            invocations = log.readlines()
+        assert invocations == ['--root=some_root --shell\n']
+
+    def test_copyin_copyout(self, fake_mock, tmpdir):
+        src = tmpdir.mkdir('src')
+        src.join('file1').write('content1')
+        src.join('dir1', 'file2').write('\0binary\n' * 100000, ensure=True)
+        chroot_dir = tmpdir.join('chroot_dir')
+        out = tmpdir.join('out')
+        mc = MockChroot(root='some_root')
+        with mc.session() as session:
+            session.copyin(
+                [str(src.join('file1')), str(src.join('dir1'))],
+                str(chroot_dir)
+            )
+            assert chroot_dir.join('file1').read() == 'content1'
+            assert chroot_dir.join('dir1', 'file2').read() == \
+                '\0binary\n' * 100000
+            # The session remains usable after copying
+            assert session.run('echo', 'testing') == 'testing\n'
+            session.copyout(
+                [str(chroot_dir.join('file1')), str(chroot_dir.join('dir1'))],
+                str(out)
+            )
+            assert out.join('file1').read() == 'content1'
+            assert out.join('dir1', 'file2').read() == '\0binary\n' * 100000
+            with pytest.raises(CalledProcessError):
+                session.copyout(str(tmpdir.join('missing')), str(out))
+            assert session.run('echo', 'testing') == 'testing\n'
+        with open(fake_mock) as log:
+            invocations = log.readlines()
+        assert invocations == ['--root=some_root --shell\n']
+
+    def test_copyout_links(self, fake_mock, tmpdir):
+        outside = tmpdir.mkdir('outside')
+        evil = tmpdir.mkdir('evil')
+        evil.join('d').mksymlinkto(outside)
+        other = tmpdir.mkdir('other')
+        other.join('d', 'passwd').write('pwned', ensure=True)
+        links = tmpdir.mkdir('links')
+        links.join('file1').write('content1')
+        links.join('rel').mksymlinkto('file1')
+        links.join('abs').mksymlinkto('/etc')
+        os.link(str(links.join('file1')), str(links.join('hard')))
+        out = tmpdir.join('out')
+        with MockChroot(root='some_root').session() as session:
+            # Links inside the copied files are kept
+            session.copyout(str(links), str(out))
+            assert out.join('links', 'rel').read() == 'content1'
+            assert out.join('links', 'hard').read() == 'content1'
+            assert out.join('links', 'abs').readlink() == '/etc'
+            # Files are not written through links that lead outside
+            with pytest.raises(RuntimeError):
+                session.copyout(
+                    [str(evil.join('d')), str(other.join('d'))], str(out)
+                )
+            assert outside.listdir() == []
+
+    def test_member_is_safe(self, tmpdir):
+        dest = str(tmpdir)
+        for name, kind, linkname, safe in (
+            ('file', tarfile.REGTYPE, '', True),
+            ('dir/file', tarfile.REGTYPE, '', True),
+            ('/etc/passwd', tarfile.REGTYPE, '', False),
+            ('dir/../../passwd', tarfile.REGTYPE, '', False),
+            ('link', tarfile.SYMTYPE, '/etc', True),
+            ('hard', tarfile.LNKTYPE, 'dir/file', True),
+            ('hard', tarfile.LNKTYPE, '/etc/passwd', False),
+            ('hard', tarfile.LNKTYPE, '../passwd', False),
+        ):
+            member = tarfile.TarInfo(name)
+            member.type = kind
+            member.linkname = linkname
+            assert _member_is_safe(member, dest) == safe, name
+
+    def test_closed_session(self, fake_mock):
+        session = MockChroot(root='some_root').session()
+        assert session.close() == 0
+        with pytest.raises(RuntimeError):
+            session.run('true')
+
+    def test_timeout(self, fake_mock, monkeypatch):
+        mc = MockChroot(root='some_root', timeout=2)
+        with mc.session() as session:
+            # The timeout applies to each command on its own
+            assert session.run('sleep', '0.5') == ''
+            assert session.run('sleep', '0.5') == ''
+            started = time()
+            with pytest.raises(MockTimeoutError) as excinfo:
+                session.run(
+                    'bash', '-c',
+                    'trap "echo terminated; exit 0" TERM; echo started; '
+                    'sleep 10 & wait',
+                    timeout=0.3
+                )
+            assert time() - started < 2
+            assert excinfo.value.output == 'started\n'
+            assert excinfo.value.timeout == 0.3
+            # The shell is terminated along with the command
+            assert session.closed
+            with pytest.raises(RuntimeError):
+                session.run('true')
+        monkeypatch.setattr(MockProcess, 'KILL_GRACE', 0.3)
+        mc = MockChroot(root='some_root', timeout=0.3)
+        with mc.session() as session:
+            started = time()
+            with pytest.raises(MockTimeoutError):
+                session.run('bash', '-c', 'trap "" TERM; sleep 10')
+            assert time() - started < 2
+
+    def test_close_stuck(self, monkeypatch):
+        monkeypatch.setattr(MockProcess, 'KILL_GRACE', 0.3)
+        # A shell that ignores 'exit', SIGTERM and the end of its input
+        session = ChrootSession((
+            'bash', '-c',
+            'trap "" TERM; exit() { :; }; '
+            'while read -r line; do eval "$line"; done; sleep 10',
+        ))
+        assert session.run('echo', 'testing') == 'testing\n'
+        started = time()
+        assert session.close() == -signal.SIGKILL
+        assert time() - started < 2
+        assert session.closed
+
+    def test_rlimits(self, fake_mock):
+        mc = MockChroot(root='some_root', rlimits={'nofile': 64})
+        with mc.session() as session:
+            assert session.run('bash', '-c', 'ulimit -n') == '64\n'